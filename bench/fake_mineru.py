@@ -0,0 +1,251 @@
+"""
+本地模拟 MinerU 在线 API, 仅依赖标准库, 用于离线性能测试
+实现: POST /api/v4/file-urls/batch, PUT /upload/<batch_id>/<index>,
+     GET /api/v4/extract-results/batch/<batch_id>, GET /results/<batch_id>/<index>.zip (支持 Range)
+每个文件上传完成后按 latency 分布抽样解析耗时, 期间依次经过 pending / running / converting 状态
+
+单独运行: python -m bench.fake_mineru --port 8001 --latency lognormal:2,0.5
+"""
+import io
+import re
+import sys
+import json
+import time
+import random
+import zipfile
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+def parse_distribution(spec):
+    """
+    解析耗时分布: fixed:<秒> / uniform:<最小>,<最大> / lognormal:<mu>,<sigma> / expo:<均值>
+    返回无参数的抽样函数
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v]
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(values[0], values[1])
+    if kind == 'expo':
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"Unknown distribution: {spec}")
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """
+    客户端中途断开 (超时取消、模拟的流式中断) 是正常情况, 不打印异常堆栈
+    """
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def synthetic_markdown(title, size_kb=40):
+    """
+    生成带章节、图片链接、HTML 表格、页眉与参考文献的 markdown, 覆盖预处理的各条规则
+    """
+    paragraph = ("We study the electronic structure of layered materials using density functional theory. "
+                 "The PBE functional with a plane-wave cutoff of 500 eV and a 12x12x1 k-point mesh was used. ") * 3
+    parts = [f"# {title}\n\n## Abstract\n\n{paragraph}\n"]
+    section = 1
+    while sum(len(p) for p in parts) < size_kb * 1024:
+        parts.append(f"Journal of Synthetic Benchmarks, Vol. 1\n\n## {section} Section {section}\n\n{paragraph}\n\n"
+                     f"![](images/fig{section}.jpg)\n\n"
+                     f"<table><tr><th>a</th><th>b</th></tr><tr><td>{section}.0</td><td>{section}.5</td></tr></table>\n\n")
+        section += 1
+    parts.append("## References\n\n" + "".join(f"[{i}] A. Author, J. Synth. Bench. {i} (2024).\n" for i in range(1, 40)))
+    return "".join(parts)
+
+
+class FakeMinerU:
+    def __init__(self, latency='lognormal:1.5,0.5', fail_rate=0.0, md_kb=40, image_kb=200, images=4):
+        self.sample_latency = parse_distribution(latency)
+        self.fail_rate = fail_rate
+        self.md_kb = md_kb
+        self.image_kb = image_kb
+        self.images = images
+        self.base_url = None
+        self._lock = threading.Lock()
+        self._batches = {}  # batch_id -> [{'name', 'data_id', 'uploaded', 'latency', 'failed'}]
+        self._zips = {}  # (batch_id, index) -> bytes
+        self._next_id = 0
+        self.requests = 0
+
+    def create_batch(self, files):
+        with self._lock:
+            self._next_id += 1
+            batch_id = f"batch-{self._next_id}"
+            self._batches[batch_id] = [
+                {'name': f['name'], 'data_id': f.get('data_id'), 'uploaded': None, 'latency': 0.0, 'failed': False}
+                for f in files
+            ]
+        urls = [f"{self.base_url}/upload/{batch_id}/{i}" for i in range(len(files))]
+        return batch_id, urls
+
+    def mark_uploaded(self, batch_id, index):
+        with self._lock:
+            entry = self._batches[batch_id][index]
+            entry['uploaded'] = time.monotonic()
+            entry['latency'] = self.sample_latency()
+            entry['failed'] = random.random() < self.fail_rate
+
+    def results(self, batch_id):
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            entries = list(enumerate(self._batches.get(batch_id, [])))
+        for index, entry in entries:
+            result = {'file_name': entry['name'], 'data_id': entry['data_id'], 'err_msg': ''}
+            if entry['uploaded'] is None:
+                result['state'] = 'waiting-file'
+            else:
+                progress = (now - entry['uploaded']) / max(entry['latency'], 1e-6)
+                if progress >= 1:
+                    if entry['failed']:
+                        result.update(state='failed', err_msg='simulated failure')
+                    else:
+                        result.update(state='done', full_zip_url=f"{self.base_url}/results/{batch_id}/{index}.zip")
+                elif progress < 0.2:
+                    result['state'] = 'pending'
+                elif progress < 0.9:
+                    total_pages = 10
+                    result.update(state='running', extract_progress={
+                        'extracted_pages': int(total_pages * (progress - 0.2) / 0.7), 'total_pages': total_pages})
+                else:
+                    result['state'] = 'converting'
+            results.append(result)
+        return results
+
+    def zip_payload(self, batch_id, index):
+        key = (batch_id, index)
+        with self._lock:
+            payload = self._zips.get(key)
+            name = self._batches[batch_id][index]['name']
+        if payload is None:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr('full.md', synthetic_markdown(name.rsplit('.', 1)[0], self.md_kb))
+                zf.writestr('layout.json', json.dumps({'pdf_info': [{'page_idx': i} for i in range(10)]}))
+                for i in range(self.images):
+                    # 随机字节不可压缩, 接近真实图片的体积
+                    zf.writestr(f'images/fig{i + 1}.jpg', random.randbytes(self.image_kb * 1024))
+            payload = buffer.getvalue()
+            with self._lock:
+                self._zips[key] = payload
+        return payload
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, payload, status=200):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        def do_POST(self):
+            state.requests += 1
+            if not self.path.endswith('/file-urls/batch'):
+                return self._json({'code': 404, 'msg': 'not found'}, 404)
+            payload = json.loads(self._body() or b'{}')
+            if payload.get('batch_id'):
+                # 单篇模式会再次向 api_url 提交解析任务, 上传完成时已自动提交, 这里直接返回成功
+                return self._json({'code': 0, 'data': {'batch_id': payload['batch_id']}})
+            batch_id, urls = state.create_batch(payload.get('files', []))
+            self._json({'code': 0, 'data': {'batch_id': batch_id, 'file_urls': urls}})
+
+        def do_PUT(self):
+            state.requests += 1
+            match = re.match(r'^/upload/([^/]+)/(\d+)$', self.path)
+            self._body()
+            if not match:
+                return self._json({'code': 404}, 404)
+            state.mark_uploaded(match.group(1), int(match.group(2)))
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_GET(self):
+            state.requests += 1
+            match = re.match(r'^/api/v4/extract-results/batch/([^/?]+)', self.path)
+            if match:
+                return self._json({'code': 0, 'data': {'batch_id': match.group(1),
+                                                       'extract_result': state.results(match.group(1))}})
+            match = re.match(r'^/results/([^/]+)/(\d+)\.zip$', self.path)
+            if not match:
+                return self._json({'code': 404}, 404)
+            payload = state.zip_payload(match.group(1), int(match.group(2)))
+            start, end = 0, len(payload) - 1
+            range_match = RANGE_RE.match(self.headers.get('Range', ''))
+            if range_match:
+                start = int(range_match.group(1))
+                end = int(range_match.group(2) or end)
+                if start >= len(payload):
+                    self.send_response(416)
+                    self.send_header('Content-Range', f"bytes */{len(payload)}")
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{len(payload)}")
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', 'application/zip')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.end_headers()
+            self.wfile.write(payload[start:end + 1])
+
+    return Handler
+
+
+def serve(state, host='127.0.0.1', port=0):
+    """
+    在后台线程中启动服务, 返回 (server, base_url)
+    """
+    server = QuietHTTPServer((host, port), make_handler(state))
+    state.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state.base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 MinerU 在线 API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', default='lognormal:1.5,0.5', help="解析耗时分布, 见 parse_distribution")
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--md-kb', type=int, default=40)
+    parser.add_argument('--image-kb', type=int, default=200)
+    args = parser.parse_args()
+    state = FakeMinerU(args.latency, args.fail_rate, args.md_kb, args.image_kb)
+    server, base_url = serve(state, args.host, args.port)
+    print(f"Fake MinerU listening on {base_url}/api/v4/file-urls/batch")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
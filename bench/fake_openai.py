@@ -0,0 +1,317 @@
+"""
+本地模拟 OpenAI 兼容的 chat completions 接口, 仅依赖标准库, 用于离线性能测试
+可配置首 token 延迟 (ttft)、生成速度 (tokens_per_sec)、输出长度与 429 比例, 支持 stream 与非流式;
+stream_drop_rate 比例的流式响应在输出一半时断开连接;
+模拟服务端前缀缓存: 与之前请求相同的前缀按 PREFIX_BLOCK 个 token 为单位计入 usage.prompt_tokens_details.cached_tokens
+同时模拟 Batch API: POST /v1/files, POST /v1/batches, GET /v1/batches/<id>, GET /v1/files/<id>/content,
+批次按 batch_latency 分布抽样完成耗时, batch_fail_rate 比例的请求写入错误文件
+
+单独运行: python -m bench.fake_openai --port 8002 --ttft fixed:0.5 --tps 80 --rate-429 0.05
+"""
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler
+
+from .fake_mineru import parse_distribution, QuietHTTPServer
+
+WORD = "summary "
+# 前缀缓存的粒度 (token), 与 OpenAI 相同按 128 token 递增
+PREFIX_BLOCK = 128
+
+
+class FakeOpenAI:
+    def __init__(self, ttft='fixed:0.5', tokens_per_sec=80.0, output_tokens=400, rate_429=0.0, retry_after_ms=500,
+                 batch_latency='fixed:5', batch_fail_rate=0.0, stream_drop_rate=0.0):
+        self.sample_ttft = parse_distribution(ttft)
+        self.sample_batch_latency = parse_distribution(batch_latency)
+        self.batch_fail_rate = batch_fail_rate
+        self.stream_drop_rate = stream_drop_rate
+        self.dropped = 0
+        self.tokens_per_sec = tokens_per_sec
+        self.output_tokens = output_tokens
+        self.rate_429 = rate_429
+        self.retry_after_ms = retry_after_ms
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.active = 0
+        self.peak_active = 0
+        self._files = {}  # file_id -> bytes
+        self._batches = {}  # batch_id -> (batch 对象, 提交时间, 完成耗时)
+        self._next_id = 0
+        # 与真实服务一样返回全局唯一的 ID, 多个 fake 服务同时运行时不冲突
+        self._id_prefix = uuid.uuid4().hex[:8]
+        self._prefixes = set()  # 已见过的前缀块哈希
+        # 批次完成时在 _lock 内计算 usage, 前缀记录使用单独的锁
+        self._prefix_lock = threading.Lock()
+
+    def admit(self):
+        """
+        返回 False 表示本次请求模拟限流 (429)
+        """
+        with self._lock:
+            self.requests += 1
+            if random.random() < self.rate_429:
+                self.rejected += 1
+                return False
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+    def usage(self, payload):
+        """
+        按 4 字符 1 token 估算, 与之前请求逐块相同的前缀计为缓存命中
+        """
+        text = "".join(f"{m.get('role')}:{m.get('content') or ''}" for m in payload.get('messages', []))
+        prompt_tokens = len(text) // 4
+        cached = 0
+        with self._prefix_lock:
+            for end in range(PREFIX_BLOCK * 4, len(text) + 1, PREFIX_BLOCK * 4):
+                key = hash((payload.get('model'), text[:end]))
+                if key in self._prefixes:
+                    cached = end // 4
+                    continue
+                self._prefixes.add(key)
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': self.output_tokens,
+                'total_tokens': prompt_tokens + self.output_tokens,
+                'prompt_tokens_details': {'cached_tokens': cached}}
+
+    def completion(self, payload):
+        return {
+            'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': payload.get('model'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': WORD * self.output_tokens}}],
+            'usage': self.usage(payload),
+        }
+
+    def _new_id(self, prefix):
+        self._next_id += 1
+        return f"{prefix}-{self._id_prefix}{self._next_id}"
+
+    def create_file(self, content, filename, purpose):
+        with self._lock:
+            file_id = self._new_id('file')
+            self._files[file_id] = content
+        return {'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                'filename': filename, 'purpose': purpose, 'status': 'processed'}
+
+    def file_content(self, file_id):
+        with self._lock:
+            return self._files.get(file_id)
+
+    def create_batch(self, payload):
+        with self._lock:
+            batch_id = self._new_id('batch')
+            total = len(self._files.get(payload['input_file_id'], b'').splitlines())
+            batch = {'id': batch_id, 'object': 'batch', 'endpoint': payload['endpoint'], 'errors': None,
+                     'input_file_id': payload['input_file_id'], 'completion_window': payload['completion_window'],
+                     'status': 'validating', 'output_file_id': None, 'error_file_id': None,
+                     'created_at': int(time.time()), 'request_counts': {'total': total, 'completed': 0, 'failed': 0}}
+            self._batches[batch_id] = (batch, time.monotonic(), self.sample_batch_latency())
+        return batch
+
+    def batch_status(self, batch_id):
+        with self._lock:
+            if batch_id not in self._batches:
+                return None
+            batch, started, latency = self._batches[batch_id]
+            if batch['status'] == 'completed':
+                return batch
+            progress = (time.monotonic() - started) / max(latency, 1e-6)
+            total = batch['request_counts']['total']
+            if progress < 0.1:
+                batch['status'] = 'validating'
+            elif progress < 0.9:
+                batch['status'] = 'in_progress'
+                batch['request_counts']['completed'] = int(total * (progress - 0.1) / 0.8)
+            elif progress < 1:
+                batch['status'] = 'finalizing'
+            else:
+                self._finish_batch(batch)
+            return batch
+
+    def _finish_batch(self, batch):
+        output, errors = [], []
+        for line in self._files[batch['input_file_id']].splitlines():
+            request = json.loads(line)
+            self.requests += 1
+            if random.random() < self.batch_fail_rate:
+                errors.append({'id': self._new_id('batch_req'), 'custom_id': request['custom_id'],
+                               'response': {'status_code': 500, 'request_id': '', 'body': {
+                                   'error': {'message': 'simulated failure', 'type': 'server_error'}}},
+                               'error': None})
+            else:
+                output.append({'id': self._new_id('batch_req'), 'custom_id': request['custom_id'],
+                               'response': {'status_code': 200, 'request_id': '',
+                                            'body': self.completion(request['body'])},
+                               'error': None})
+        for key, records in (('output_file_id', output), ('error_file_id', errors)):
+            if records:
+                file_id = self._new_id('file')
+                self._files[file_id] = "".join(json.dumps(r) + "\n" for r in records).encode('utf-8')
+                batch[key] = file_id
+        batch.update(status='completed', completed_at=int(time.time()),
+                     request_counts={'total': len(output) + len(errors), 'completed': len(output), 'failed': len(errors)})
+
+
+def parse_multipart(body, content_type):
+    """
+    解析 multipart/form-data, 返回 {字段名: (文件名, 内容)}
+    """
+    boundary = re.search(r'boundary="?([^";]+)"?', content_type).group(1).encode()
+    fields = {}
+    for part in body.split(b'--' + boundary):
+        head, sep, content = part.partition(b'\r\n\r\n')
+        if not sep:
+            continue
+        name = re.search(rb'name="([^"]*)"', head)
+        filename = re.search(rb'filename="([^"]*)"', head)
+        if name:
+            fields[name.group(1).decode()] = (filename.group(1).decode() if filename else None,
+                                              content[:-2] if content.endswith(b'\r\n') else content)
+    return fields
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, payload, status=200, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if self.path.endswith('/files'):
+                fields = parse_multipart(body, self.headers.get('Content-Type', ''))
+                filename, content = fields['file']
+                return self._json(state.create_file(content, filename, fields.get('purpose', (None, b''))[1].decode()))
+            if self.path.endswith('/batches'):
+                return self._json(state.create_batch(json.loads(body)))
+            if not self.path.endswith('/chat/completions'):
+                return self._json({'error': {'message': 'not found'}}, 404)
+            payload = json.loads(body or b'{}')
+            if not state.admit():
+                return self._json({'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit_error'}}, 429,
+                                  {'retry-after-ms': str(state.retry_after_ms)})
+            try:
+                if payload.get('stream'):
+                    self._stream(payload)
+                else:
+                    self._complete(payload)
+            finally:
+                state.release()
+
+        def do_GET(self):
+            match = re.search(r'/batches/([^/?]+)$', self.path)
+            if match:
+                batch = state.batch_status(match.group(1))
+                return self._json(batch) if batch else self._json({'error': {'message': 'not found'}}, 404)
+            match = re.search(r'/files/([^/?]+)/content$', self.path)
+            content = state.file_content(match.group(1)) if match else None
+            if content is None:
+                return self._json({'error': {'message': 'not found'}}, 404)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def _complete(self, payload):
+            time.sleep(state.sample_ttft() + state.output_tokens / state.tokens_per_sec)
+            self._json(state.completion(payload))
+
+        def _stream(self, payload):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            def send(data):
+                line = f"data: {data}\n\n".encode('utf-8')
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+            def chunk(delta, usage=None):
+                body = {'id': 'chatcmpl-bench', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                        'model': payload.get('model'),
+                        'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}] if delta is not None else []}
+                if usage:
+                    body['usage'] = usage
+                send(json.dumps(body))
+
+            time.sleep(state.sample_ttft())
+            with state._lock:
+                drop = random.random() < state.stream_drop_rate
+                state.dropped += drop
+            # 每次发送 10 个 token, 减少系统调用
+            step = 10
+            for sent in range(0, state.output_tokens, step):
+                if drop and sent >= state.output_tokens // 2:
+                    # 不发送结束分片直接断开, 客户端读到不完整的 chunked 响应
+                    self.close_connection = True
+                    return
+                count = min(step, state.output_tokens - sent)
+                chunk({'content': WORD * count})
+                time.sleep(count / state.tokens_per_sec)
+            if (payload.get('stream_options') or {}).get('include_usage'):
+                chunk(None, state.usage(payload))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def serve(state, host='127.0.0.1', port=0):
+    """
+    在后台线程中启动服务, 返回 (server, base_url), base_url 可直接作为 api.llm.base_url
+    """
+    server = QuietHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 OpenAI 兼容的 chat completions 接口")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8002)
+    parser.add_argument('--ttft', default='fixed:0.5', help="首 token 延迟分布, 见 fake_mineru.parse_distribution")
+    parser.add_argument('--tps', type=float, default=80.0, help="每秒生成 token 数")
+    parser.add_argument('--output-tokens', type=int, default=400)
+    parser.add_argument('--rate-429', type=float, default=0.0, help="返回 429 的请求比例")
+    parser.add_argument('--batch-latency', default='fixed:5', help="Batch API 批次完成耗时分布")
+    parser.add_argument('--batch-fail-rate', type=float, default=0.0, help="Batch API 中失败请求的比例")
+    parser.add_argument('--stream-drop-rate', type=float, default=0.0, help="流式响应中途断开的比例")
+    args = parser.parse_args()
+    state = FakeOpenAI(args.ttft, args.tps, args.output_tokens, args.rate_429,
+                       batch_latency=args.batch_latency, batch_fail_rate=args.batch_fail_rate,
+                       stream_drop_rate=args.stream_drop_rate)
+    server, base_url = serve(state, args.host, args.port)
+    print(f"Fake OpenAI listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
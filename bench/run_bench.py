@@ -0,0 +1,230 @@
+"""
+离线性能测试: 启动模拟 MinerU 与 OpenAI 服务, 生成合成 PDF 语料, 以进程内方式运行 main 的完整流程,
+报告吞吐量、单篇耗时 p50/p95、各阶段耗时、峰值内存 (RSS) 与峰值线程数
+
+在仓库根目录运行:
+    python -m bench.run_bench --papers 100 --engine thread --workers 8
+    python -m bench.run_bench --papers 1000 --engine async --mineru-latency lognormal:2,0.6 --rate-429 0.05
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块, 不统计峰值内存
+    resource = None
+
+import yaml
+
+from . import fake_mineru, fake_openai
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_pdf(index, pages):
+    """
+    生成最小的多页 PDF (含页面树, 可被 pdf_meta.count_pages 统计), index 保证内容互不相同
+    """
+    kids = " ".join(f"{3 + i} 0 R" for i in range(pages))
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode()]
+    objects += [b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"] * pages
+    body = b"".join(f"{i} 0 obj\n".encode() + obj + b"\nendobj\n" for i, obj in enumerate(objects, 1))
+    return b"%PDF-1.4\n" + f"% bench paper {index}\n".encode() + body + b"trailer << /Root 1 0 R >>\n%%EOF\n"
+
+
+def build_corpus(input_dir, papers, ids, pages, duplicate_ratio):
+    """
+    在 input_dir/<ID>/ 下生成 papers 篇 PDF; duplicate_ratio 比例的文件复制自已有文件 (测试内容哈希缓存)
+    """
+    written = []
+    for i in range(papers):
+        folder = os.path.join(input_dir, f"{1000 + i % ids}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"paper_{i:05d}.pdf")
+        if written and random.random() < duplicate_ratio:
+            shutil.copyfile(random.choice(written), path)
+        else:
+            with open(path, 'wb') as f:
+                f.write(synthetic_pdf(i, pages))
+            written.append(path)
+    return ids
+
+
+def build_config(args, work_dir, mineru_url, openai_url, ids):
+    with open(os.path.join(ROOT, 'iconfig.yaml'), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    config['paths'].update(input_dir=os.path.join(work_dir, 'input'), temp_dir=os.path.join(work_dir, 'temp'),
+                           merge_output_dir=os.path.join(work_dir, 'merged'), manifest_db='')
+    mineru = config['api']['mineru']
+    mineru.update(mode='api', api_url=f"{mineru_url}/api/v4/file-urls/batch", api_key='bench',
+                  batch_mode=args.batch_mode, batch_size=args.batch_size)
+    mineru['polling'] = {'min_interval': 0.2, 'max_interval': 2, 'seconds_per_page': 0.1,
+                         'early_factor': 0.5, 'deadline': args.deadline}
+    config['api']['llm'].update(api_key='bench', base_url=openai_url, model_name='bench-model',
+                                stream=args.stream, max_retries=args.max_retries, backoff_base=0.5, backoff_max=5,
+                                max_connections=max(args.workers, 20), mode=args.llm_mode)
+    config['api']['llm']['batch'] = {'poll_interval': 0.5, 'max_resubmits': 2}
+    config.setdefault('cache', {})['llm'] = {'mode': 'read_write' if args.llm_cache else 'off'}
+    rules = config['processing_rules']
+    rules['deep_read_ids'] = [str(1000 + i) for i in range(0, ids, 2)]
+    rules['skim_ids'] = [str(1000 + i) for i in range(1, ids, 2)]
+    rules['is_merger_md'] = args.merge
+    config['concurrency'].update(max_workers=args.workers, engine=args.engine)
+    config['metrics'] = {'report_dir': os.path.join(work_dir, 'reports'), 'prometheus_textfile': ''}
+    return config
+
+
+class ResourceSampler:
+    """
+    后台采样峰值线程数与 RSS
+    """
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss_mb = None  # 无法统计时为 None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            rss = self._rss_mb()
+            if rss is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb or 0.0, rss)
+            self._stop.wait(self.interval)
+
+    @staticmethod
+    def _rss_mb():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+        except (OSError, AttributeError, ValueError):
+            # 非 Linux: ru_maxrss 在 macOS 上以字节计, 其余以 KB 计
+            if resource is None:
+                return None
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PaperWorkflow 离线性能测试")
+    parser.add_argument('--papers', type=int, default=100, help="合成 PDF 数量 (10 ~ 10000)")
+    parser.add_argument('--ids', type=int, default=10, help="ID 文件夹数量, 偶数序号为精读, 奇数为浏览")
+    parser.add_argument('--pages', type=int, default=12, help="每篇 PDF 的页数")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0, help="内容重复的 PDF 比例")
+    parser.add_argument('--engine', choices=['thread', 'async'], default='thread')
+    parser.add_argument('--batch-mode', action='store_true', help="使用 MinerU 批量转换模式")
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=8, help="concurrency.max_workers")
+    parser.add_argument('--stream', action='store_true', help="LLM 使用流式输出")
+    parser.add_argument('--llm-cache', action='store_true', help="启用 LLM 回复缓存")
+    parser.add_argument('--merge', action='store_true', help="运行结束后合并 markdown")
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--deadline', type=float, default=600, help="MinerU 轮询最长等待秒数")
+    parser.add_argument('--mineru-latency', default='lognormal:1.0,0.5', help="MinerU 解析耗时分布")
+    parser.add_argument('--mineru-fail-rate', type=float, default=0.0)
+    parser.add_argument('--md-kb', type=int, default=40, help="每篇 markdown 大小 (KB)")
+    parser.add_argument('--image-kb', type=int, default=200, help="结果 zip 中每张图片的大小 (KB)")
+    parser.add_argument('--ttft', default='fixed:0.3', help="LLM 首 token 延迟分布")
+    parser.add_argument('--tps', type=float, default=200.0, help="LLM 每秒生成 token 数")
+    parser.add_argument('--output-tokens', type=int, default=300)
+    parser.add_argument('--rate-429', type=float, default=0.0, help="LLM 返回 429 的请求比例")
+    parser.add_argument('--llm-mode', choices=['chat', 'batch'], default='chat', help="batch: 使用 Batch API 提交总结")
+    parser.add_argument('--batch-latency', default='fixed:5', help="Batch API 批次完成耗时分布")
+    parser.add_argument('--batch-fail-rate', type=float, default=0.0, help="Batch API 中失败请求的比例")
+    parser.add_argument('--work-dir', default='', help="工作目录, 默认新建临时目录")
+    parser.add_argument('--keep', action='store_true', help="保留工作目录")
+    parser.add_argument('--out', default='', help="结果 JSON 输出路径")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def run(args):
+    random.seed(args.seed)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='paperworkflow_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    mineru = fake_mineru.FakeMinerU(args.mineru_latency, args.mineru_fail_rate, args.md_kb, args.image_kb)
+    openai_state = fake_openai.FakeOpenAI(args.ttft, args.tps, args.output_tokens, args.rate_429,
+                                          batch_latency=args.batch_latency, batch_fail_rate=args.batch_fail_rate)
+    mineru_server, mineru_url = fake_mineru.serve(mineru)
+    openai_server, openai_url = fake_openai.serve(openai_state)
+
+    ids = build_corpus(os.path.join(work_dir, 'input'), args.papers, args.ids, args.pages, args.duplicate_ratio)
+    config = build_config(args, work_dir, mineru_url, openai_url, ids)
+    config_path = os.path.join(work_dir, 'config.yaml')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+
+    # 延迟导入: 先完成语料与服务准备, 再加载工作流 (main 导入时会配置日志)
+    sys.path.insert(0, ROOT)
+    import main as workflow
+    from utils.metrics import metrics
+
+    metrics.reset()
+    start = time.monotonic()
+    try:
+        with ResourceSampler() as sampler:
+            workflow.main(['--config', config_path])
+    finally:
+        mineru_server.shutdown()
+        openai_server.shutdown()
+    wall = time.monotonic() - start
+
+    report = metrics.summary()
+    done = sum(values.get('papers', 0) for values in report['modes'].values())
+    failures = sum(values.get('failures', 0) for values in report['modes'].values())
+    paper_spans = [span for span in report['spans'] if span['span'] == 'paper']
+    result = {
+        'papers': args.papers,
+        'engine': args.engine,
+        'llm_mode': args.llm_mode,
+        'batch_mode': args.batch_mode,
+        'workers': args.workers,
+        'completed': done,
+        'failures': failures,
+        'wall_seconds': round(wall, 2),
+        'papers_per_second': round(done / wall, 3) if wall > 0 else 0.0,
+        'paper_latency': {span['mode']: {'p50': span['p50'], 'p95': span['p95'], 'max': span['max']}
+                          for span in paper_spans},
+        'peak_rss_mb': round(sampler.peak_rss_mb, 1) if sampler.peak_rss_mb is not None else None,
+        'peak_threads': sampler.peak_threads,
+        'mineru_requests': mineru.requests,
+        'llm_requests': openai_state.requests,
+        'llm_rejected_429': openai_state.rejected,
+        'llm_peak_concurrency': openai_state.peak_active,
+        'spans': report['spans'],
+        'work_dir': work_dir if args.keep else None,
+    }
+
+    out = args.out or os.path.join(work_dir if args.keep else os.getcwd(), 'bench_result.json')
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    if not args.keep and not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary = {key: value for key, value in result.items() if key != 'spans'}
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    print(f"Full result written to {out}")
+    return result
+
+
+if __name__ == '__main__':
+    run(parse_args())
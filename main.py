@@ -2,19 +2,34 @@ import os
 import yaml
 import time
 import sys
-from concurrent.futures import ThreadPoolExecutor
+import json
+import argparse
+import threading
+import socket
+from concurrent.futures import ThreadPoolExecutor, wait
 from loguru import logger
 from tqdm import tqdm
 
 from utils.pdf_handler import PDFProcessor
 from utils.llm_handler import LLMHandler
+from utils.llm_batch import LLMBatch
 from utils.prompt_builder import PromptBuilder
-from utils.workflow_utils import find_pdf_files, determine_mode
-from utils.md_merger import merge_markdown_files
+from utils.workflow_utils import determine_mode, get_output_path, save_summary, summary_header, save_duplicate_summary
+from utils.md_merger import merge_markdown_files, merge_per_id, discover_summaries
+from utils.conversion_cache import ConversionCache
+from utils.response_cache import ResponseCache
+from utils.async_pipeline import AsyncPipeline
+from utils.map_reduce import MapReduceSummarizer
+from utils.md_preprocess import MarkdownPreprocessor
+from utils.run_manifest import RunManifest
+from utils.file_index import FileIndex, discover_papers
+from utils.metrics import metrics, current_mode
+from utils.work_queue import WorkQueue
+from utils.rate_limiter import SharedRateLimiter
+from utils.scheduler import PaperScheduler
 
 logger.remove()
 # 设置 level="INFO"，但要过滤更高级别
-md_outputs = []
 
 logger.add(
     sys.stderr,
@@ -29,68 +44,328 @@ def load_config(config_path="config.yaml"):
     with open(config_path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
-def process_single_paper(paper_info, config, pdf_processor, llm_handler):
+def process_single_paper(paper_info, config, pdf_processor, llm_handler, manifest, queued_at=None, llm_batch=None):
     """
-    处理单篇论文的完整流程
+    处理单篇论文的完整流程, 各阶段进度记录到运行清单
+    queued_at: 提交到线程池的时间 (time.monotonic), 用于统计排队等待时长
+    llm_batch: Batch API 模式下收集 Prompt 的 LLMBatch, 总结在批次完成后由 finish_batch_summary 写出
     """
     paper_id = paper_info['id']
-    pdf_path = paper_info['file_path']
-    folder_path = paper_info['folder_path']
-    file_name = paper_info['file_name']
     
     # 1. 确定模式
     mode = determine_mode(paper_id, config['processing_rules'])
     logger.info(f"正在处理子目录 [{paper_id}] 下pdf, 处理模式: {mode}")
+    mode_token = current_mode.set(mode)
+    try:
+        if queued_at is not None:
+            metrics.observe('queue_wait', time.monotonic() - queued_at)
+        _process_paper(paper_info, mode, config, pdf_processor, llm_handler, manifest, llm_batch)
+    finally:
+        current_mode.reset(mode_token)
+
+
+def _process_paper(paper_info, mode, config, pdf_processor, llm_handler, manifest, llm_batch=None):
+    paper_id = paper_info['id']
+    pdf_path = paper_info['file_path']
     
-    output_filename = f"Summary_{mode}_{file_name.replace('.pdf', '')}.md"
-    output_path = os.path.join(folder_path, output_filename) # 默认保存在同级目录
+    output_path = get_output_path(paper_info, mode) # 默认保存在同级目录
+    manifest.discover(paper_info, mode, output_path)
+    record = manifest.get(pdf_path)
     
     # 检查是否已存在
     if os.path.exists(output_path):
         logger.warning(f"Output for {paper_id} already exists. Skipping.")
+        metrics.count('skipped')
+        if record['status'] != 'done':
+            manifest.advance(pdf_path, 'summarized')
         return
-    md_outputs.append(output_path)
 
 
     try:
-        # 2. PDF -> Markdown
+        # 2. PDF -> Markdown (已提交但未完成的 MinerU 批次直接接管)
+        paper_start = time.monotonic()
         start_time = time.time()
-        md_content = pdf_processor.convert_to_markdown(pdf_path)
+        batch_id = record['batch_id'] if record['stage'] == 'uploaded' else None
+        md_content = pdf_processor.convert_to_markdown(
+            pdf_path, batch_id=batch_id, mode=mode,
+            on_submitted=lambda new_batch_id: manifest.advance(pdf_path, 'uploaded', batch_id=new_batch_id))
+        manifest.advance(pdf_path, 'converted', elapsed=time.time() - start_time, content_hash=pdf_processor.hash_of(pdf_path))
         logger.debug(f"[{paper_id}] PDF converted in {time.time() - start_time:.2f}s")
+
+        # 与已总结论文近似重复时复用其总结 (在预处理前对原始正文签名)
+        dedup = llm_handler.dedup
+        signature = dedup.signature(md_content) if dedup else None
+        match = dedup.find(signature, mode, exclude=pdf_path) if dedup else None
+        if match:
+            save_duplicate_summary(output_path, paper_info, mode, match, dedup.action)
+            manifest.advance(pdf_path, 'summarized')
+            metrics.observe('paper', time.monotonic() - paper_start)
+            metrics.count('near_duplicates')
+            metrics.count('papers')
+            logger.success(f"[{paper_id}] Near-duplicate of {match['file_path']} "
+                           f"(similarity {match['similarity']:.2f}), summary reused at {output_path}")
+            return
         
         # 3. Build Prompt
         # 获取配置
-        remove_refs = config.get('processing_rules', {}).get('remove_references', True)
-        prompt = PromptBuilder.build_summary_prompt(md_content, mode, remove_refs=remove_refs)
-        
-        # 4. LLM Extraction
-        summary = llm_handler.summarize(prompt)
-        
-        # 5. Save Result
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(f"# Summary: {file_name}\n")
-            f.write(f"- **ID**: {paper_id}\n")
-            f.write(f"- **Mode**: {mode}\n")
-            f.write(f"- **Date**: {time.strftime('%Y-%m-%d')}\n\n")
-            f.write(summary)
+        start_time = time.time()
+        # 去除参考文献、图片链接、页眉页脚等 (见 processing_rules.preprocess)
+        preprocessor = MarkdownPreprocessor.from_config(config.get('processing_rules', {}), llm_handler.token_counter)
+        md_content = preprocessor.run(md_content, f"[{paper_id}] ")
+        map_reducer = MapReduceSummarizer(config, llm_handler) if MapReduceSummarizer.enabled_for(config, mode) else None
+
+        if map_reducer and map_reducer.needs_split(md_content, mode):
+            # 超长论文先分块总结, 再由 reduce Prompt 合并
+            prompt = map_reducer.build_reduce_prompt(md_content, mode)
+        else:
+            prompt = PromptBuilder.build_summary_prompt(md_content, mode, remove_refs=False, budget=llm_handler.budget)
+        manifest.advance(pdf_path, 'prompted', elapsed=time.time() - start_time)
+
+        if llm_batch is not None:
+            llm_batch.add(pdf_path, prompt, {'paper': paper_info, 'mode': mode, 'output_path': output_path,
+                                             'started': paper_start, 'signature': signature}, mode)
+            return
+
+        # 4. LLM Extraction & 5. Save Result
+        start_time = time.time()
+        if llm_handler.stream:
+            llm_handler.stream_to_file(prompt, output_path, summary_header(paper_info, mode))
+        else:
+            summary = llm_handler.summarize(prompt)
+            save_summary(output_path, paper_info, mode, summary)
+        manifest.advance(pdf_path, 'summarized', elapsed=time.time() - start_time)
+        if dedup:
+            dedup.add(pdf_path, mode, output_path, signature)
             
+        metrics.observe('paper', time.monotonic() - paper_start)
+        metrics.count('papers')
         logger.success(f"[{paper_id}] Summary saved to {output_path}")
 
         
         
     except Exception as e:
+        metrics.count('failures')
         logger.error(f"[{paper_id}] Failed: {str(e)}")
+        manifest.fail(pdf_path, e)
+
+
+def finish_batch_summary(context, manifest, llm_handler, content=None, usage=None, error=None):
+    """
+    Batch API 模式下单篇论文的结果回调: 写出总结文件或记录失败
+    context: _process_paper 交给 LLMBatch.add 的上下文
+    """
+    paper_info, mode, output_path = context['paper'], context['mode'], context['output_path']
+    mode_token = current_mode.set(mode)
+    try:
+        if error is not None:
+            metrics.count('failures')
+            logger.error(f"[{paper_info['id']}] Failed: {error}")
+            manifest.fail(paper_info['file_path'], error)
+            return
+        metrics.usage(usage)
+        save_summary(output_path, paper_info, mode, content)
+        manifest.advance(paper_info['file_path'], 'summarized')
+        if llm_handler.dedup:
+            llm_handler.dedup.add(paper_info['file_path'], mode, output_path, context['signature'])
+        metrics.observe('paper', time.monotonic() - context['started'])
+        metrics.count('papers')
+        logger.success(f"[{paper_info['id']}] Summary saved to {output_path}")
+    finally:
+        current_mode.reset(mode_token)
+
+
+def run_thread_mode(papers, config, pdf_processor, llm_handler, manifest, max_workers, on_complete, llm_batch=None):
+    """
+    线程池模式: 边发现边提交, 每个线程依次完成单篇论文的转换与总结
+    """
+    pbar = tqdm(total=0)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for paper in papers:
+            # 进度按估计的工作量计 (未启用调度时每篇为 1)
+            pbar.total += paper.get('work', 1)
+            pbar.refresh()
+            future = executor.submit(process_single_paper, paper, config, pdf_processor, llm_handler, manifest,
+                                     queued_at=time.monotonic(), llm_batch=llm_batch)
+            future.add_done_callback(lambda _, paper=paper: (on_complete(paper), pbar.update(paper.get('work', 1))))
+    pbar.close()
+
+
+def run_batch_mode(papers, config, pdf_processor, llm_handler, manifest, max_workers, llm_batch=None):
+    """
+    批量转换模式: 未处理的 PDF 统一提交给 MinerU, 每篇转换完成后立即交给线程池做 LLM 总结
+    """
+    rules = config['processing_rules']
+    pending = [p for p in papers if not os.path.exists(get_output_path(p, determine_mode(p['id'], rules)))]
+    logger.info(f"批量转换模式: {len(pending)} 篇待转换, {len(papers) - len(pending)} 篇已有总结。")
+    by_path = {p['file_path']: p for p in pending}
+
+    # 上次运行中已提交但未完成的批次
+    attached = {}
+    for paper in pending:
+        mode = determine_mode(paper['id'], rules)
+        manifest.discover(paper, mode, get_output_path(paper, mode))
+        record = manifest.get(paper['file_path'])
+        if record['stage'] == 'uploaded' and record['batch_id']:
+            attached[paper['file_path']] = record['batch_id']
+
+    pbar = tqdm(total=sum(p.get('work', 1) for p in papers))
+    futures = []
+    # 已有总结的论文也经过 process_single_paper, 以便登记到运行清单
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit(paper):
+            future = executor.submit(process_single_paper, paper, config, pdf_processor, llm_handler, manifest,
+                                     queued_at=time.monotonic(), llm_batch=llm_batch)
+            future.add_done_callback(lambda _: pbar.update(paper.get('work', 1)))
+            futures.append(future)
+
+        def on_error(pdf_path, message):
+            metrics.count('failures')
+            logger.error(f"[{by_path[pdf_path]['id']}] Failed: {message}")
+            manifest.fail(pdf_path, message)
+            pbar.update(by_path[pdf_path].get('work', 1))
+
+        def on_submitted(pdf_path, batch_id):
+            manifest.advance(pdf_path, 'uploaded', batch_id=batch_id)
 
+        for paper in papers:
+            if paper['file_path'] not in by_path:
+                submit(paper)
+        pdf_processor.convert_batch(list(by_path), on_done=lambda pdf_path: submit(by_path[pdf_path]),
+                                    on_error=on_error, attached=attached, on_submitted=on_submitted,
+                                    modes={path: determine_mode(paper['id'], rules) for path, paper in by_path.items()})
+        wait(futures)
+    pbar.close()
+
+
+def run_coordinator(papers, queue, config, on_complete):
+    """
+    分布式协调者: 将发现的论文加入共享队列, 可选等待所有 worker 处理完成
+    返回是否已等待完成 (决定能否合并)
+    """
+    dist = config.get('distributed', {})
+    queue.reopen()
+    enqueued = []
+    for paper in papers:
+        if queue.enqueue(paper):
+            enqueued.append(paper)
+    queue.close()
+    logger.info(f"协调者: 新加入 {len(enqueued)} 篇论文, 队列状态: {queue.counts()}")
+    if not dist.get('wait', True):
+        return False
+
+    counts = queue.counts()
+    pbar = tqdm(total=sum(counts.values()), initial=counts.get('done', 0) + counts.get('failed', 0))
+    while not queue.drained():
+        time.sleep(dist.get('poll_interval', 5))
+        counts = queue.counts()
+        pbar.n = counts.get('done', 0) + counts.get('failed', 0)
+        pbar.set_postfix(leased=counts.get('leased', 0), failed=counts.get('failed', 0))
+    pbar.close()
+    for paper in enqueued:
+        on_complete(paper)
+    return True
+
+
+def run_worker(config, queue, pdf_processor, llm_handler, manifest, max_workers, worker_id):
+    """
+    分布式 worker: max_workers 个线程各自从共享队列领取论文, 依次完成转换与总结并上报结果
+    后台线程为持有的任务定期心跳续约; 协调者已加入全部任务且队列清空后退出
+    """
+    dist = config.get('distributed', {})
+    held = set()
+    held_lock = threading.Lock()
+    stopped = threading.Event()
+    pbar = tqdm(desc=worker_id)
+
+    def heartbeat():
+        while not stopped.wait(dist.get('heartbeat_interval', 60)):
+            with held_lock:
+                file_paths = list(held)
+            for file_path in queue.heartbeat(worker_id, file_paths):
+                logger.warning(f"[{worker_id}] Lease on {file_path} was taken over by another worker")
+
+    def work():
+        while True:
+            task = queue.lease(worker_id)
+            if task is None:
+                if queue.sealed() and queue.drained():
+                    return
+                time.sleep(dist.get('poll_interval', 5))
+                continue
+            paper, enqueued_at = task
+            with held_lock:
+                held.add(paper['file_path'])
+            try:
+                # 入队时间为墙上时间, 换算为本机单调时钟以统计排队时长
+                process_single_paper(paper, config, pdf_processor, llm_handler, manifest,
+                                     queued_at=time.monotonic() - max(0.0, time.time() - enqueued_at))
+                record = manifest.get(paper['file_path'])
+                if record and record['status'] == 'done':
+                    queue.complete(worker_id, paper['file_path'], output_path=record['output_path'])
+                else:
+                    queue.complete(worker_id, paper['file_path'], error=(record or {}).get('error') or 'unknown error')
+            except Exception as e:
+                logger.error(f"[{paper['id']}] Failed: {e}")
+                queue.complete(worker_id, paper['file_path'], error=str(e))
+            finally:
+                with held_lock:
+                    held.discard(paper['file_path'])
+                pbar.update(1)
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(work) for _ in range(max_workers)]:
+                future.result()
+    finally:
+        stopped.set()
+        pbar.close()
+
+
+def share_rate_limits(config, queue, pdf_processor, llm_handler):
+    """
+    分布式 worker 使用队列数据库中的共享限流状态, 所有 worker 合计遵守同一 API Key 的速率上限
+    """
+    for endpoint in llm_handler.endpoints.values():
+        endpoint.limiter = SharedRateLimiter(queue.db_path, f"llm:{endpoint.base_url}", endpoint.limiter.rpm,
+                                             endpoint.limiter.tpm)
+    if hasattr(pdf_processor.processor, 'limiter'):
+        pdf_processor.processor.limiter = SharedRateLimiter(
+            queue.db_path, 'mineru', config['api']['mineru'].get('requests_per_minute', 0))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PaperWorkflow: MinerU + LLM 论文总结工作流")
+    parser.add_argument("--config", default="config.yaml", help="配置文件路径")
+    parser.add_argument("--cache-stats", action="store_true", help="输出 MinerU 转换缓存统计后退出")
+    parser.add_argument("--retry-failed", action="store_true", help="只重新处理运行清单中记录为失败的论文")
+    parser.add_argument("--role", choices=["standalone", "coordinator", "worker"], default="standalone",
+                        help="分布式模式: coordinator 将论文加入共享队列, worker 从队列领取并处理 (见配置 distributed)")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}", help="worker 名称, 默认为 主机名-进程号")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
 
-def main():
     # Setup Logger
     logger.add("logs/workflow_{time}.log", rotation="500 MB")
     
     # Load Config
-    if not os.path.exists("config.yaml"):
+    if not os.path.exists(args.config):
         logger.error("Config file not found!")
         return
-    config = load_config()
+    config = load_config(args.config)
+
+    if args.cache_stats:
+        cache = ConversionCache(config['paths']['temp_dir'], config.get('cache', {}).get('max_size_mb', 0))
+        stats = cache.stats()
+        cache.close()
+        response_cache = ResponseCache.from_config(config)
+        if response_cache is not None:
+            stats['llm'] = response_cache.stats()
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return
     
     # Initialize Handlers
     try:
@@ -100,29 +375,147 @@ def main():
         logger.error(f"Initialization failed: {e}")
         return
 
+    manifest = RunManifest(config['paths'].get('manifest_db') or os.path.join(config['paths']['temp_dir'], 'manifest.db'))
+
+    # 分布式模式: 协调者与各 worker 共享同一个队列数据库 (含 MinerU / LLM 的全局限流状态)
+    queue = None
+    if args.role != 'standalone':
+        dist = config.get('distributed', {})
+        queue = WorkQueue(dist.get('queue_path') or os.path.join(config['paths']['temp_dir'], 'work_queue.db'),
+                          visibility_timeout=dist.get('visibility_timeout', 600), max_attempts=dist.get('max_attempts', 3))
+
     # Find Files
     input_dir = config['paths']['input_dir']
-    if not os.path.exists(input_dir):
+    discovery = config.get('discovery', {})
+    file_index = None
+    if args.role == 'worker':
+        papers = []
+    elif args.retry_failed and queue is not None:
+        papers = []
+        logger.info(f"重试模式: 队列中 {queue.requeue_failed()} 篇失败论文已重新排队。")
+    elif args.retry_failed:
+        papers = [p for p in manifest.failed_papers() if os.path.exists(p['file_path'])]
+        logger.info(f"重试模式: 运行清单中共有 {len(papers)} 篇失败论文。")
+    elif not os.path.exists(input_dir):
         logger.error(f"Input directory not found: {input_dir}")
         return
-    papers = find_pdf_files(input_dir)
-    # file_paths = [item['file_path'] for item in papers]
-    # print(file_paths)
-    # return
-    logger.info(f"共找到 {len(papers)} 篇论文待处理。")
+    else:
+        if discovery.get('incremental', False):
+            file_index = FileIndex(discovery.get('snapshot_path') or os.path.join(config['paths']['temp_dir'], 'file_index.json'))
+        # 生成器: 边遍历边交给处理流程
+        papers = discover_papers(input_dir, file_index, watch=discovery.get('watch', False),
+                                 interval=discovery.get('watch_interval', 30), workers=discovery.get('scan_workers', 8),
+                                 min_age=discovery.get('watch_min_age', 10))
+
+    # 调度: 预扫描页数与大小, 按优先级、截止时间与工作量排序 (需要完整列表, 监视模式下不排序)
+    scheduler = PaperScheduler(config.get('processing_rules', {}))
+    if scheduler.enabled and args.role != 'worker':
+        if discovery.get('watch', False) and not args.retry_failed:
+            logger.warning("监视模式下不对论文排序, 按发现顺序处理。")
+        else:
+            papers = scheduler.schedule(papers)
     logger.info(f"本项目已在github开源, 仓库地址:https://github.com/SimCr/PaperWorkflow")
+
+    # 记录本次实际处理的论文, 供合并阶段使用
+    processed = []
+    def track(papers):
+        for paper in papers:
+            processed.append(paper)
+            yield paper
+
+    def on_complete(paper):
+        if scheduler.deadlines:
+            record = manifest.get(paper['file_path'])
+            if record and record['status'] == 'done':
+                scheduler.check_deadline(paper)
+        # 处理完成 (含已存在而跳过) 的论文登记到输入快照; 失败的论文下次运行仍会被发现
+        if file_index is not None:
+            if queue is not None:
+                done = queue.state(paper['file_path']) == 'done'
+            else:
+                record = manifest.get(paper['file_path'])
+                done = bool(record) and record['status'] == 'done'
+            if done:
+                file_index.commit(paper, pdf_processor.hash_of(paper['file_path']))
     
+    # Batch API 模式: 转换与 Prompt 构建照常并发进行, 总结统一通过 Batch API 提交
+    llm_batch = None
+    if LLMBatch.enabled(config):
+        if args.role != 'standalone' or config['concurrency'].get('engine', 'thread') == 'async':
+            logger.warning("LLM Batch API 模式仅支持单机 thread 引擎, 本次使用实时请求。")
+        else:
+            llm_batch = LLMBatch(config, llm_handler)
+
     # Concurrent Processing
     max_workers = config['concurrency']['max_workers']
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 使用 list 强制执行，配合 tqdm 显示进度
-        list(tqdm(executor.map(lambda p: process_single_paper(p, config, pdf_processor, llm_handler), papers), total=len(papers)))
+    merge_ready = True
+    try:
+        if args.role == 'coordinator':
+            merge_ready = run_coordinator(track(papers), queue, config, on_complete)
+        elif args.role == 'worker':
+            # 合并由协调者完成
+            merge_ready = False
+            share_rate_limits(config, queue, pdf_processor, llm_handler)
+            run_worker(config, queue, pdf_processor, llm_handler, manifest, max_workers, args.worker_id)
+        elif config['concurrency'].get('engine', 'thread') == 'async':
+            AsyncPipeline(config, pdf_processor, llm_handler, manifest, on_complete=on_complete).run(track(papers))
+        elif config['api']['mineru'].get('batch_mode', False):
+            # 批量提交需要完整列表
+            papers = list(track(papers))
+            logger.info(f"共找到 {len(papers)} 篇论文待处理。")
+            run_batch_mode(papers, config, pdf_processor, llm_handler, manifest, max_workers, llm_batch)
+            for paper in papers:
+                on_complete(paper)
+        else:
+            run_thread_mode(track(papers), config, pdf_processor, llm_handler, manifest, max_workers, on_complete,
+                            llm_batch)
+        if llm_batch is not None:
+            def on_result(context, content=None, usage=None, error=None):
+                finish_batch_summary(context, manifest, llm_handler, content, usage, error)
+                on_complete(context['paper'])
+            llm_batch.run(on_result)
+    finally:
+        if file_index is not None:
+            file_index.save()
+        pdf_processor.close()
+        llm_handler.close()
+    logger.info(f"本次共处理 {len(processed)} 篇论文。")
+    timer = getattr(pdf_processor.processor, 'timer', None)
+    if timer is not None and timer.totals():
+        logger.info(f"MinerU 各状态耗时: {json.dumps(timer.totals(), ensure_ascii=False)}")
+
+    # 服务端前缀缓存命中率 (输入 token 中命中缓存的比例)
+    modes = metrics.summary()['modes'].values()
+    prompt_tokens = sum(values.get('prompt_tokens', 0) for values in modes)
+    if prompt_tokens:
+        cached_tokens = sum(values.get('cached_tokens', 0) for values in modes)
+        logger.info(f"LLM 前缀缓存命中: {cached_tokens}/{prompt_tokens} 输入 token ({cached_tokens / prompt_tokens:.1%})")
+
+    # 运行报告: 各阶段 p50/p95 耗时、token 用量、缓存命中、吞吐量与估算成本
+    metrics_conf = config.get('metrics', {})
+    if metrics_conf.get('report_dir'):
+        metrics.write_report(metrics_conf['report_dir'], metrics_conf.get('pricing'))
+    if metrics_conf.get('prometheus_textfile'):
+        metrics.write_prometheus(metrics_conf['prometheus_textfile'], metrics_conf.get('pricing'))
 
     # Optional Post-Processing Steps
-    # 1.合并所有Markdown文件
-    if config.get('processing_rules', {}).get('is_merger_md', False):
+    # 1.合并所有Markdown文件 (包括本次跳过的已有总结)
+    rules = config.get('processing_rules', {})
+    if rules.get('is_merger_md', False) and merge_ready:
         logger.info("正在合并所有Markdown文件...")
-        merge_markdown_files(md_outputs, os.path.join(config['paths']['merge_output_dir'], f"Merged_Summaries+{time.strftime('%Y%m%d')}.md"))
+        if rules.get('merge_source', 'manifest') == 'disk':
+            md_outputs = discover_summaries(input_dir)
+        else:
+            # 增量、重试与分布式模式下本次处理的只是部分论文 (协调者本身不处理), 合并清单中全部已完成的总结;
+            # 分布式模式下以队列为准
+            source = queue if queue is not None else manifest
+            complete = file_index is not None or args.retry_failed or queue is not None
+            md_outputs = source.summaries(None if complete else [p['file_path'] for p in processed])
+        merge_dir = config['paths']['merge_output_dir']
+        merge_markdown_files(md_outputs, os.path.join(merge_dir, f"Merged_Summaries+{time.strftime('%Y%m%d')}.md"))
+        if rules.get('merge_per_id', False):
+            merge_per_id(md_outputs, merge_dir, time.strftime('%Y%m%d'))
+        manifest.mark_merged([item['path'] if isinstance(item, dict) else item for item in md_outputs])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.metrics import metrics, current_mode
+from bench.fake_openai import FakeOpenAI, serve
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    token = current_mode.set(None)
+    yield metrics
+    current_mode.reset(token)
+
+
+@pytest.fixture
+def fake_openai():
+    """
+    本地模拟的 OpenAI 接口, 返回 (state, base_url); 默认无延迟
+    """
+    state = FakeOpenAI(ttft='fixed:0', tokens_per_sec=1e6, output_tokens=300)
+    server, base_url = serve(state)
+    yield state, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def llm_config(base_url, tmp_path, **llm):
+    """
+    最小的 LLMHandler 配置, llm 中的项覆盖 api.llm
+    """
+    conf = {'api_key': 'sk-test', 'base_url': base_url, 'model_name': 'test-model',
+            'max_retries': 2, 'backoff_base': 0.01, 'backoff_max': 0.05}
+    conf.update(llm)
+    return {'api': {'llm': conf}, 'paths': {'temp_dir': str(tmp_path)}, 'cache': {'llm': {'mode': 'off'}}}
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import os
+
+from utils.async_pipeline import AsyncPipeline
+from utils.run_manifest import RunManifest
+
+
+class FakeMinerU:
+    """
+    远程 MinerU 的替身: 上传与轮询各等待片刻, 记录提交过的 PDF
+    """
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.uploaded = []
+
+    async def upload_async(self, http, pdf_path, entry_dir):
+        self.uploaded.append(os.path.basename(pdf_path))
+        if pdf_path in self.fail:
+            await asyncio.sleep(0.1)
+            raise RuntimeError("upload rejected")
+        await asyncio.sleep(0.01)
+        return "batch", "data", pdf_path, entry_dir
+
+    async def poll_async(self, http, batch_id, data_id, file_name, target_dir, pdf_path=None):
+        await asyncio.sleep(0.05)
+
+
+class FakePDFProcessor:
+    def __init__(self, processor):
+        self.processor = processor
+        self.cache = self
+        self.results = {}
+
+    def hash_of(self, pdf_path):
+        with open(pdf_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def entry_dir(self, sha):
+        return sha
+
+    def _check_cache(self, sha, file_name):
+        return self.results.get(sha)
+
+    def fast_path(self, pdf_path, mode, sha):
+        return None
+
+    def register_result(self, sha, file_name):
+        with open(file_name, 'rb') as f:
+            self.results[sha] = f"# {f.read().decode()}"
+        return self.results[sha]
+
+
+class FakeLLM:
+    dedup = None
+    stream = False
+    token_counter = None
+    budget = None
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+
+    async def asummarize(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        return "summary"
+
+
+def papers(tmp_path, contents):
+    items = []
+    for i, content in enumerate(contents):
+        folder = tmp_path / f"{i:03d}"
+        os.makedirs(folder)
+        (folder / "paper.pdf").write_bytes(content.encode())
+        items.append({'id': f"{i:03d}", 'folder_path': str(folder), 'file_path': str(folder / "paper.pdf"),
+                      'file_name': "paper.pdf"})
+    return items
+
+
+def pipeline(tmp_path, mineru, llm, workers=2, queue_size=2):
+    config = {'processing_rules': {'default_mode': 'skim'},
+              'concurrency': {'async': {**{f'{stage}_workers': workers for stage in AsyncPipeline.STAGES},
+                                        'queue_size': queue_size}}}
+    done = []
+    manifest = RunManifest(str(tmp_path / "manifest.db"))
+    return AsyncPipeline(config, FakePDFProcessor(mineru), llm, manifest, on_complete=done.append), manifest, done
+
+
+def test_duplicate_pdfs_are_converted_once(tmp_path):
+    mineru, llm = FakeMinerU(), FakeLLM()
+    items = papers(tmp_path, ["same", "same", "other", "same"])
+    runner, manifest, done = pipeline(tmp_path, mineru, llm, workers=4)
+    runner.run(items)
+
+    assert sorted(mineru.uploaded) == ["paper.pdf", "paper.pdf"]
+    assert len(done) == 4
+    for paper in items:
+        assert os.path.exists(os.path.join(paper['folder_path'], "Summary_skim_paper.md"))
+        assert manifest.get(paper['file_path'])['status'] == 'done'
+    assert sum("# same" in prompt for prompt in llm.prompts) == 3
+
+
+def test_failed_stage_does_not_stop_other_papers(tmp_path):
+    items = papers(tmp_path, ["a", "b", "c"])
+    # 失败的论文与另一篇内容相同: 等待其结果的论文一同失败
+    items += papers(tmp_path / "dup", ["b"])
+    mineru = FakeMinerU(fail=[items[1]['file_path']])
+    runner, manifest, done = pipeline(tmp_path, mineru, FakeLLM())
+    runner.run(items)
+
+    assert len(done) == 4
+    statuses = [manifest.get(paper['file_path'])['status'] for paper in items]
+    assert statuses == ['done', 'failed', 'done', 'failed']
+    assert "upload rejected" in manifest.get(items[3]['file_path'])['error']
+    assert len(mineru.uploaded) == 3
+
+
+def test_single_worker_keeps_order_and_queues_stay_bounded(tmp_path):
+    items = papers(tmp_path, [f"paper {i}" for i in range(20)])
+    llm = FakeLLM(delay=0.02)
+    runner, _, done = pipeline(tmp_path, FakeMinerU(), llm, workers=1, queue_size=1)
+    taken = []
+
+    def source():
+        for paper in items:
+            taken.append(paper['id'])
+            yield paper
+
+    finished_when = []
+    runner.on_complete = lambda paper: (done.append(paper['id']), finished_when.append(len(taken)))
+    runner.run(source())
+
+    assert done == [paper['id'] for paper in items]
+    assert [prompt.split("# paper ")[1].split()[0] for prompt in llm.prompts] == [str(i) for i in range(20)]
+    # 背压: 第一篇完成时, 取出的论文不超过各阶段 worker 与队列容量之和
+    assert finished_when[0] <= 2 * len(AsyncPipeline.STAGES) + 1
@@ -0,0 +1,22 @@
+import pytest
+
+from bench.run_bench import parse_args, run
+
+FAST = ['--papers', '6', '--ids', '2', '--pages', '2', '--md-kb', '8', '--image-kb', '1', '--workers', '4',
+        '--mineru-latency', 'fixed:0.05', '--ttft', 'fixed:0.01', '--tps', '100000', '--output-tokens', '50',
+        '--batch-latency', 'fixed:0.2']
+
+
+@pytest.mark.parametrize('extra', [
+    [],
+    ['--engine', 'async'],
+    ['--batch-mode', '--stream', '--duplicate-ratio', '0.3'],
+    ['--llm-mode', 'batch'],
+], ids=['thread', 'async', 'batch-stream', 'llm-batch'])
+def test_end_to_end_against_fake_servers(tmp_path, monkeypatch, extra):
+    # main 在当前目录下写日志
+    monkeypatch.chdir(tmp_path)
+    result = run(parse_args(FAST + extra + ['--work-dir', str(tmp_path / 'work'), '--out', str(tmp_path / 'r.json')]))
+    assert result['completed'] == 6
+    assert result['failures'] == 0
+    assert result['llm_requests'] >= 1
@@ -0,0 +1,99 @@
+import os
+import time
+import multiprocessing
+
+from utils.conversion_cache import ConversionCache
+
+
+def add_entry(cache, sha, size=1024):
+    entry = cache.entry_dir(sha)
+    os.makedirs(entry, exist_ok=True)
+    md_path = os.path.join(entry, f"{sha}.md")
+    with open(md_path, 'wb') as f:
+        f.write(b"x" * size)
+    cache.put(sha, md_path, "v1")
+    return md_path
+
+
+def age(cache, sha, seconds):
+    cache._conn.execute("UPDATE entries SET last_access = last_access - ? WHERE sha = ?", (seconds, sha))
+
+
+def test_get_put_and_missing_file(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    assert cache.get("a") is None
+    md_path = add_entry(cache, "a")
+    assert cache.get("a") == md_path
+    os.remove(md_path)
+    assert cache.get("a") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_eviction_skips_recently_used(tmp_path):
+    cache = ConversionCache(str(tmp_path), max_size_mb=2.5 / 1024)  # 约 2.5 KB
+    for sha in ("a", "b"):
+        add_entry(cache, sha)
+        age(cache, sha, 3600)
+    cache.get("a")
+    cache.flush()
+    add_entry(cache, "c")
+
+    # b 最久未访问且超出保护期, 被淘汰; a 刚被访问过
+    assert cache.get("b") is None and not os.path.exists(cache.entry_dir("b"))
+    assert cache.get("a") and cache.get("c")
+
+
+def test_recent_entries_are_never_evicted(tmp_path):
+    cache = ConversionCache(str(tmp_path), max_size_mb=1 / 1024)
+    add_entry(cache, "a")
+    add_entry(cache, "b")
+    assert cache.stats()['entries'] == 2
+
+
+def test_hits_are_written_in_batches(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    add_entry(cache, "a")
+    before = cache._conn.execute("SELECT last_access FROM entries").fetchone()[0]
+    time.sleep(0.01)
+    cache.get("a")
+    assert cache._conn.execute("SELECT last_access FROM entries").fetchone()[0] == before
+    cache.flush()
+    assert cache._conn.execute("SELECT last_access FROM entries").fetchone()[0] > before
+
+
+def test_close_writes_pending_hits(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    add_entry(cache, "a")
+    before = cache._conn.execute("SELECT last_access FROM entries").fetchone()[0]
+    time.sleep(0.01)
+    cache.get("a")
+    cache.close()
+    reopened = ConversionCache(str(tmp_path))
+    assert reopened._conn.execute("SELECT last_access FROM entries").fetchone()[0] > before
+
+
+def test_stale_entry_is_touched_immediately(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    add_entry(cache, "a")
+    age(cache, "a", ConversionCache.EVICT_GRACE)
+    cache.get("a")
+    assert not cache._touched
+    assert cache._conn.execute("SELECT last_access FROM entries").fetchone()[0] > time.time() - 5
+
+
+def _worker(cache_dir, worker):
+    cache = ConversionCache(cache_dir)
+    for i in range(10):
+        add_entry(cache, f"{worker}-{i}", size=16)
+        assert cache.get(f"{worker}-{i}")
+
+
+def test_shared_index_across_processes(tmp_path):
+    ctx = multiprocessing.get_context('spawn')
+    procs = [ctx.Process(target=_worker, args=(str(tmp_path), w)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+    assert ConversionCache(str(tmp_path)).stats()['entries'] == 40
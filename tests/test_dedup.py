@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from utils.dedup import NearDuplicateIndex
+
+
+def words(seed, count=2000):
+    rng = random.Random(seed)
+    return [f"w{rng.randrange(5000)}" for _ in range(count)]
+
+
+def edit(tokens, every):
+    # 每 every 个词替换一个, 5 词 shingle 中约 5/every 发生变化
+    return [f"x{i}" if i % every == 0 else token for i, token in enumerate(tokens)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return NearDuplicateIndex(str(tmp_path / 'dedup.db'), threshold=0.8)
+
+
+@pytest.fixture
+def summary(tmp_path):
+    path = tmp_path / 'Summary_skim_a.md'
+    path.write_text("summary", encoding='utf-8')
+    return str(path)
+
+
+def test_near_duplicate_found(index, summary):
+    base = words(1)
+    index.add('a.pdf', 'skim', summary, index.signature(" ".join(base)))
+
+    match = index.find(index.signature(" ".join(edit(base, 200))), 'skim')
+    assert match['file_path'] == 'a.pdf' and match['output_path'] == summary
+    assert match['similarity'] > 0.9
+
+
+def test_below_threshold_not_matched(index, summary):
+    base = words(1)
+    index.add('a.pdf', 'skim', summary, index.signature(" ".join(base)))
+    assert index.find(index.signature(" ".join(edit(base, 8))), 'skim') is None
+    assert index.find(index.signature(" ".join(words(2))), 'skim') is None
+
+
+def test_threshold_boundary(tmp_path, summary):
+    base = words(1)
+    edited = edit(base, 40)
+    strict = NearDuplicateIndex(str(tmp_path / 'strict.db'), threshold=0.95)
+    loose = NearDuplicateIndex(str(tmp_path / 'loose.db'), threshold=0.6)
+    for index in (strict, loose):
+        index.add('a.pdf', 'skim', summary, index.signature(" ".join(base)))
+    # 约 12% 的 shingle 变化, 估计 Jaccard 约 0.78
+    assert strict.find(strict.signature(" ".join(edited)), 'skim') is None
+    assert 0.6 <= loose.find(loose.signature(" ".join(edited)), 'skim')['similarity'] < 0.95
+
+
+def test_mode_exclude_and_missing_output(index, summary, tmp_path):
+    text = " ".join(words(1))
+    signature = index.signature(text)
+    index.add('a.pdf', 'skim', summary, signature)
+    assert index.find(signature, 'deep_read') is None
+    assert index.find(signature, 'skim', exclude='a.pdf') is None
+    assert index.find(signature, 'skim')['similarity'] == 1.0
+
+    index.add('b.pdf', 'skim', str(tmp_path / 'deleted.md'), index.signature(" ".join(words(3))))
+    assert index.find(index.signature(" ".join(words(3))), 'skim') is None
+
+
+def test_short_text_has_no_signature(index):
+    assert index.signature("too short to compare") is None
+    assert index.find(None, 'skim') is None
+
+
+def test_signature_stable_across_instances(tmp_path):
+    text = " ".join(words(1))
+    first = NearDuplicateIndex(str(tmp_path / 'a.db'))
+    second = NearDuplicateIndex(str(tmp_path / 'b.db'))
+    assert (first.signature(text) == second.signature(text)).all()
+
+
+def test_parameter_change_rebuilds_index(tmp_path, summary):
+    db_path = str(tmp_path / 'dedup.db')
+    index = NearDuplicateIndex(db_path)
+    signature = index.signature(" ".join(words(1)))
+    index.add('a.pdf', 'skim', summary, signature)
+
+    rebuilt = NearDuplicateIndex(db_path, num_perm=64, bands=16)
+    assert rebuilt._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0] == 0
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(db_path, num_perm=100, bands=32)
+
+
+def test_from_config(tmp_path):
+    config = {'paths': {'temp_dir': str(tmp_path)}, 'processing_rules': {}}
+    assert NearDuplicateIndex.from_config(config) is None
+    config['processing_rules']['dedup'] = {'enabled': True, 'threshold': 0.9}
+    index = NearDuplicateIndex.from_config(config)
+    assert index.threshold == 0.9
+    assert (tmp_path / 'dedup.db').exists()
@@ -0,0 +1,71 @@
+import os
+import time
+import threading
+
+from utils.file_index import discover_papers, FileIndex
+
+
+def make_pdf(root, paper_id, name, data=b"%PDF-1.4\n"):
+    folder = root / paper_id
+    folder.mkdir(exist_ok=True)
+    path = folder / name
+    path.write_bytes(data)
+    return path
+
+
+def test_discover_without_watch_yields_everything(tmp_path):
+    make_pdf(tmp_path, "1", "a.pdf")
+    make_pdf(tmp_path, "2", "b.PDF")
+    papers = list(discover_papers(str(tmp_path)))
+    assert sorted((p['id'], p['file_name']) for p in papers) == [("1", "a.pdf"), ("2", "b.PDF")]
+
+
+def test_watch_waits_for_min_age(tmp_path):
+    make_pdf(tmp_path, "1", "a.pdf")
+    start = time.time()
+    paper = next(discover_papers(str(tmp_path), watch=True, interval=0.02, min_age=0.3))
+    assert paper['file_name'] == "a.pdf"
+    assert time.time() - start >= 0.25
+
+
+def test_watch_yields_existing_files_on_first_scan(tmp_path):
+    path = make_pdf(tmp_path, "1", "a.pdf")
+    old = time.time() - 60
+    os.utime(path, (old, old))
+    start = time.time()
+    paper = next(discover_papers(str(tmp_path), watch=True, interval=30, min_age=10))
+    assert paper['file_name'] == "a.pdf"
+    assert time.time() - start < 5
+
+
+def test_watch_skips_file_still_being_written(tmp_path):
+    path = make_pdf(tmp_path, "1", "a.pdf")
+    done = threading.Event()
+
+    def grow():
+        for _ in range(15):
+            with open(path, 'ab') as f:
+                f.write(b"x" * 1024)
+            time.sleep(0.02)
+        done.set()
+
+    writer = threading.Thread(target=grow)
+    writer.start()
+    paper = next(discover_papers(str(tmp_path), watch=True, interval=0.05, min_age=0.1))
+    writer.join()
+    assert done.is_set()
+    assert paper['size'] == os.path.getsize(path)
+
+
+def test_incremental_index_skips_unchanged(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    path = make_pdf(input_dir, "1", "a.pdf")
+    index = FileIndex(str(tmp_path / "file_index.json"))
+    (paper,) = discover_papers(str(input_dir), index)
+    index.commit(paper, "sha")
+    index.save()
+
+    assert list(discover_papers(str(input_dir), FileIndex(str(tmp_path / "file_index.json")))) == []
+    path.write_bytes(b"%PDF-1.4\nchanged")
+    assert len(list(discover_papers(str(input_dir), FileIndex(str(tmp_path / "file_index.json"))))) == 1
@@ -0,0 +1,48 @@
+import json
+
+from bench.fake_openai import FakeOpenAI, serve
+from conftest import llm_config
+from utils.llm_handler import LLMHandler
+from utils.llm_batch import LLMBatch
+
+
+def batch_models(state):
+    """
+    返回 fake 服务端收到的各批次中请求的模型列表
+    """
+    models = []
+    for batch, _, _ in state._batches.values():
+        lines = state._files[batch['input_file_id']].splitlines()
+        models.append(sorted(json.loads(line)['body']['model'] for line in lines))
+    return models
+
+
+def test_batch_routes_per_mode_and_groups_by_endpoint(fake_openai, tmp_path):
+    state, base_url = fake_openai
+    state.sample_batch_latency = lambda: 0
+    other = FakeOpenAI(ttft='fixed:0', tokens_per_sec=1e6, output_tokens=50, batch_latency='fixed:0')
+    server, other_url = serve(other)
+    try:
+        config = llm_config(base_url, tmp_path, mode='batch', batch={'poll_interval': 0.01},
+                            routing={'deep_read': ['big-model'],
+                                     'skim': [{'model': 'small-model', 'base_url': other_url}]})
+        config['cache']['llm'] = {'mode': 'read_write'}
+        handler = LLMHandler(config)
+        batch = LLMBatch(config, handler)
+        batch.add("a.pdf", "prompt a", "a", mode='deep_read')
+        batch.add("b.pdf", "prompt b", "b", mode='skim')
+        batch.add("c.pdf", "prompt c", "c", mode='skim')
+        results = {}
+        batch.run(lambda context, content=None, usage=None, error=None: results.setdefault(context, (content, error)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert batch_models(state) == [['big-model']]
+    assert batch_models(other) == [['small-model', 'small-model']]
+    assert all(content and error is None for content, error in results.values()) and len(results) == 3
+
+    # 缓存键使用各自路由的模型: 以对应模式查找时命中
+    assert handler._cache_lookup("prompt a", 'big-model')[1] is not None
+    assert handler._cache_lookup("prompt b", 'small-model')[1] is not None
+    assert handler._cache_lookup("prompt b", 'test-model')[1] is None
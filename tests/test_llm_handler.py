@@ -0,0 +1,101 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import llm_config
+from utils.llm_handler import LLMHandler, LLMError
+from utils.prompt_builder import PromptBuilder
+from utils.metrics import metrics
+
+PAPER = "\n\n".join(f"## Section {i}\n" + "The catalyst surface was relaxed with PBE. " * 40 for i in range(8))
+
+
+def totals():
+    return metrics.summary()['modes']['']
+
+
+def test_stream_records_usage_from_server(fake_openai, tmp_path):
+    state, base_url = fake_openai
+    handler = LLMHandler(llm_config(base_url, tmp_path, stream=True))
+    output = tmp_path / "Summary.md"
+
+    stats = handler.stream_to_file(PromptBuilder.build_summary_prompt(PAPER, 'skim', remove_refs=False), str(output))
+
+    assert stats['tokens'] == state.output_tokens
+    assert totals()['completion_tokens'] == state.output_tokens
+    assert totals()['prompt_tokens'] > 0
+    assert output.exists() and not os.path.exists(f"{output}.partial")
+
+
+def test_stream_prefix_cache_hit_rate_across_modes(fake_openai, tmp_path):
+    _, base_url = fake_openai
+    handler = LLMHandler(llm_config(base_url, tmp_path, stream=True))
+    for mode in ('skim', 'deep_read'):
+        prompt = PromptBuilder.build_summary_prompt(PAPER, mode, remove_refs=False)
+        handler.stream_to_file(prompt, str(tmp_path / f"Summary_{mode}.md"))
+
+    values = totals()
+    # 第二次请求与第一次共享到正文结束为止的前缀
+    assert values['cached_tokens'] > 0
+    assert 0.3 < values['prefix_cache_hit_rate'] < 0.5
+
+
+def test_non_stream_records_cached_tokens(fake_openai, tmp_path):
+    _, base_url = fake_openai
+    handler = LLMHandler(llm_config(base_url, tmp_path))
+    prompt = PromptBuilder.build_summary_prompt(PAPER, 'skim', remove_refs=False)
+    handler.summarize(prompt)
+    handler.summarize(prompt)
+    assert totals()['cached_tokens'] > 0
+
+
+def test_interrupted_stream_is_retried_and_leaves_no_partial(fake_openai, tmp_path):
+    state, base_url = fake_openai
+    state.stream_drop_rate = 1.0
+    handler = LLMHandler(llm_config(base_url, tmp_path, stream=True, max_retries=1))
+    output = tmp_path / "Summary.md"
+    try:
+        handler.stream_to_file("prompt", str(output))
+    except LLMError:
+        pass
+    else:
+        raise AssertionError("expected LLMError")
+    assert state.dropped == 2
+    assert not output.exists() and not os.path.exists(f"{output}.partial")
+
+
+def test_concurrent_identical_prompts_are_coalesced(fake_openai, tmp_path):
+    state, base_url = fake_openai
+    state.sample_ttft = lambda: 0.3
+    handler = LLMHandler(llm_config(base_url, tmp_path))
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(handler.summarize, ["same prompt"] * 4))
+    assert state.requests == 1
+    assert len(set(results)) == 1
+    assert totals()['llm_coalesced'] == 3
+
+
+def test_concurrent_identical_streams_write_every_output(fake_openai, tmp_path):
+    state, base_url = fake_openai
+    state.sample_ttft = lambda: 0.3
+    handler = LLMHandler(llm_config(base_url, tmp_path, stream=True))
+    outputs = [tmp_path / f"Summary_{i}.md" for i in range(3)]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda path: handler.stream_to_file("same prompt", str(path), "# header\n"), outputs))
+    assert state.requests == 1
+    contents = {path.read_text(encoding='utf-8') for path in outputs}
+    assert len(contents) == 1 and contents.pop().startswith("# header\nsummary")
+
+
+def test_async_identical_prompts_are_coalesced(fake_openai, tmp_path):
+    state, base_url = fake_openai
+    state.sample_ttft = lambda: 0.2
+    handler = LLMHandler(llm_config(base_url, tmp_path))
+
+    async def main():
+        return await asyncio.gather(*(handler.asummarize("same prompt") for _ in range(3)),
+                                    handler.asummarize("other prompt"))
+
+    results = asyncio.run(main())
+    assert state.requests == 2
+    assert results[0] == results[1] == results[2]
@@ -0,0 +1,97 @@
+import pytest
+
+from conftest import llm_config
+from bench.fake_openai import FakeOpenAI, serve
+from utils.llm_handler import LLMHandler
+from utils.llm_routing import HedgePolicy
+from utils.metrics import metrics, current_mode
+
+
+@pytest.fixture
+def backup_openai():
+    state = FakeOpenAI(ttft='fixed:0', tokens_per_sec=1e6, output_tokens=50)
+    server, base_url = serve(state)
+    yield state, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def test_hedge_disabled_by_default():
+    policy = HedgePolicy(None)
+    for _ in range(100):
+        policy.observe('m', 10)
+    assert policy.deadline('m') is None
+
+
+def test_hedge_needs_min_samples():
+    policy = HedgePolicy({'enabled': True, 'min_samples': 5, 'min_deadline': 0})
+    for _ in range(4):
+        policy.observe('m', 10)
+    assert policy.deadline('m') is None
+    policy.observe('m', 10)
+    assert policy.deadline('m') == 10
+    # 样本按模型分开统计
+    assert policy.deadline('other') is None
+
+
+def test_hedge_quantile_nearest_rank():
+    policy = HedgePolicy({'enabled': True, 'min_samples': 1, 'min_deadline': 0, 'quantile': 95})
+    for seconds in range(1, 101):
+        policy.observe('m', seconds)
+    assert policy.deadline('m') == 95
+    policy.quantile = 50
+    assert policy.deadline('m') == 50
+
+
+def test_hedge_deadline_clamped():
+    policy = HedgePolicy({'enabled': True, 'min_samples': 1, 'min_deadline': 5, 'max_deadline': 60})
+    policy.observe('fast', 0.5)
+    policy.observe('slow', 500)
+    assert policy.deadline('fast') == 5
+    assert policy.deadline('slow') == 60
+
+
+def test_hedge_window_keeps_recent_samples():
+    policy = HedgePolicy({'enabled': True, 'min_samples': 1, 'min_deadline': 0, 'window': 10})
+    for _ in range(10):
+        policy.observe('m', 100)
+    for _ in range(10):
+        policy.observe('m', 1)
+    assert policy.deadline('m') == 1
+
+
+def test_fallback_to_next_route(fake_openai, backup_openai, tmp_path):
+    primary, base_url = fake_openai
+    backup, backup_url = backup_openai
+    primary.rate_429 = 1.0
+    primary.retry_after_ms = 0
+    handler = LLMHandler(llm_config(base_url, tmp_path, max_retries=0, routing={
+        'skim': ['test-model', {'model': 'backup-model', 'base_url': backup_url}]}))
+
+    assert handler.routes_for('skim')[1].endpoint is not handler.primary
+    assert handler.routes_for('deep_read') == handler.default_routes
+    current_mode.set('skim')
+    content = handler.summarize("prompt")
+
+    assert content
+    assert primary.rejected == 1 and backup.requests == 1
+    assert metrics.summary()['modes']['skim']['llm_fallbacks'] == 1
+
+
+def test_slow_primary_is_hedged(fake_openai, backup_openai, tmp_path):
+    primary, base_url = fake_openai
+    backup, backup_url = backup_openai
+    primary.sample_ttft = lambda: 1.0
+    handler = LLMHandler(llm_config(base_url, tmp_path, routing={
+        'skim': ['test-model', {'model': 'backup-model', 'base_url': backup_url}]},
+        hedging={'enabled': True, 'min_samples': 1, 'min_deadline': 0.1}))
+    handler.hedging.observe('test-model', 0.1)
+    current_mode.set('skim')
+
+    assert handler.summarize("prompt")
+    values = metrics.summary()['modes']['skim']
+    assert values['llm_hedged'] == 1
+    assert values['llm_hedge_wins'] == 1
+    assert backup.requests == 1
+    handler.close()
+    assert handler._hedge_pool._shutdown
@@ -0,0 +1,59 @@
+import os
+import hashlib
+
+from conftest import llm_config
+from utils.llm_handler import LLMHandler
+from utils.map_reduce import MapReduceSummarizer, CHUNK_PROMPT_VERSION
+from utils.metrics import current_mode
+from utils.prompt_builder import PromptBuilder
+
+SECTION = "The adsorption energy was computed with the PBE functional. " * 7
+
+
+def paper(sections):
+    return "".join(f"## Section {i}\n{SECTION}\n\n" for i in range(sections))
+
+
+def make(fake_openai, tmp_path, output_tokens=150, **llm):
+    state, base_url = fake_openai
+    state.output_tokens = output_tokens
+    config = llm_config(base_url, tmp_path, context_window=3000, max_output_tokens=500, **llm)
+    config['processing_rules'] = {'map_reduce': {'enabled': True, 'chunk_tokens': 400}}
+    handler = LLMHandler(config)
+    return state, handler, MapReduceSummarizer(config, handler)
+
+
+def test_needs_split_matches_summary_prompt_budget(fake_openai, tmp_path):
+    _, handler, mr = make(fake_openai, tmp_path)
+    limit = PromptBuilder.content_budget(handler.budget)
+    fits = "word " * (limit * 4 // 5)
+    assert handler.budget.count(fits) <= limit
+    assert not mr.needs_split(fits, 'deep_read') and not mr.needs_split(fits, 'skim')
+    # 不需要分块的正文在单次 Prompt 中不会被截断
+    assert fits in PromptBuilder.build_summary_prompt(fits, 'deep_read', remove_refs=False, budget=handler.budget)
+    assert mr.needs_split(fits + "word " * 10, 'deep_read')
+
+
+def test_chunk_cache_uses_routed_model(fake_openai, tmp_path):
+    _, _, mr = make(fake_openai, tmp_path, output_tokens=20, routing={'deep_read': ['big-model']})
+    content = paper(8)
+    token = current_mode.set('deep_read')
+    try:
+        mr.build_reduce_prompt(content, 'deep_read')
+    finally:
+        current_mode.reset(token)
+    chunk = mr.split_chunks(content)[0]
+    key = hashlib.sha256(f"big-model\0{CHUNK_PROMPT_VERSION}\0{chunk}".encode('utf-8')).hexdigest()
+    assert os.path.exists(os.path.join(mr.cache_dir, f"{key}.md"))
+
+
+def test_reduce_prompt_fits_budget(fake_openai, tmp_path):
+    state, handler, mr = make(fake_openai, tmp_path)
+    content = paper(40)
+    chunks = mr.split_chunks(content)
+    prompt = mr.build_reduce_prompt(content, 'deep_read')
+
+    assert handler.budget.count(prompt) <= handler.budget.context_window - handler.budget.output_reserve
+    # 分块请求之外还发出了合并请求
+    assert state.requests > len(chunks)
+    assert prompt.count('<section index=') < len(chunks)
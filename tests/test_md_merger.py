@@ -0,0 +1,94 @@
+import os
+
+import yaml
+
+from utils.md_merger import merge_markdown_files, discover_summaries
+from utils.run_manifest import RunManifest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summary(folder, mode, title, body):
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"Summary_{mode}_{title}.md")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(body)
+    return path.replace('\\', '/')
+
+
+def test_merge_order_and_toc(tmp_path):
+    paths = [summary(tmp_path / "2001", "skim", "Beta", "beta body"),
+             summary(tmp_path / "1001", "skim", "Gamma", "gamma body"),
+             summary(tmp_path / "1001", "deep_read", "Alpha", "alpha body")]
+    output = tmp_path / "merged" / "Merged.md"
+    merge_markdown_files(paths, str(output))
+
+    text = output.read_text(encoding='utf-8')
+    # 按 (ID, 模式, 标题) 排序, 与输入顺序无关
+    assert text.index("alpha body") < text.index("gamma body") < text.index("beta body")
+    toc = text.split("\n\n\n")[0]
+    assert toc.splitlines()[2:] == ["1. [1001 · deep_read · Alpha](#summary-1)",
+                                    "2. [1001 · skim · Gamma](#summary-2)",
+                                    "3. [2001 · skim · Beta](#summary-3)"]
+    assert text.index('<a id="summary-3"></a>') < text.index("beta body")
+    assert not [name for name in os.listdir(output.parent) if name != "Merged.md"]
+
+
+def test_discover_summaries_in_nested_folders(tmp_path):
+    summary(tmp_path / "1001", "skim", "Top", "top")
+    summary(tmp_path / "1001" / "v2" / "extra", "deep_read", "Nested", "nested")
+    (tmp_path / "notes.md").write_text("ignored")
+    found = sorted((item['id'], item['title']) for item in discover_summaries(str(tmp_path)))
+    assert found == [("1001", "Nested"), ("1001", "Top")]
+
+
+def test_manifest_summaries_keep_paper_id_of_nested_papers(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.db"))
+    folder = tmp_path / "1001" / "v2"
+    paper = {'id': '1001', 'folder_path': str(folder), 'file_path': str(folder / "a.pdf"), 'file_name': "a.pdf"}
+    output = summary(folder, "skim", "a", "body")
+    manifest.discover(paper, 'skim', output)
+    manifest.advance(paper['file_path'], 'summarized')
+    assert manifest.summaries() == [{'id': '1001', 'mode': 'skim', 'title': 'a', 'path': output}]
+
+
+def test_retry_run_merges_all_done_summaries(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.chdir(tmp_path)
+    with open(os.path.join(ROOT, 'iconfig.yaml'), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config['paths'].update(input_dir=str(tmp_path / "input"), temp_dir=str(tmp_path / "temp"),
+                           merge_output_dir=str(tmp_path / "merged"), manifest_db='')
+    # MinerU 命令不存在: 重试的论文再次失败
+    config['api']['mineru'].update(mode='local_cli', batch_mode=False)
+    config['api']['mineru']['local'].update(command=str(tmp_path / "missing-mineru"), batch_wait=0,
+                                            log_dir=str(tmp_path / "logs"))
+    config['api']['llm'].update(api_key='sk-test', base_url='http://127.0.0.1:9/v1')
+    config['processing_rules'].update(is_merger_md=True, merge_source='manifest', merge_per_id=False)
+    config['concurrency'].update(max_workers=1, engine='thread')
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump(config, allow_unicode=True), encoding='utf-8')
+
+    manifest = RunManifest(str(tmp_path / "temp" / "manifest.db"))
+    for name, done in (("ok", True), ("bad", False)):
+        folder = tmp_path / "input" / "1001"
+        paper = {'id': '1001', 'folder_path': str(folder).replace('\\', '/'),
+                 'file_path': str(folder / f"{name}.pdf").replace('\\', '/'), 'file_name': f"{name}.pdf"}
+        os.makedirs(folder, exist_ok=True)
+        (folder / f"{name}.pdf").write_bytes(b"%PDF-1.4")
+        output = os.path.join(paper['folder_path'], f"Summary_skim_{name}.md")
+        manifest.discover(paper, 'skim', output)
+        if done:
+            summary(folder, "skim", name, "done before")
+            manifest.advance(paper['file_path'], 'summarized')
+        else:
+            manifest.fail(paper['file_path'], "MinerU failed")
+
+    main.main(['--config', str(config_path), '--retry-failed'])
+
+    merged = [name for name in os.listdir(tmp_path / "merged") if name.startswith("Merged_Summaries")]
+    assert len(merged) == 1
+    # 只重试了失败的论文, 合并文件仍包含此前完成的总结
+    assert "done before" in (tmp_path / "merged" / merged[0]).read_text(encoding='utf-8')
+    assert manifest.get(str(tmp_path / "input" / "1001" / "bad.pdf").replace('\\', '/'))['status'] == 'failed'
@@ -0,0 +1,89 @@
+import yaml
+import pytest
+
+from utils.md_preprocess import MarkdownPreprocessor, TABLE_PLACEHOLDER
+
+HEADER = "Journal of Catalysis 2024"
+DOC = "\n".join([
+    "# Title",
+    HEADER,
+    "Intro text.",
+    "![fig1](images/a.jpg)",
+    "See ![inline](b.png) here.",
+    HEADER,
+    "<table><tr><th>A</th><th>B</th></tr><tr><td>1</td><td>2</td></tr></table>",
+    HEADER,
+    "## 5. References",
+    "[1] Someone et al.",
+    "## Appendix A. Proofs",
+    "Lemma 1.",
+])
+
+
+def test_defaults_only_touch_references():
+    cleaned, removed = MarkdownPreprocessor().process(DOC)
+    assert set(removed) == {'references'}
+    assert cleaned.count(HEADER) == 3
+    assert "![fig1]" in cleaned
+    # 参考文献之后的附录标题切换为 appendix 规则, 默认保留
+    assert "Lemma 1." in cleaned and "Someone" not in cleaned
+
+
+def test_shipped_config_keeps_optional_rules_off():
+    with open("iconfig.yaml", encoding="utf-8") as f:
+        rules = yaml.safe_load(f)['processing_rules']
+    pre = MarkdownPreprocessor.from_config(rules)
+    assert pre.images is False and pre.repeated_lines == 0
+
+
+def test_all_rules():
+    pre = MarkdownPreprocessor(references=True, appendix=True, images=True, repeated_lines=3, tables='compact')
+    cleaned, removed = pre.process(DOC)
+    assert cleaned.count(HEADER) == 1
+    assert "![" not in cleaned and "See  here." in cleaned
+    assert "| A | B |\n| 1 | 2 |" in cleaned
+    assert "Lemma" not in cleaned and "Someone" not in cleaned
+    assert set(removed) == {'repeated_lines', 'images', 'tables', 'references', 'appendix'}
+
+
+def test_drop_tables_spanning_lines():
+    text = "before\n<table>\n<tr><td>x</td></tr>\n</table>\nafter"
+    cleaned, removed = MarkdownPreprocessor(references=False, tables='drop').process(text)
+    assert cleaned == f"before\n{TABLE_PLACEHOLDER}\nafter"
+    assert len(removed['tables']) == 1
+
+
+def test_unknown_table_mode():
+    with pytest.raises(ValueError):
+        MarkdownPreprocessor(tables='shrink')
+
+
+def test_heading_starting_with_reference_is_kept():
+    text = ("# Title\n\nIntro text.\n\n## 2 Reference frames and units\n\nBody that must stay.\n\n"
+            "## 3 Results\n\nMore body.\n\n## References\n\n[1] Someone et al.")
+    cleaned, removed = MarkdownPreprocessor().process(text)
+    assert "Body that must stay." in cleaned and "More body." in cleaned
+    assert "Someone" not in cleaned
+    assert removed['references'][0] == "## References"
+
+
+def test_singular_reference_word():
+    # 单独一行的 "Reference" (如图表标签) 不是参考文献标题
+    text = "# Title\n\nReference\n\nBody that must stay.\n\n## Reference\n\n[1] Someone et al."
+    cleaned, _ = MarkdownPreprocessor().process(text)
+    assert "Body that must stay." in cleaned
+    # 整行只有单数标题时仍视为参考文献
+    assert "Someone" not in cleaned
+
+
+def test_dropping_stops_at_next_heading_of_same_level():
+    text = ("# Title\n\n## 3 Discussion\n\n### References\n\n[1] Someone et al.\n\n#### Notes\n\n"
+            "Dropped with its section.\n\n### Outlook\n\nKept.\n\n## 4 Conclusion\n\nFinal words.\n\n"
+            "**References**\n\n[2] Other\n\n# Acknowledgements\n\nThanks.")
+    cleaned, _ = MarkdownPreprocessor().process(text)
+    assert "Someone" not in cleaned and "Other" not in cleaned
+    # 更低级的标题属于参考文献一节, 同级标题结束该节
+    assert "Dropped with its section." not in cleaned and "Kept." in cleaned
+    assert "## 4 Conclusion" in cleaned and "Final words." in cleaned
+    # 独占一行的标题在任何标题处结束
+    assert "Thanks." in cleaned
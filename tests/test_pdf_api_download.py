@@ -0,0 +1,108 @@
+import io
+import os
+import zipfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from utils import pdf_api_handler
+from utils.pdf_api_handler import ApiPDFProcessor
+
+
+def result_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        zf.writestr("paper/auto/layout.json", "{}")
+        # 大于一个下载块 (1 MB), 中断前至少有一块已写入磁盘
+        zf.writestr("paper/auto/images/fig1.jpg", os.urandom(3 * 1024 * 1024))
+        zf.writestr("paper/auto/full.md", "# Paper\n\nBody.")
+    return buffer.getvalue()
+
+
+class ResultServer:
+    """
+    提供 MinerU 结果 zip 的本地服务: 可只发送一半后断开连接, 可忽略 Range 请求头
+    """
+    def __init__(self, payload, truncate_first=False, honor_range=True):
+        self.payload = payload
+        self.truncate = truncate_first
+        self.honor_range = honor_range
+        self.ranges = []
+        state = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                header = self.headers.get('Range')
+                state.ranges.append(header)
+                start = int(header.split('=')[1].rstrip('-')) if header and state.honor_range else 0
+                body = state.payload[start:]
+                self.send_response(206 if start else 200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if state.truncate:
+                    state.truncate = False
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/result.zip"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    monkeypatch.setattr(pdf_api_handler.time, 'sleep', lambda seconds: None)
+    proc = ApiPDFProcessor({'api': {'mineru': {'api_url': "http://127.0.0.1:9/api/v4/file-urls/batch",
+                                               'download_retries': 2}}})
+    yield proc
+    proc.download_pool.shutdown()
+
+
+@pytest.mark.parametrize("honor_range", [True, False])
+def test_truncated_download_is_completed(processor, tmp_path, honor_range):
+    payload = result_zip()
+    server = ResultServer(payload, truncate_first=True, honor_range=honor_range)
+    try:
+        path = tmp_path / "result.zip"
+        processor._fetch(server.url, str(path))
+    finally:
+        server.close()
+
+    assert path.read_bytes() == payload
+    assert not os.path.exists(f"{path}.part")
+    assert server.ranges[0] is None
+    # 续传从已写入的位置开始; 服务端忽略 Range 时返回 200, 从头重新写入
+    offset = int(server.ranges[1].split('=')[1].rstrip('-'))
+    assert 0 < offset <= len(payload) // 2
+
+
+def test_only_markdown_is_extracted(processor, tmp_path):
+    server = ResultServer(result_zip())
+    try:
+        assert processor._download_result({'full_zip_url': server.url}, "paper", str(tmp_path))
+    finally:
+        server.close()
+
+    assert (tmp_path / "paper.md").read_text(encoding='utf-8') == "# Paper\n\nBody."
+    assert sorted(os.listdir(tmp_path)) == ["paper.md", "paper_result.zip"]
+    # 图片与版面 JSON 留在 zip 中, 需要时再解出
+    assert ApiPDFProcessor.extract_assets(str(tmp_path), "paper", ["paper/auto/layout.json"]) == \
+        ["paper/auto/layout.json"]
+    assert (tmp_path / "paper" / "auto" / "layout.json").exists()
+
+
+def test_corrupt_zip_is_removed(tmp_path):
+    zip_path = tmp_path / "paper_result.zip"
+    zip_path.write_bytes(b"not a zip")
+    assert not ApiPDFProcessor._extract_markdown(str(zip_path), "paper", str(tmp_path))
+    assert not zip_path.exists()
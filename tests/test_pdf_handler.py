@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from utils.pdf_handler import PDFProcessor
+
+
+@pytest.fixture
+def config(tmp_path):
+    # MinerU 命令不存在: 测试中的 PDF 都不应被真正转换
+    return {'paths': {'temp_dir': str(tmp_path / "temp")},
+            'api': {'mineru': {'mode': 'local_cli', 'local': {'command': str(tmp_path / "missing-mineru"),
+                                                             'batch_wait': 0, 'log_dir': str(tmp_path / "logs")}}}}
+
+
+def legacy_result(config, file_name, content):
+    # 旧版本的缓存布局: temp_dir/<文件名>/auto/<文件名>.md
+    legacy_dir = os.path.join(config['paths']['temp_dir'], file_name, 'auto')
+    os.makedirs(legacy_dir)
+    with open(os.path.join(legacy_dir, f"{file_name}.md"), 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def test_legacy_conversion_is_imported(config, tmp_path):
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 paper")
+    os.makedirs(config['paths']['temp_dir'])
+    legacy_result(config, "paper", "# Legacy")
+
+    processor = PDFProcessor(config)
+    assert processor.convert_to_markdown(str(pdf)) == "# Legacy"
+    sha = processor.hash_of(str(pdf))
+    assert not os.path.exists(os.path.join(config['paths']['temp_dir'], "paper"))
+    assert processor.cache.get(sha).startswith(processor.cache.entry_dir(sha))
+
+    # 改名后按内容哈希命中
+    renamed = tmp_path / "renamed.pdf"
+    os.replace(pdf, renamed)
+    assert PDFProcessor(config).convert_to_markdown(str(renamed)) == "# Legacy"
+
+
+def test_legacy_conversion_is_imported_in_batch_mode(config, tmp_path):
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 paper")
+    os.makedirs(config['paths']['temp_dir'])
+    legacy_result(config, "paper", "# Legacy")
+
+    processor = PDFProcessor(config)
+    done, errors = [], []
+    processor.convert_batch([str(pdf)], on_done=done.append, on_error=lambda path, message: errors.append(path))
+    assert done == [str(pdf)] and not errors
+    assert processor.convert_to_markdown(str(pdf)) == "# Legacy"
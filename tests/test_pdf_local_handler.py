@@ -0,0 +1,103 @@
+import os
+import sys
+import stat
+import time
+import threading
+
+import pytest
+
+from utils.pdf_local_handler import LocalPDFProcessor
+
+# 模拟 MinerU CLI: 为输入目录 (或单个文件) 中每个 PDF 生成 <输出>/<文件名>/auto/<文件名>.md, 并记录调用次数
+FAKE_MINERU = '''#!{python}
+import os, sys
+args = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+src, out = args['-p'], args['-o']
+names = sorted(os.listdir(src)) if os.path.isdir(src) else [os.path.basename(src)]
+with open({calls!r}, 'a') as f:
+    f.write(",".join(names) + "\\n")
+for name in names:
+    stem = os.path.splitext(name)[0]
+    if stem.startswith('bad'):
+        continue
+    os.makedirs(os.path.join(out, stem, 'auto'))
+    with open(os.path.join(out, stem, 'auto', stem + '.md'), 'w') as f:
+        f.write('# ' + stem)
+print('done')
+'''
+
+
+def make_processor(tmp_path, batch_wait=0.3, **concurrency):
+    calls = tmp_path / "calls.txt"
+    command = tmp_path / "mineru"
+    command.write_text(FAKE_MINERU.format(python=sys.executable, calls=str(calls)))
+    command.chmod(command.stat().st_mode | stat.S_IEXEC)
+    config = {'paths': {'temp_dir': str(tmp_path / "temp")}, 'concurrency': concurrency,
+              'api': {'mineru': {'local': {'command': str(command), 'workers': 2, 'files_per_invocation': 4,
+                                           'batch_wait': batch_wait, 'log_dir': str(tmp_path / "logs")}}}}
+    os.makedirs(config['paths']['temp_dir'])
+    proc = LocalPDFProcessor(config)
+    proc.calls = calls
+    return proc
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return make_processor(tmp_path)
+
+
+def make_pdfs(tmp_path, names):
+    paths = []
+    for i, name in enumerate(names):
+        folder = tmp_path / "input" / str(i)
+        folder.mkdir(parents=True)
+        path = folder / name
+        path.write_bytes(b"%PDF-1.4\n")
+        paths.append(str(path))
+    return paths
+
+
+def test_concurrent_single_calls_share_one_invocation(processor, tmp_path):
+    # 两篇同名 PDF 来自不同目录, 需分到不同的调用中
+    paths = make_pdfs(tmp_path, ["a.pdf", "b.pdf", "c.pdf", "a.pdf"])
+    errors = []
+
+    def convert(index, path):
+        try:
+            processor.process(path, str(tmp_path / "out" / str(index)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=convert, args=item) for item in enumerate(paths)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    assert not errors
+    calls = processor.calls.read_text().splitlines()
+    assert sorted(calls) == ["a.pdf", "a.pdf,b.pdf,c.pdf"]
+    for index, path in enumerate(paths):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        assert os.path.exists(tmp_path / "out" / str(index) / stem / "auto" / f"{stem}.md")
+    # 每篇一个日志, 同名 PDF 的日志文件不会互相覆盖
+    logs = sorted(os.listdir(processor.log_dir))
+    assert len(logs) == 4 and [name.split('_')[0] for name in logs] == ["a", "a", "b", "c"]
+    for name in logs:
+        assert (tmp_path / "logs" / name).read_text().strip() == "done"
+
+
+def test_missing_output_raises(processor, tmp_path):
+    (path,) = make_pdfs(tmp_path, ["bad.pdf"])
+    with pytest.raises(Exception, match="produced no output"):
+        processor.process(path, str(tmp_path / "out"))
+
+
+def test_single_worker_does_not_wait_for_a_batch(tmp_path):
+    # 只有一个线程调用时不会有其他论文加入, 不应等待 batch_wait
+    processor = make_processor(tmp_path, batch_wait=30, max_workers=1)
+    (path,) = make_pdfs(tmp_path, ["a.pdf"])
+    start = time.monotonic()
+    processor.process(path, str(tmp_path / "out"))
+    assert time.monotonic() - start < 10
+    assert processor.calls.read_text().splitlines() == ["a.pdf"]
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from utils.pdf_handler import PDFProcessor
+from utils.pdf_text_layer import TextLayerExtractor, extract, available_extractor
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# 生成测试 PDF 需要 PyMuPDF (可选依赖 textlayer)
+needs_pymupdf = pytest.mark.skipif(pymupdf is None, reason="PyMuPDF not installed")
+
+PARAGRAPH = ("We relax the catalyst surface with the PBE functional and compare adsorption energies "
+             "across the transition metal series. ") * 6
+
+
+def text_pdf(path, pages=3):
+    doc = pymupdf.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), PARAGRAPH * 2, fontsize=9)
+    doc.save(str(path))
+    return str(path)
+
+
+def scanned_pdf(path, pages=3):
+    # 只有图片没有文本层, 与扫描件相同
+    pixmap = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 200, 300), False)
+    pixmap.set_rect(pixmap.irect, (200, 200, 200))
+    doc = pymupdf.open()
+    for _ in range(pages):
+        doc.new_page().insert_image(pymupdf.Rect(0, 0, 595, 842), pixmap=pixmap)
+    doc.save(str(path))
+    return str(path)
+
+
+def stats(**overrides):
+    values = {'markdown': "", 'pages': 10, 'text_pages': 10, 'chars': 30000, 'bad_chars': 0, 'math_chars': 0,
+              'fonts': 4, 'mapped_fonts': 4}
+    values.update(overrides)
+    return values
+
+
+@pytest.fixture
+def extractor():
+    ext = TextLayerExtractor({'workers': 1})
+    yield ext
+    ext.close()
+
+
+@needs_pymupdf
+@pytest.mark.parametrize("name", ["pymupdf", "pypdf"])
+def test_text_pdf_is_accepted(tmp_path, extractor, name):
+    if available_extractor(name) is None:
+        pytest.skip(f"{name} not installed")
+    result = extract(text_pdf(tmp_path / "paper.pdf"), name)
+    assert result['pages'] == 3 and result['text_pages'] == 3
+    assert result['fonts'] == result['mapped_fonts'] == 1
+    assert "PBE functional" in result['markdown']
+    assert extractor.accepts(result, 'skim')[0]
+    assert extractor.accepts(result, 'deep_read')[0]
+
+
+@needs_pymupdf
+def test_scanned_pdf_is_rejected(tmp_path, extractor):
+    result = extract(scanned_pdf(tmp_path / "scan.pdf"), 'pymupdf')
+    accepted, reason = extractor.accepts(result, 'skim')
+    assert not accepted and "scanned" in reason
+
+
+def test_garbled_text_is_rejected(extractor):
+    accepted, reason = extractor.accepts(stats(bad_chars=3000), 'skim')
+    assert not accepted and "clean ratio" in reason
+    # 字形本身可见但字体没有 Unicode 映射
+    accepted, reason = extractor.accepts(stats(mapped_fonts=2), 'skim')
+    assert not accepted and "font coverage" in reason
+
+
+def test_formula_heavy_and_threshold(extractor):
+    accepted, reason = extractor.accepts(stats(math_chars=1000), 'skim')
+    assert not accepted and "formula" in reason
+    # 只在 modes 之外的模式要求质量分达到 threshold
+    borderline = stats(text_pages=9)
+    assert extractor.accepts(borderline, 'skim')[0]
+    assert not extractor.accepts(borderline, 'deep_read')[0]
+
+
+@needs_pymupdf
+def test_convert_in_process_pool(tmp_path, extractor):
+    markdown = extractor.convert(text_pdf(tmp_path / "paper.pdf"), 'skim')
+    assert "PBE functional" in markdown
+    assert extractor.convert(scanned_pdf(tmp_path / "scan.pdf"), 'skim') is None
+    # 提取失败时交给 MinerU
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    assert extractor.convert(str(broken), 'skim') is None
+
+
+@needs_pymupdf
+def test_scanned_pdf_falls_back_to_mineru(tmp_path):
+    config = {'paths': {'temp_dir': str(tmp_path / "temp")},
+              'api': {'mineru': {'mode': 'local_cli', 'text_layer': {'enabled': True, 'workers': 1},
+                                 'local': {'log_dir': str(tmp_path / "logs")}}}}
+    processor = PDFProcessor(config)
+    converted = []
+
+    def mineru(pdf_path, output_dir):
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        os.makedirs(os.path.join(output_dir, stem))
+        with open(os.path.join(output_dir, stem, f"{stem}.md"), 'w', encoding='utf-8') as f:
+            f.write("# MinerU")
+        converted.append(stem)
+
+    processor.processor.process = mineru
+    try:
+        assert "PBE functional" in processor.convert_to_markdown(text_pdf(tmp_path / "paper.pdf"), mode='skim')
+        assert processor.convert_to_markdown(scanned_pdf(tmp_path / "scan.pdf"), mode='skim') == "# MinerU"
+    finally:
+        processor.close()
+    assert converted == ["scan"]
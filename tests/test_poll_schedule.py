@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from utils.poll_schedule import PollSchedule, StateTimer
+
+POLLING = {'min_interval': 2, 'max_interval': 20, 'backoff': 2, 'seconds_per_page': 1,
+           'seconds_per_mb': 4, 'early_factor': 0.5, 'deadline': 100}
+
+
+def make_pdf(tmp_path, name, pages):
+    # 只含页面树根节点, 页数可被 pdf_meta.count_pages 统计
+    path = tmp_path / name
+    path.write_bytes(f"%PDF-1.4\n1 0 obj\n<< /Type /Pages /Kids [] /Count {pages} >>\nendobj\n".encode())
+    return str(path)
+
+
+def test_first_poll_at_early_factor_of_slowest_pdf(tmp_path):
+    paths = [make_pdf(tmp_path, 'a.pdf', 4), make_pdf(tmp_path, 'b.pdf', 12)]
+    schedule = PollSchedule({'polling': POLLING}, paths)
+    assert schedule.expected == 12
+    assert schedule.interval == 6
+    assert 0 < schedule.wait_time() <= 6
+
+
+def test_size_estimate_without_page_tree(tmp_path):
+    path = tmp_path / 'scan.pdf'
+    path.write_bytes(b'\0' * (2 * 1024 * 1024))
+    schedule = PollSchedule({'polling': POLLING}, [str(path)])
+    assert schedule.expected == pytest.approx(8)
+    assert schedule.interval == pytest.approx(4)
+
+
+def test_interval_clamped(tmp_path):
+    short = PollSchedule({'polling': POLLING}, [make_pdf(tmp_path, 'a.pdf', 1)])
+    assert short.interval == 2
+    long = PollSchedule({'polling': POLLING}, [make_pdf(tmp_path, 'b.pdf', 500)])
+    assert long.interval == 20
+    # 未配置 polling 时上限沿用 polling_interval
+    assert PollSchedule({'polling_interval': 7}, [make_pdf(tmp_path, 'c.pdf', 500)]).interval == 7
+
+
+def test_backoff_up_to_max(tmp_path):
+    schedule = PollSchedule({'polling': POLLING}, [make_pdf(tmp_path, 'a.pdf', 6)])
+    intervals = []
+    for _ in range(4):
+        schedule.advance()
+        intervals.append(schedule.interval)
+    assert intervals == [6, 12, 20, 20]
+
+
+def test_progress_shortens_interval(tmp_path):
+    schedule = PollSchedule({'polling': POLLING}, [make_pdf(tmp_path, 'a.pdf', 20)])
+    schedule.advance({'total_pages': 20, 'extracted_pages': 17})
+    assert schedule.interval == 3
+    schedule.advance({'total_pages': 20, 'extracted_pages': 20})
+    assert schedule.interval == 6
+
+
+def test_deadline(tmp_path):
+    path = make_pdf(tmp_path, 'a.pdf', 40)
+    assert not PollSchedule({'polling': POLLING}, [path]).expired()
+    schedule = PollSchedule({'polling': dict(POLLING, deadline=0)}, [path])
+    assert schedule.expired()
+    # 下一次轮询不会晚于截止时间
+    schedule.advance()
+    assert schedule.wait_time() == 0
+
+
+def test_state_timer():
+    timer = StateTimer()
+    timer.start('a')
+    timer.observe('a', 'pending')
+    time.sleep(0.05)
+    timer.observe('a', 'running')
+    time.sleep(0.02)
+    timer.observe('a', 'done')
+    durations = timer.finish('a', 'a.pdf')
+    assert set(durations) == {'submitted', 'pending', 'running'}
+    assert durations['pending'] >= 0.05
+    assert durations['running'] >= 0.02
+
+    timer.start('b')
+    timer.observe('b', 'pending')
+    timer.observe('b', 'done')
+    timer.finish('b', 'b.pdf')
+    totals = timer.totals()
+    assert totals['pending']['tasks'] == 2
+    assert totals['running']['tasks'] == 1
+    assert timer.finish('missing', 'x.pdf') == {}
@@ -0,0 +1,60 @@
+import os
+
+from utils.prompt_builder import PromptBuilder
+from utils.token_budget import TokenBudget
+
+PAPER = "\n\n".join(f"## Section {i}\n" + "The catalyst surface was relaxed with PBE. " * 40 for i in range(20))
+
+
+def common_prefix(*prompts):
+    return os.path.commonprefix(prompts)
+
+
+def content_end(prompt, tag='paper_content'):
+    return prompt.index(f"</{tag}>") + len(f"</{tag}>")
+
+
+def test_modes_share_prefix_up_to_content():
+    skim = PromptBuilder.build_summary_prompt(PAPER, 'skim', remove_refs=False)
+    deep = PromptBuilder.build_summary_prompt(PAPER, 'deep_read', remove_refs=False)
+    assert skim != deep
+    prefix = common_prefix(skim, deep)
+    assert len(prefix) >= content_end(skim)
+    assert prefix.startswith(PromptBuilder.PREFIX_TEMPLATE.split("{static}")[0])
+    # 指令在正文之后
+    assert skim.index(PromptBuilder.SKIM_INSTRUCTION) > content_end(skim)
+    assert deep.index(PromptBuilder.DEEP_READ_INSTRUCTION) > content_end(deep)
+
+
+def test_budget_truncates_identically_across_modes():
+    budget = TokenBudget(None, 3000, output_reserve=500)
+    skim = PromptBuilder.build_summary_prompt(PAPER, 'skim', remove_refs=False, budget=budget)
+    deep = PromptBuilder.build_summary_prompt(PAPER, 'deep_read', remove_refs=False, budget=budget)
+    assert skim[:content_end(skim)] == deep[:content_end(deep)]
+    assert content_end(skim) < len(PAPER)
+    # 两种模式都不超出预算
+    for prompt in (skim, deep):
+        assert budget.count(prompt) <= budget.context_window - budget.output_reserve
+
+
+def test_character_limit_identical_across_modes():
+    long_paper = PAPER * 3
+    skim = PromptBuilder.build_summary_prompt(long_paper, 'skim', remove_refs=False)
+    deep = PromptBuilder.build_summary_prompt(long_paper, 'deep_read', remove_refs=False)
+    assert skim[:content_end(skim)] == deep[:content_end(deep)]
+    assert long_paper[:30000] in skim and long_paper[:30001] not in skim
+
+
+def test_chunk_and_reduce_prompts_put_instruction_last():
+    chunk = PromptBuilder.build_chunk_prompt("chunk text", 2, 5)
+    other = PromptBuilder.build_chunk_prompt("chunk text", 3, 5)
+    assert len(common_prefix(chunk, other)) >= content_end(chunk, 'paper_section')
+    assert "2/5" in chunk[content_end(chunk, 'paper_section'):]
+
+    summaries = ["first", "second"]
+    reduce_skim = PromptBuilder.build_reduce_prompt(summaries, 'skim')
+    reduce_deep = PromptBuilder.build_reduce_prompt(summaries, 'deep_read')
+    combine = PromptBuilder.build_combine_prompt(summaries)
+    end = content_end(reduce_skim, 'section_notes')
+    assert len(common_prefix(reduce_skim, reduce_deep, combine)) >= end
+    assert '<section index="2">\nsecond\n</section>' in reduce_skim[:end]
@@ -0,0 +1,72 @@
+import pytest
+
+from utils.rate_limiter import RateLimiter, SharedRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # 限流器通过 _clock 取时间, 测试中替换为可手动推进的时钟
+    monkeypatch.setattr(RateLimiter, '_clock', staticmethod(clock))
+    monkeypatch.setattr(SharedRateLimiter, '_clock', staticmethod(clock))
+    return clock
+
+
+def test_unlimited():
+    limiter = RateLimiter()
+    assert all(limiter.reserve(10 ** 6) == 0 for _ in range(1000))
+
+
+def test_rpm_burst_then_wait(clock):
+    limiter = RateLimiter(60)
+    assert all(limiter.reserve() == 0 for _ in range(60))
+    assert limiter.reserve() == pytest.approx(1.0)
+    clock.now += 2
+    # 两秒补充 2 个, 其中 1 个抵消上一次的预占
+    assert limiter.reserve() == 0
+    assert limiter.reserve() > 0
+
+
+def test_tpm_oversized_request_is_capped(clock):
+    limiter = RateLimiter(0, 600)
+    assert limiter.reserve(10 ** 6) == 0
+    assert limiter.reserve(60) == pytest.approx(6.0)
+
+
+def test_penalize_pauses_and_scales_down(clock):
+    limiter = RateLimiter(60)
+    limiter.penalize(5)
+    assert limiter.reserve() == pytest.approx(5.0)
+    assert limiter._scale == pytest.approx(0.8)
+    for _ in range(10):
+        limiter.record_success()
+    assert limiter._scale == 1.0
+    clock.now += 5
+    assert limiter.reserve() == 0
+
+
+def test_shared_limiter_pools_budget(tmp_path, clock):
+    db = str(tmp_path / "limits.db")
+    first = SharedRateLimiter(db, "llm", 60)
+    second = SharedRateLimiter(db, "llm", 60)
+    assert all(first.reserve() == 0 for _ in range(30))
+    assert all(second.reserve() == 0 for _ in range(30))
+    assert first.reserve() == pytest.approx(1.0)
+    # 其他名称的限流器互不影响
+    assert SharedRateLimiter(db, "mineru", 60).reserve() == 0
+
+
+def test_shared_limiter_shares_penalty(tmp_path, clock):
+    db = str(tmp_path / "limits.db")
+    first = SharedRateLimiter(db, "llm", 600)
+    second = SharedRateLimiter(db, "llm", 600)
+    first.penalize(30)
+    assert second.reserve() == pytest.approx(30.0)
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from utils.llm_handler import LLMHandler, LLMError, SYSTEM_PROMPT
+from utils.response_cache import ResponseCache
+
+
+def test_key_depends_on_model_and_prompt():
+    key = ResponseCache.make_key("gpt-5", SYSTEM_PROMPT, "Summarize:\n\nbody")
+    assert key == ResponseCache.make_key("gpt-5", SYSTEM_PROMPT, "Summarize:  \n\n\n\nbody  ")
+    assert key != ResponseCache.make_key("gpt-5-mini", SYSTEM_PROMPT, "Summarize:\n\nbody")
+    assert key != ResponseCache.make_key("gpt-5", SYSTEM_PROMPT, "Summarize briefly:\n\nbody")
+    assert key != ResponseCache.make_key("gpt-5", "another system prompt", "Summarize:\n\nbody")
+
+
+def test_ttl_expiry(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.db"), ttl_days=1)
+    cache.put("k", "m", "cached summary", prompt_tokens=10, completion_tokens=5)
+    assert cache.get("k") == {'content': "cached summary", 'prompt_tokens': 10, 'completion_tokens': 5}
+
+    cache._conn.execute("UPDATE responses SET created_at = created_at - 2 * 86400")
+    assert cache.get("k") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_size_eviction_drops_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.db"), max_size_mb=0.015)
+    for i in range(3):
+        # 随机内容的十六进制压缩后每条约 6.5 KB, 三条超出 15 KB 的上限
+        cache.put(f"k{i}", "m", os.urandom(6000).hex())
+    cache._conn.execute("UPDATE responses SET last_access = CAST(substr(key, 2) AS REAL)")
+    cache.get("k0")  # 最近访问, 保留
+
+    cache._evict()
+    assert cache.get("k1") is None
+    assert cache.get("k0") is not None and cache.get("k2") is not None
+    assert cache.stats()['entries'] == 2
+
+
+def test_cache_only_misses_raise_without_requests(tmp_path):
+    config = {'api': {'llm': {'api_key': 'sk-test', 'base_url': 'http://127.0.0.1:9/v1', 'model_name': 'test-model',
+                              'max_retries': 0}},
+              'paths': {'temp_dir': str(tmp_path)},
+              'cache': {'llm': {'mode': 'cache_only', 'path': str(tmp_path / "llm.db")}}}
+    handler = LLMHandler(config)
+    with pytest.raises(LLMError, match="cache miss"):
+        handler.summarize("prompt")
+
+    key = ResponseCache.make_key('test-model', SYSTEM_PROMPT, "prompt")
+    ResponseCache(str(tmp_path / "llm.db")).put(key, 'test-model', "offline summary")
+    assert handler.summarize("prompt") == "offline summary"
+    # 离线模式不写入缓存
+    handler.cache.put("other", 'test-model', "ignored")
+    assert handler.cache.get("other") is None
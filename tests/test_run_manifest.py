@@ -0,0 +1,88 @@
+import os
+
+import main
+from utils.run_manifest import RunManifest
+
+
+def paper(tmp_path, name, paper_id="1001"):
+    folder = tmp_path / "input" / paper_id
+    os.makedirs(folder, exist_ok=True)
+    (folder / f"{name}.pdf").write_bytes(b"%PDF-1.4")
+    return {'id': paper_id, 'folder_path': str(folder), 'file_path': str(folder / f"{name}.pdf"),
+            'file_name': f"{name}.pdf"}
+
+
+def output(info):
+    return os.path.join(info['folder_path'], f"Summary_skim_{os.path.splitext(info['file_name'])[0]}.md")
+
+
+class StubPDFProcessor:
+    """
+    记录 convert_to_markdown 收到的 batch_id, 随后失败以结束本篇处理
+    """
+    def __init__(self):
+        self.batch_ids = []
+
+    def convert_to_markdown(self, pdf_path, batch_id=None, on_submitted=None, **kwargs):
+        self.batch_ids.append(batch_id)
+        raise RuntimeError("MinerU unavailable")
+
+
+def test_resume_after_crash(tmp_path):
+    db = str(tmp_path / "manifest.db")
+    info = paper(tmp_path, "a")
+    manifest = RunManifest(db)
+    manifest.discover(info, 'skim', output(info))
+    manifest.advance(info['file_path'], 'converted', elapsed=1.5, content_hash="abc")
+    # 进程中断: 不关闭连接, 直接重新打开
+    resumed = RunManifest(db)
+    record = resumed.get(info['file_path'])
+    assert (record['stage'], record['status'], record['content_hash']) == ('converted', 'running', "abc")
+    assert '"converted": 1.5' in record['timings']
+
+    # 再次发现时保留已完成的阶段
+    resumed.discover(info, 'deep_read', output(info))
+    assert resumed.get(info['file_path'])['stage'] == 'converted'
+    assert resumed.get(info['file_path'])['mode'] == 'deep_read'
+
+
+def test_in_flight_batch_is_reattached(tmp_path):
+    db = str(tmp_path / "manifest.db")
+    info = paper(tmp_path, "a")
+    manifest = RunManifest(db)
+    manifest.discover(info, 'skim', output(info))
+    manifest.advance(info['file_path'], 'uploaded', batch_id="batch-1")
+
+    config = {'processing_rules': {'default_mode': 'skim'}}
+    processor = StubPDFProcessor()
+    main.process_single_paper(info, config, processor, None, RunManifest(db))
+    assert processor.batch_ids == ["batch-1"]
+
+    # 失败后清除 batch_id, 重试时重新提交而不是接管已失败的批次
+    record = manifest.get(info['file_path'])
+    assert record['status'] == 'failed' and record['batch_id'] is None and record['attempts'] == 1
+    assert manifest.failed_papers() == [info]
+    main.process_single_paper(info, config, processor, None, manifest)
+    assert processor.batch_ids == ["batch-1", None]
+
+
+def test_summaries_only_lists_done_papers_with_output(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.db"))
+    infos = [paper(tmp_path, name, paper_id) for name, paper_id in (("b", "2001"), ("a", "1001"), ("c", "1001"))]
+    for info in infos:
+        manifest.discover(info, 'skim', output(info))
+    for info in infos[:2]:
+        with open(output(info), 'w', encoding='utf-8') as f:
+            f.write("summary")
+        manifest.advance(info['file_path'], 'summarized')
+    # 已完成但总结文件被删除
+    manifest.advance(infos[2]['file_path'], 'summarized')
+
+    paths = [item['path'] for item in manifest.summaries()]
+    assert paths == [output(infos[1]), output(infos[0])]
+    assert [item['path'] for item in manifest.summaries([infos[0]['file_path']])] == [output(infos[0])]
+    assert manifest.summaries([]) == []
+
+    manifest.mark_merged(paths)
+    assert manifest.get(infos[0]['file_path'])['stage'] == 'merged'
+    assert manifest.get(infos[2]['file_path'])['stage'] == 'summarized'
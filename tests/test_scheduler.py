@@ -0,0 +1,70 @@
+import pytest
+
+from utils.scheduler import PaperScheduler
+
+
+def pdf(tmp_path, paper_id, name, pages):
+    folder = tmp_path / paper_id
+    folder.mkdir(exist_ok=True)
+    path = folder / f"{name}.pdf"
+    path.write_bytes(f"%PDF-1.4\n1 0 obj\n<< /Type /Pages /Count {pages} /Kids [] >>\nendobj\n".encode())
+    return {'id': paper_id, 'folder_path': str(folder), 'file_path': str(path), 'file_name': path.name}
+
+
+def rules(**schedule):
+    return {'default_mode': 'skim', 'deep_read_ids': ["2001"], 'schedule': schedule}
+
+
+def order(papers):
+    return [paper['file_name'] for paper in papers]
+
+
+def test_estimate_uses_pages_and_mode_weight(tmp_path):
+    scheduler = PaperScheduler(rules(order='longest_first'))
+    assert scheduler.estimate(pdf(tmp_path, "1001", "skim", 12)) == 12
+    assert scheduler.estimate(pdf(tmp_path, "2001", "deep", 12)) == 24
+    # 无法统计页数时按文件大小折算, 至少为 1
+    unknown = tmp_path / "1001" / "unknown.pdf"
+    unknown.write_bytes(b"%PDF-1.4\n" + b"0" * 1024 * 1024)
+    assert scheduler.estimate({'id': "1001", 'file_path': str(unknown)}) == 10
+    assert scheduler.estimate({'id': "1001", 'file_path': str(tmp_path / "missing.pdf")}) == 1
+
+
+def test_longest_first_and_deep_read_first(tmp_path):
+    papers = [pdf(tmp_path, "1001", "short", 5), pdf(tmp_path, "1001", "long", 80),
+              pdf(tmp_path, "2001", "deep", 10), pdf(tmp_path, "1001", "medium", 30)]
+    scheduled = PaperScheduler(rules(order='longest_first')).schedule(papers)
+    assert order(scheduled) == ["long.pdf", "medium.pdf", "deep.pdf", "short.pdf"]
+    assert [paper['work'] for paper in scheduled] == [80, 30, 20, 5]
+
+    scheduled = PaperScheduler(rules(order='deep_read_first')).schedule(papers)
+    assert order(scheduled) == ["deep.pdf", "long.pdf", "medium.pdf", "short.pdf"]
+
+
+def test_priorities_then_deadlines(tmp_path):
+    papers = [pdf(tmp_path, "1001", "a", 50), pdf(tmp_path, "1002", "b", 5), pdf(tmp_path, "1003", "c", 20),
+              pdf(tmp_path, "1004", "d", 1)]
+    scheduler = PaperScheduler(rules(order='longest_first', priorities={1002: 5, "1004": 5},
+                                     deadlines={"1004": "2030-01-01", "1003": "2030-06-01 12:00"}))
+    # 优先级高者先, 同优先级截止时间早者先, 再按工作量
+    assert order(scheduler.schedule(papers)) == ["d.pdf", "b.pdf", "c.pdf", "a.pdf"]
+
+
+def test_ids_without_settings_are_treated_alike(tmp_path):
+    # 同一 ID 的多篇论文不会整体排在其他 ID 之前: 仅按工作量交错, 相同时保持发现顺序
+    papers = [pdf(tmp_path, "1001", "a1", 10), pdf(tmp_path, "1001", "a2", 10), pdf(tmp_path, "1001", "a3", 3),
+              pdf(tmp_path, "1002", "b1", 10), pdf(tmp_path, "1002", "b2", 40)]
+    scheduled = PaperScheduler(rules(order='longest_first')).schedule(papers)
+    assert order(scheduled) == ["b2.pdf", "a1.pdf", "a2.pdf", "b1.pdf", "a3.pdf"]
+
+    # 只设置优先级时, 同一优先级内保持发现顺序
+    scheduled = PaperScheduler(rules(priorities={"1002": 1})).schedule(papers)
+    assert order(scheduled) == ["b1.pdf", "b2.pdf", "a1.pdf", "a2.pdf", "a3.pdf"]
+
+
+def test_invalid_settings():
+    assert not PaperScheduler(rules()).enabled
+    with pytest.raises(ValueError):
+        PaperScheduler(rules(order='shortest_first'))
+    with pytest.raises(ValueError):
+        PaperScheduler(rules(deadlines={"1001": "tomorrow"}))
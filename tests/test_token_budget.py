@@ -0,0 +1,38 @@
+import tokenizers
+
+from utils.token_budget import TokenBudget, load_tokenizer
+
+
+def test_no_tokenizer_configured_uses_estimate(monkeypatch):
+    def fail(name):
+        raise AssertionError(f"from_pretrained called for {name}")
+    monkeypatch.setattr(tokenizers.Tokenizer, 'from_pretrained', fail)
+    load_tokenizer.cache_clear()
+
+    budget = TokenBudget.from_config({'model_name': 'gpt-5', 'context_window': 1000, 'max_output_tokens': 100})
+    assert budget.tokenizer_name is None
+    assert budget.count("abcdefgh") == 2
+    assert budget.count("总结论文") == 4
+    assert budget.available("x" * 40) == 890
+
+
+def test_from_config_without_context_window():
+    assert TokenBudget.from_config({'model_name': 'gpt-5'}) is None
+
+
+def test_fit_keeps_whole_sections():
+    budget = TokenBudget(None, 0)
+    sections = [f"## S{i}\n" + "word " * 40 + "\n" for i in range(4)]
+    text = "".join(sections)
+    limit = budget.count(sections[0] + sections[1]) + 5
+    assert budget.fit(text, limit) == sections[0] + sections[1]
+
+
+def test_fit_falls_back_to_sentences():
+    budget = TokenBudget(None, 0)
+    text = "## Intro\nFirst sentence here. Second sentence here. Third sentence here."
+    result = budget.fit(text, 12)
+    assert result.startswith("## Intro\nFirst sentence here.")
+    assert result.endswith(".")
+    assert budget.count(result) <= 12
+    assert budget.fit(text, 1000) == text
@@ -0,0 +1,99 @@
+import time
+import multiprocessing
+
+from utils.work_queue import WorkQueue
+
+
+def paper(i):
+    return {'id': str(i), 'file_path': f"/input/{i}/p{i}.pdf", 'file_name': f"p{i}.pdf"}
+
+
+def expire(queue, file_path):
+    queue._conn.execute("UPDATE tasks SET lease_until = ? WHERE file_path = ?", (time.time() - 1, file_path))
+
+
+def test_enqueue_lease_complete(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    assert queue.enqueue(paper(1)) and queue.enqueue(paper(2))
+    assert not queue.enqueue(paper(1))
+
+    info, _ = queue.lease("w1")
+    assert info == paper(1)
+    assert queue.lease("w2")[0] == paper(2)
+    assert queue.lease("w3") is None
+
+    queue.complete("w1", info['file_path'], output_path="/out/1.md")
+    assert queue.state(info['file_path']) == 'done'
+    assert queue.counts() == {'done': 1, 'leased': 1}
+    assert not queue.drained()
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), visibility_timeout=60)
+    queue.enqueue(paper(1))
+    file_path = queue.lease("w1")[0]['file_path']
+    assert queue.heartbeat("w1", [file_path]) == []
+
+    expire(queue, file_path)
+    assert queue.lease("w2")[0]['file_path'] == file_path
+    # 原 worker 失去租约: 心跳报告丢失, 迟到的结果被丢弃
+    assert queue.heartbeat("w1", [file_path]) == [file_path]
+    queue.complete("w1", file_path, error="late")
+    assert queue.state(file_path) == 'leased'
+    queue.complete("w2", file_path, output_path="/out/1.md")
+    assert queue.state(file_path) == 'done'
+
+
+def test_attempts_are_limited(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), max_attempts=2)
+    queue.enqueue(paper(1))
+    file_path = paper(1)['file_path']
+
+    queue.lease("w1")
+    queue.complete("w1", file_path, error="boom")
+    assert queue.state(file_path) == 'queued'
+    queue.lease("w1")
+    expire(queue, file_path)
+    # 两次租约都已用完, 过期后记为失败而不是再次发放
+    assert queue.lease("w2") is None
+    assert queue.state(file_path) == 'failed'
+
+    assert queue.requeue_failed() == 1
+    assert queue.lease("w2")[0]['file_path'] == file_path
+
+
+def test_seal(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    assert not queue.sealed()
+    queue.close()
+    assert WorkQueue(str(tmp_path / "queue.db")).sealed()
+    queue.reopen()
+    assert not queue.sealed()
+
+
+def _drain(db_path, worker, results):
+    queue = WorkQueue(db_path)
+    while True:
+        leased = queue.lease(worker)
+        if leased is None:
+            return
+        results.put(leased[0]['file_path'])
+        queue.complete(worker, leased[0]['file_path'], output_path="x")
+
+
+def test_each_task_leased_once_across_processes(tmp_path):
+    db_path = str(tmp_path / "queue.db")
+    queue = WorkQueue(db_path)
+    for i in range(60):
+        queue.enqueue(paper(i))
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_drain, args=(db_path, f"w{n}", results)) for n in range(4)]
+    for p in procs:
+        p.start()
+    leased = [results.get(timeout=60) for _ in range(60)]
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+    assert sorted(leased) == sorted(paper(i)['file_path'] for i in range(60))
+    assert queue.counts() == {'done': 60}
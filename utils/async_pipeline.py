@@ -0,0 +1,280 @@
+import os
+import time
+import asyncio
+import httpx
+from loguru import logger
+from tqdm import tqdm
+
+from .prompt_builder import PromptBuilder
+from .map_reduce import MapReduceSummarizer
+from .md_preprocess import MarkdownPreprocessor
+from .metrics import metrics, current_mode
+from .workflow_utils import determine_mode, get_output_path, save_summary, summary_header, save_duplicate_summary
+
+class AsyncPipeline:
+    """
+    基于 asyncio 的分阶段流水线: 上传 -> 轮询转换 -> 构建 Prompt -> LLM 总结
+    每个阶段有独立的并发数, 阶段之间用有界队列衔接 (队列满时上游自动等待, 即背压),
+    一篇论文的 markdown 就绪后立即进入 LLM 阶段, 无需等待其他论文转换完成
+    """
+    STAGES = ('upload', 'poll', 'prompt', 'llm')
+    # 流水线阶段完成后在运行清单中记录的阶段 (uploaded 在提交成功时单独记录)
+    MANIFEST_STAGES = {'poll': 'converted', 'prompt': 'prompted', 'llm': 'summarized'}
+
+    def __init__(self, config, pdf_processor, llm_handler, manifest, on_complete=None):
+        self.config = config
+        self.on_complete = on_complete
+        self.pdf_processor = pdf_processor
+        self.llm_handler = llm_handler
+        self.manifest = manifest
+
+        async_conf = config['concurrency'].get('async', {})
+        self.limits = {stage: async_conf.get(f'{stage}_workers', 4) for stage in self.STAGES}
+        self.queue_size = async_conf.get('queue_size', 16)
+        # 与 PDFProcessor._inflight 相同: 内容相同的 PDF 同时只转换一次
+        self._converting = {}  # sha -> Future (转换完成后的 markdown)
+        self._followers = set()  # 等待同内容 PDF 转换结果的任务
+
+    def run(self, papers):
+        """
+        papers: 论文列表或生成器 (生成器在线程中逐个取出, 边发现边处理)
+        """
+        asyncio.run(self._run(papers))
+
+    async def _run(self, papers):
+        queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in self.STAGES}
+        self.queues = queues
+        self.pbar = tqdm(total=0)
+
+        # 结果下载由 ApiPDFProcessor 的下载线程池完成 (不走代理)
+        async with httpx.AsyncClient(timeout=60) as http:
+            self.http = http
+
+            handlers = {
+                'upload': (self._upload, queues['poll']),
+                'poll': (self._poll, queues['prompt']),
+                'prompt': (self._prompt, queues['llm']),
+                'llm': (self._llm, None),
+            }
+            workers = {
+                stage: [asyncio.create_task(self._worker(stage, queues[stage], *handlers[stage]))
+                        for _ in range(self.limits[stage])]
+                for stage in self.STAGES
+            }
+
+            papers = iter(papers)
+            while (paper := await asyncio.to_thread(next, papers, None)) is not None:
+                # 进度按估计的工作量计 (未启用调度时每篇为 1)
+                self.pbar.total += paper.get('work', 1)
+                self.pbar.refresh()
+                await queues['upload'].put((paper, time.monotonic()))
+
+            # 逐级关闭: 上一阶段全部结束后再向下一阶段发送结束标记
+            for stage in self.STAGES:
+                for _ in workers[stage]:
+                    await queues[stage].put(None)
+                await asyncio.gather(*workers[stage])
+                if stage == 'poll':
+                    # 等待同内容 PDF 的结果进入 prompt 队列后再关闭 prompt 阶段
+                    await asyncio.gather(*self._followers)
+
+        self.pbar.close()
+
+    async def _worker(self, stage, queue, handler, next_queue):
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            item, queued_at = entry
+            paper = item if stage == 'upload' else item['paper']
+            # 每个 worker 任务有独立的上下文, 按当前论文设置模式
+            mode = item['mode'] if stage != 'upload' else determine_mode(paper['id'], self.config['processing_rules'])
+            current_mode.set(mode)
+            metrics.observe(f"queue_wait_{stage}", time.monotonic() - queued_at)
+            start = time.time()
+            try:
+                result = await handler(item)
+            except Exception as e:
+                metrics.count('failures')
+                logger.error(f"[{paper['id']}] Failed at {stage}: {str(e)}")
+                await asyncio.to_thread(self.manifest.fail, paper['file_path'], e)
+                await self._finish(paper)
+                continue
+            if result is not None and stage in self.MANIFEST_STAGES:
+                await asyncio.to_thread(self.manifest.advance, result['paper']['file_path'],
+                                        self.MANIFEST_STAGES[stage], elapsed=time.time() - start)
+            if result is None:
+                # 该论文无需继续处理 (已存在输出)
+                await self._finish(item)
+            elif 'same_as' in result:
+                # 同内容的 PDF 正在转换: 在单独的任务中等待其结果, 不占用 poll 阶段的 worker
+                task = asyncio.create_task(self._follow(result))
+                self._followers.add(task)
+                task.add_done_callback(self._followers.discard)
+            elif next_queue is not None:
+                await next_queue.put((result, time.monotonic()))
+            else:
+                metrics.observe('paper', time.monotonic() - result['started'])
+                metrics.count('papers')
+                await self._finish(result['paper'])
+
+    async def _follow(self, job):
+        paper = job['paper']
+        start = time.time()
+        try:
+            job['md_content'] = await job.pop('same_as')
+        except Exception as e:
+            metrics.count('failures')
+            logger.error(f"[{paper['id']}] Failed at poll: {str(e)}")
+            await asyncio.to_thread(self.manifest.fail, paper['file_path'], e)
+            await self._finish(paper)
+            return
+        await asyncio.to_thread(self.manifest.advance, paper['file_path'], 'converted', elapsed=time.time() - start)
+        await self.queues['prompt'].put((job, time.monotonic()))
+
+    def _settle(self, sha, content=None, error=None):
+        """
+        本篇转换结束, 把结果 (或错误) 交给等待同内容 PDF 的任务
+        """
+        future = self._converting.pop(sha, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+        else:
+            future.set_result(content)
+
+    async def _finish(self, paper):
+        if self.on_complete is not None:
+            await asyncio.to_thread(self.on_complete, paper)
+        self.pbar.update(paper.get('work', 1))
+
+    async def _upload(self, paper):
+        mode = determine_mode(paper['id'], self.config['processing_rules'])
+        output_path = get_output_path(paper, mode)
+        pdf_path = paper['file_path']
+        await asyncio.to_thread(self.manifest.discover, paper, mode, output_path)
+        record = await asyncio.to_thread(self.manifest.get, pdf_path)
+        if os.path.exists(output_path):
+            logger.warning(f"Output for {paper['id']} already exists. Skipping.")
+            metrics.count('skipped')
+            if record['status'] != 'done':
+                await asyncio.to_thread(self.manifest.advance, pdf_path, 'summarized')
+            return None
+        logger.info(f"正在处理子目录 [{paper['id']}] 下pdf, 处理模式: {mode}")
+
+        job = {'paper': paper, 'mode': mode, 'output_path': output_path, 'started': time.monotonic()}
+        job['sha'] = await asyncio.to_thread(self.pdf_processor.hash_of, pdf_path)
+        job['md_content'] = await asyncio.to_thread(self.pdf_processor._check_cache, job['sha'], paper['file_name'])
+        if job['md_content'] is not None:
+            return job
+
+        if job['sha'] in self._converting:
+            logger.info(f"[{paper['id']}] Same content as a PDF being converted, waiting for its result")
+            job['same_as'] = self._converting[job['sha']]
+            return job
+        self._converting[job['sha']] = asyncio.get_running_loop().create_future()
+        try:
+            job = await self._convert(job, record)
+        except Exception as e:
+            self._settle(job['sha'], error=e)
+            raise
+        if job['md_content'] is not None:
+            self._settle(job['sha'], job['md_content'])
+        return job
+
+    async def _convert(self, job, record):
+        """
+        开始转换: 本地 CLI 或文本层快速通道直接得到 markdown, 否则提交给 MinerU (或接管已提交的批次)
+        """
+        paper, mode, pdf_path = job['paper'], job['mode'], job['paper']['file_path']
+        processor = self.pdf_processor.processor
+        if not hasattr(processor, 'upload_async'):
+            # 本地 CLI 模式没有远程上传/轮询, 直接在线程中完成转换
+            job['md_content'] = await asyncio.to_thread(self.pdf_processor.convert_to_markdown, pdf_path, mode=mode)
+            return job
+
+        entry_dir = self.pdf_processor.cache.entry_dir(job['sha'])
+        if record['stage'] == 'uploaded' and record['batch_id']:
+            # 接管上次运行中已提交的批次
+            data_id, (_, file_name, target_dir) = processor._batch_entry(pdf_path, entry_dir)
+            logger.info(f"Re-attaching to in-flight batch {record['batch_id']} for {file_name}")
+            job['upload'] = (record['batch_id'], data_id, file_name, target_dir)
+            return job
+
+        # 文本层快速通道 (在进程池中提取, 不占用事件循环)
+        job['md_content'] = await asyncio.to_thread(self.pdf_processor.fast_path, pdf_path, mode, job['sha'])
+        if job['md_content'] is not None:
+            return job
+
+        job['upload'] = await processor.upload_async(self.http, pdf_path, entry_dir)
+        await asyncio.to_thread(self.manifest.advance, pdf_path, 'uploaded', batch_id=job['upload'][0])
+        return job
+
+    async def _poll(self, job):
+        if job['md_content'] is None:
+            try:
+                await self.pdf_processor.processor.poll_async(self.http, *job['upload'],
+                                                              pdf_path=job['paper']['file_path'])
+                file_name = job['upload'][2]
+                job['md_content'] = await asyncio.to_thread(self.pdf_processor.register_result, job['sha'], file_name)
+            except Exception as e:
+                self._settle(job['sha'], error=e)
+                raise
+            self._settle(job['sha'], job['md_content'])
+        return job
+
+    async def _prompt(self, job):
+        dedup = self.llm_handler.dedup
+        if dedup:
+            # 与已总结论文近似重复时复用其总结 (在预处理前对原始正文签名)
+            job['signature'] = await asyncio.to_thread(dedup.signature, job['md_content'])
+            match = await asyncio.to_thread(dedup.find, job['signature'], job['mode'], job['paper']['file_path'])
+            if match:
+                job.pop('md_content')
+                job['duplicate'] = match
+                return job
+
+        preprocessor = MarkdownPreprocessor.from_config(self.config.get('processing_rules', {}),
+                                                        self.llm_handler.token_counter)
+        content = await asyncio.to_thread(preprocessor.run, job.pop('md_content'), f"[{job['paper']['id']}] ")
+        if MapReduceSummarizer.enabled_for(self.config, job['mode']):
+            map_reducer = MapReduceSummarizer(self.config, self.llm_handler)
+            if await asyncio.to_thread(map_reducer.needs_split, content, job['mode']):
+                job['map_reduce'] = (map_reducer, content)
+                return job
+
+        job['prompt'] = await asyncio.to_thread(
+            PromptBuilder.build_summary_prompt, content, job['mode'],
+            remove_refs=False, budget=self.llm_handler.budget)
+        return job
+
+    async def _llm(self, job):
+        if 'duplicate' in job:
+            match = job.pop('duplicate')
+            await asyncio.to_thread(save_duplicate_summary, job['output_path'], job['paper'], job['mode'], match,
+                                    self.llm_handler.dedup.action)
+            metrics.count('near_duplicates')
+            logger.success(f"[{job['paper']['id']}] Near-duplicate of {match['file_path']} "
+                           f"(similarity {match['similarity']:.2f}), summary reused at {job['output_path']}")
+            return job
+
+        if 'map_reduce' in job:
+            # 分块总结内部自带有界线程池
+            map_reducer, content = job.pop('map_reduce')
+            job['prompt'] = await asyncio.to_thread(map_reducer.build_reduce_prompt, content, job['mode'])
+
+        if self.llm_handler.stream:
+            # 流式写文件在线程中进行, 占用的线程数受 llm_workers 限制
+            await asyncio.to_thread(self.llm_handler.stream_to_file, job.pop('prompt'), job['output_path'],
+                                    summary_header(job['paper'], job['mode']))
+        else:
+            summary = await self.llm_handler.asummarize(job.pop('prompt'))
+            await asyncio.to_thread(save_summary, job['output_path'], job['paper'], job['mode'], summary)
+        if self.llm_handler.dedup:
+            await asyncio.to_thread(self.llm_handler.dedup.add, job['paper']['file_path'], job['mode'],
+                                    job['output_path'], job.get('signature'))
+        logger.success(f"[{job['paper']['id']}] Summary saved to {job['output_path']}")
+        return job
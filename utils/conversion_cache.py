@@ -0,0 +1,181 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from loguru import logger
+
+class ConversionCache:
+    """
+    以 PDF 内容 SHA-256 为键的 MinerU 转换结果缓存
+    每个条目存放在 cache_dir/<sha256>/ 下, 索引 (SQLite) 记录 markdown 路径、大小、模型版本与时间戳
+    分布式模式下多个进程共享 cache_dir: 与 WorkQueue 相同不使用 WAL, 写入在 BEGIN IMMEDIATE 事务中进行
+    """
+    INDEX_DB = "cache_index.db"
+    # 命中时的 last_access 先记在内存中, 攒够 FLUSH_COUNT 条或距上次写入超过 FLUSH_INTERVAL 秒后批量写入, 其余在 close() 时写入
+    FLUSH_COUNT = 64
+    FLUSH_INTERVAL = 30
+    # 最近 EVICT_GRACE 秒内被访问过的条目可能正被其他进程读取, 不淘汰
+    EVICT_GRACE = 600
+
+    def __init__(self, cache_dir, max_size_mb=0):
+        self.cache_dir = os.path.abspath(cache_dir).replace('\\', '/')
+        self.max_size = int(max_size_mb * 1024 * 1024)  # 0 表示不限制
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index_path = os.path.join(self.cache_dir, self.INDEX_DB)
+        self._lock = threading.Lock()
+        self._touched = {}  # sha -> 尚未写入的 last_access
+        self._last_flush = time.time()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                sha TEXT PRIMARY KEY,
+                md_path TEXT,
+                size INTEGER,
+                model_version TEXT,
+                created REAL,
+                last_access REAL
+            )
+        """)
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        """
+        分块流式计算文件 SHA-256, 避免大文件整体读入内存
+        """
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def entry_dir(self, sha):
+        return os.path.join(self.cache_dir, sha)
+
+    def get(self, sha):
+        """
+        返回缓存的 markdown 绝对路径, 未命中返回 None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT md_path, last_access FROM entries WHERE sha = ?", (sha,)).fetchone()
+            if row is None:
+                return None
+            md_path = os.path.join(self.cache_dir, row['md_path'])
+            if not os.path.exists(md_path):
+                # 文件被手动删除, 清理失效索引
+                self._conn.execute("DELETE FROM entries WHERE sha = ?", (sha,))
+                self._touched.pop(sha, None)
+                return None
+            now = time.time()
+            self._touched[sha] = now
+            # 索引中的访问时间已接近淘汰保护期时立即写入, 防止其他进程在读取期间淘汰该条目
+            if (row['last_access'] < now - self.EVICT_GRACE / 2 or len(self._touched) >= self.FLUSH_COUNT
+                    or now - self._last_flush >= self.FLUSH_INTERVAL):
+                self._flush()
+            return md_path
+
+    def put(self, sha, md_path, model_version):
+        """
+        登记一条转换结果, 并按容量上限执行 LRU 淘汰
+        """
+        now = time.time()
+        with self._lock:
+            self._flush()
+            size = self._dir_size(self.entry_dir(sha))
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                   (sha, os.path.relpath(md_path, self.cache_dir).replace('\\', '/'),
+                                    size, model_version, now, now))
+                evicted = self._evict(keep=sha)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        # 索引提交后再删除目录; 其他进程此后不会再命中这些条目
+        for sha, size in evicted:
+            logger.info(f"Evicting cached conversion {sha[:12]} ({size / 1024 / 1024:.1f} MB)")
+            shutil.rmtree(self.entry_dir(sha), ignore_errors=True)
+
+    def flush(self):
+        """
+        写入内存中尚未保存的访问时间
+        """
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """
+        运行结束时调用: 写入尚未保存的访问时间并关闭索引连接
+        """
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    def stats(self):
+        self.flush()
+        with self._lock:
+            entries = [dict(row) for row in self._conn.execute("SELECT * FROM entries").fetchall()]
+        total = sum(e['size'] for e in entries)
+        versions = {}
+        for e in entries:
+            versions[e['model_version']] = versions.get(e['model_version'], 0) + 1
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': len(entries),
+            'total_size_mb': round(total / 1024 / 1024, 2),
+            'max_size_mb': round(self.max_size / 1024 / 1024, 2) if self.max_size else None,
+            'model_versions': versions,
+            'oldest': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(min(e['created'] for e in entries))) if entries else None,
+            'newest': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(max(e['created'] for e in entries))) if entries else None,
+        }
+
+    def _flush(self):
+        if self._touched:
+            # 只向后推进, 不覆盖其他进程写入的更晚时间
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("UPDATE entries SET last_access = MAX(last_access, ?) WHERE sha = ?",
+                                       [(at, sha) for sha, at in self._touched.items()])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._touched.clear()
+        self._last_flush = time.time()
+
+    def _evict(self, keep=None):
+        """
+        在 put 的事务中执行: 删除超出容量的最久未访问条目的索引, 返回 [(sha, size)] 供提交后删除目录
+        """
+        if not self.max_size:
+            return []
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_size:
+            return []
+        evicted = []
+        protected_after = time.time() - self.EVICT_GRACE
+        # 按最近访问时间从旧到新淘汰
+        for row in self._conn.execute("SELECT sha, size, last_access FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_size:
+                break
+            if row['sha'] == keep or row['last_access'] >= protected_after:
+                continue
+            self._conn.execute("DELETE FROM entries WHERE sha = ?", (row['sha'],))
+            evicted.append((row['sha'], row['size']))
+            total -= row['size']
+        if total > self.max_size:
+            logger.warning(f"Conversion cache over limit ({total / 1024 / 1024:.1f} MB); remaining entries were used "
+                           f"within the last {self.EVICT_GRACE}s and are kept")
+        return evicted
+
+    @staticmethod
+    def _dir_size(path):
+        total = 0
+        for root, dirs, files in os.walk(path):
+            for file in files:
+                total += os.path.getsize(os.path.join(root, file))
+        return total
@@ -0,0 +1,150 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from loguru import logger
+from .metrics import metrics
+
+TOKEN_RE = re.compile(r'[a-z0-9]+|[\u4e00-\u9fff]')
+# 64 位乘法哈希的常数 (黄金分割), 用于把连续的词哈希组合为 shingle 哈希
+SHINGLE_MULT = np.uint64(0x9E3779B97F4A7C15)
+BLOCK = 4096
+
+
+class NearDuplicateIndex:
+    """
+    近似重复论文检测: 对 markdown 正文的 k 词 shingle 计算 MinHash 签名 (numpy 向量化),
+    按 LSH 分段 (bands) 建立倒排索引并持久化在 SQLite 中; 同一模式下估计 Jaccard 相似度
+    达到 threshold 的已总结论文 (如 arXiv v1/v2、预印本与正式版) 直接复用其总结, 不再请求 LLM
+    """
+    def __init__(self, db_path, threshold=0.8, num_perm=128, bands=32, shingle_size=5, action='copy'):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.action = action
+        # 固定种子, 保证各次运行的签名可比较
+        rng = np.random.default_rng(20240917)
+        self._a = rng.integers(1, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                file_path TEXT PRIMARY KEY,
+                mode TEXT,
+                output_path TEXT,
+                signature BLOB,
+                created REAL
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (mode TEXT, band INTEGER, bucket BLOB, file_path TEXT)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_key ON buckets (mode, band, bucket)")
+        self._check_params()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        读取 processing_rules.dedup, 未启用时返回 None
+        """
+        conf = config.get('processing_rules', {}).get('dedup', {})
+        if not conf.get('enabled', False):
+            return None
+        db_path = conf.get('index_path') or os.path.join(config['paths']['temp_dir'], 'dedup.db')
+        return cls(db_path, threshold=conf.get('threshold', 0.8), num_perm=conf.get('num_perm', 128),
+                   bands=conf.get('bands', 32), shingle_size=conf.get('shingle_size', 5),
+                   action=conf.get('action', 'copy'))
+
+    def _check_params(self):
+        # 签名参数变化后旧签名不可比较, 清空索引
+        params = f"{self.num_perm}/{self.bands}/{self.shingle_size}"
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if row and row[0] != params:
+            logger.warning(f"Dedup index parameters changed ({row[0]} -> {params}), rebuilding index")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.execute("DELETE FROM buckets")
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('params', ?)", (params,))
+
+    def signature(self, text):
+        """
+        计算 MinHash 签名 (num_perm 个 uint32); 正文过短时返回 None
+        """
+        tokens = TOKEN_RE.findall(text.lower())
+        if len(tokens) < self.shingle_size * 4:
+            return None
+        # 只对不同的词计算哈希, 再按出现位置展开
+        vocab, inverse = np.unique(np.array(tokens), return_inverse=True)
+        word_hashes = np.array([int.from_bytes(hashlib.blake2b(w.encode('utf-8'), digest_size=8).digest(), 'little')
+                                for w in vocab.tolist()], dtype=np.uint64)[inverse]
+
+        count = len(word_hashes) - self.shingle_size + 1
+        shingles = word_hashes[:count].copy()
+        for offset in range(1, self.shingle_size):
+            shingles = shingles * SHINGLE_MULT + word_hashes[offset:offset + count]
+        shingles = np.unique(shingles)
+
+        # 乘法-移位哈希 (a * x + b) >> 32 模拟 num_perm 个随机置换, 分块计算以限制内存
+        signature = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint64)
+        for start in range(0, len(shingles), BLOCK):
+            block = shingles[start:start + BLOCK]
+            hashed = (self._a[:, None] * block[None, :] + self._b[:, None]) >> np.uint64(32)
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [(band, rows.tobytes()) for band, rows in enumerate(signature.reshape(self.bands, -1))]
+
+    def find(self, signature, mode, exclude=None):
+        """
+        返回同一模式下最相似且总结文件仍存在的论文 {'file_path', 'output_path', 'similarity'}, 无则返回 None
+        exclude: 排除的 PDF 路径 (论文自身)
+        """
+        if signature is None:
+            return None
+        with metrics.span('dedup'):
+            with self._lock:
+                candidates = set()
+                for band, bucket in self._band_keys(signature):
+                    rows = self._conn.execute(
+                        "SELECT file_path FROM buckets WHERE mode = ? AND band = ? AND bucket = ?",
+                        (mode, band, bucket)).fetchall()
+                    candidates.update(r[0] for r in rows)
+                candidates.discard(exclude)
+                docs = [self._conn.execute("SELECT file_path, output_path, signature FROM docs WHERE file_path = ?",
+                                           (path,)).fetchone() for path in candidates]
+            best = None
+            for doc in docs:
+                if doc is None or not os.path.exists(doc[1]):
+                    continue
+                similarity = float(np.mean(np.frombuffer(doc[2], dtype=np.uint32) == signature))
+                if similarity >= self.threshold and (best is None or similarity > best['similarity']):
+                    best = {'file_path': doc[0], 'output_path': doc[1], 'similarity': similarity}
+        return best
+
+    def add(self, file_path, mode, output_path, signature):
+        """
+        登记一篇已完成总结的论文 (重复登记时替换旧签名)
+        """
+        if signature is None:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM buckets WHERE file_path = ?", (file_path,))
+                self._conn.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?)",
+                                   (file_path, mode, output_path, signature.tobytes(), time.time()))
+                self._conn.executemany("INSERT INTO buckets VALUES (?, ?, ?, ?)",
+                                       [(mode, band, bucket, file_path) for band, bucket in self._band_keys(signature)])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
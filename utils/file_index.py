@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from .conversion_cache import ConversionCache
+
+
+def scan_pdf_files(root_dir, workers=8):
+    """
+    并行递归遍历 root_dir 下各 ID 文件夹, 边遍历边产出 PDF (扩展名不区分大小写)
+    ID 为 root_dir 下的一级子文件夹名, PDF 可位于其任意深度的子目录中
+    产出: {'id', 'folder_path', 'file_path', 'file_name', 'size', 'mtime_ns'}
+    """
+    with os.scandir(root_dir) as entries:
+        id_dirs = [entry for entry in entries if entry.is_dir()]
+    if not id_dirs:
+        return
+
+    found = queue.Queue()
+
+    def walk(id_dir):
+        try:
+            stack = [id_dir.path]
+            while stack:
+                current = stack.pop()
+                try:
+                    entries = os.scandir(current)
+                except OSError as e:
+                    logger.warning(f"Cannot scan {current}: {e}")
+                    continue
+                with entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                            stat = entry.stat()
+                            found.put({
+                                'id': id_dir.name,
+                                'folder_path': current.replace('\\', '/'),
+                                'file_path': entry.path.replace('\\', '/'),
+                                'file_name': entry.name,
+                                'size': stat.st_size,
+                                'mtime_ns': stat.st_mtime_ns,
+                            })
+        finally:
+            # 每个 ID 文件夹遍历结束放入一个结束标记
+            found.put(None)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for id_dir in id_dirs:
+            pool.submit(walk, id_dir)
+        remaining = len(id_dirs)
+        while remaining:
+            item = found.get()
+            if item is None:
+                remaining -= 1
+            else:
+                yield item
+
+
+def discover_papers(root_dir, index=None, watch=False, interval=30, workers=8, min_age=10):
+    """
+    产出待处理论文的生成器, 供处理流程边发现边消费
+    index: FileIndex, 提供时只产出相对快照新增或内容变化的 PDF
+    watch: 首次扫描后持续监视 root_dir, 产出运行期间新放入的 PDF
+    监视模式下 PDF 可能仍在复制中: 只有修改时间早于 min_age 秒前, 且 (首次扫描之后) 大小与修改时间在连续两次扫描间不变才产出
+    """
+    seen = set()
+    pending = {}  # 监视模式: 上一次扫描到的未产出文件 file_path -> (size, mtime_ns)
+    first = True
+    while True:
+        previous, pending = pending, {}
+        now_ns = time.time_ns()
+        for paper in scan_pdf_files(root_dir, workers):
+            key = (paper['file_path'], paper['size'], paper['mtime_ns'])
+            if key in seen:
+                continue
+            if watch:
+                stamp = (paper['size'], paper['mtime_ns'])
+                # 启动时已存在的旧文件直接产出, 不必等待一个扫描间隔
+                unstable = not first and previous.get(paper['file_path']) != stamp
+                if unstable or now_ns - paper['mtime_ns'] < min_age * 1e9:
+                    pending[paper['file_path']] = stamp
+                    continue
+            seen.add(key)
+            if index is None or index.changed(paper):
+                yield paper
+        if not watch:
+            return
+        first = False
+        time.sleep(interval)
+
+
+class FileIndex:
+    """
+    输入文件快照: 记录每个 PDF 的路径、大小、修改时间与内容哈希
+    大小与修改时间都未变化时直接视为未变化, 不再读取文件内容
+    """
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.files = {}
+        if os.path.exists(snapshot_path):
+            try:
+                with open(snapshot_path, 'r', encoding='utf-8') as f:
+                    self.files = json.load(f).get('files', {})
+            except Exception as e:
+                logger.warning(f"Failed to load file index snapshot, rescanning everything: {e}")
+
+    def changed(self, paper):
+        with self._lock:
+            entry = self.files.get(paper['file_path'])
+        if entry is None:
+            return True
+        if entry['size'] == paper['size'] and entry['mtime_ns'] == paper['mtime_ns']:
+            return False
+        if entry['size'] != paper['size']:
+            return True
+        # 仅修改时间变化 (如被复制或 touch), 用内容哈希确认
+        if ConversionCache.hash_file(paper['file_path']) != entry['sha256']:
+            return True
+        self.commit(paper, entry['sha256'])
+        return False
+
+    def commit(self, paper, sha256):
+        """
+        论文处理完成后登记到快照; 每登记 100 篇自动保存一次
+        """
+        with self._lock:
+            self.files[paper['file_path']] = {
+                'size': paper['size'],
+                'mtime_ns': paper['mtime_ns'],
+                'sha256': sha256,
+            }
+            self._dirty += 1
+            should_save = self._dirty >= 100
+        if should_save:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            self._dirty = 0
+            os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'files': self.files}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+from loguru import logger
+from .llm_handler import LLMError, SYSTEM_PROMPT
+from .response_cache import ResponseCache
+from .metrics import metrics
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+class LLMBatch:
+    """
+    OpenAI Batch API 模式: 收集各论文的 Prompt 写成 JSONL, 经 /v1/files 上传并创建 /v1/batches 任务,
+    轮询至完成后逐行读取输出文件, 按 custom_id 交回对应论文; 失败或未完成的请求重新提交, 最多 max_resubmits 次
+    已提交的批次记录在 work_dir/state.json 中, 中断后重跑时相同的 Prompt 直接接管原批次而不重复提交
+    每个请求使用其模式路由的首选模型; 路由到不同接口地址 (Endpoint) 的请求分别写入各自的批次
+    """
+    def __init__(self, config, llm_handler):
+        conf = config['api']['llm'].get('batch', {})
+        self.llm = llm_handler
+        self.work_dir = conf.get('work_dir') or os.path.join(config['paths']['temp_dir'], 'llm_batches')
+        self.completion_window = conf.get('completion_window', '24h')
+        self.max_requests = conf.get('max_requests', 50000)
+        self.max_bytes = conf.get('max_file_mb', 190) * 1024 * 1024
+        self.poll_interval = conf.get('poll_interval', 60)
+        self.max_resubmits = conf.get('max_resubmits', 2)
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.state_path = os.path.join(self.work_dir, 'state.json')
+        self._lock = threading.Lock()
+        self._jobs = {}  # custom_id -> (prompt, context, route)
+
+    @staticmethod
+    def enabled(config):
+        return config['api']['llm'].get('mode', 'chat') == 'batch'
+
+    def add(self, key, prompt, context, mode=None):
+        """
+        登记一篇论文的 Prompt; key 在本次运行中唯一 (如 PDF 路径), context 原样交回结果回调
+        mode 决定路由的模型, 为空时取 current_mode
+        custom_id 由 key 与 Prompt 指纹 (含模型) 组成, Prompt 与模型不变时重跑得到相同的 custom_id
+        """
+        route = self.llm.routes_for(mode)[0]
+        prompt_key = ResponseCache.make_key(route.model, SYSTEM_PROMPT, prompt)
+        custom_id = f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}-{prompt_key[:16]}"
+        with self._lock:
+            self._jobs[custom_id] = (prompt, context, route)
+
+    def run(self, on_result):
+        """
+        提交全部登记的 Prompt 并等待结果
+        on_result(context, content=None, usage=None, error=None): 每篇论文成功或最终失败时调用一次
+        """
+        pending = {}
+        for custom_id, (prompt, context, route) in self._jobs.items():
+            try:
+                key, hit = self.llm._cache_lookup(prompt, route.model)
+            except LLMError as e:
+                on_result(context, error=str(e))
+                continue
+            if hit is not None:
+                on_result(context, hit['content'], None)
+            else:
+                pending[custom_id] = (prompt, context, key, route)
+        if not pending:
+            return
+        logger.info(f"Batch API: {len(pending)} 个请求待提交")
+
+        try:
+            self._run(pending, on_result)
+        except Exception as e:
+            # 已提交的批次仍记录在 state.json 中, 重跑时接管
+            logger.error(f"Batch API: {e}")
+        for prompt, context, key, route in pending.values():
+            on_result(context, error=f"Batch API request failed after {self.max_resubmits + 1} submissions")
+
+    def _run(self, pending, on_result):
+        state = self._load_state()
+        for attempt in range(self.max_resubmits + 1):
+            # 上次运行中已提交且仍有本次请求的批次直接接管
+            batches = {}
+            attached = set()
+            for batch_id, custom_ids in state.items():
+                wanted = [cid for cid in custom_ids if cid in pending]
+                if wanted:
+                    batches[batch_id] = wanted
+                    attached.update(wanted)
+            if attached:
+                logger.info(f"Batch API: 接管 {len(batches)} 个已提交的批次 ({len(attached)} 个请求)")
+            remaining = [cid for cid in pending if cid not in attached]
+            for chunk in self._chunks(remaining, pending):
+                try:
+                    batch_id = self._submit(chunk, pending)
+                except LLMError as e:
+                    logger.error(f"Batch API: 提交失败: {e}")
+                    continue
+                batches[batch_id] = chunk
+                state[batch_id] = chunk
+                self._save_state(state)
+
+            clients = {batch_id: self._client(custom_ids, pending) for batch_id, custom_ids in batches.items()}
+            with metrics.span('llm_batch'):
+                statuses = self._wait(clients)
+            for batch_id, batch in statuses.items():
+                self._consume(clients[batch_id], batch, pending, on_result)
+                state.pop(batch_id, None)
+                self._save_state(state)
+            if not pending:
+                return
+            if attempt < self.max_resubmits:
+                logger.warning(f"Batch API: {len(pending)} 个请求失败或未完成, 重新提交 ({attempt + 1}/{self.max_resubmits})")
+
+    def _chunks(self, custom_ids, pending):
+        """
+        按 Endpoint 分组, 再按请求数与文件大小上限切分为多个批次
+        """
+        groups = {}
+        for custom_id in custom_ids:
+            groups.setdefault(pending[custom_id][3].endpoint, []).append(custom_id)
+        for group in groups.values():
+            chunk, size = [], 0
+            for custom_id in group:
+                line_size = len(self._line(custom_id, pending).encode('utf-8'))
+                if chunk and (len(chunk) >= self.max_requests or size + line_size > self.max_bytes):
+                    yield chunk
+                    chunk, size = [], 0
+                chunk.append(custom_id)
+                size += line_size
+            if chunk:
+                yield chunk
+
+    @staticmethod
+    def _client(custom_ids, pending):
+        # 同一批次的请求都路由到同一个 Endpoint
+        return pending[custom_ids[0]][3].endpoint.client
+
+    def _line(self, custom_id, pending):
+        prompt, route = pending[custom_id][0], pending[custom_id][3]
+        body = {"model": route.model, "messages": self.llm._messages(prompt)}
+        return json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body},
+                          ensure_ascii=False) + "\n"
+
+    def _submit(self, custom_ids, pending):
+        """
+        写出 JSONL, 上传并创建批次, 返回 batch_id
+        """
+        path = os.path.join(self.work_dir, f"input_{time.strftime('%Y%m%d_%H%M%S')}_{len(custom_ids)}.jsonl")
+        client = self._client(custom_ids, pending)
+        with open(path, 'w', encoding='utf-8') as f:
+            for custom_id in custom_ids:
+                f.write(self._line(custom_id, pending))
+        with metrics.span('llm_batch_upload'):
+            with open(path, 'rb') as f:
+                input_file = self._request(client.files.create, file=f, purpose='batch')
+        batch = self._request(client.batches.create, input_file_id=input_file.id, endpoint=ENDPOINT,
+                              completion_window=self.completion_window)
+        os.remove(path)
+        logger.info(f"Batch API: 已提交批次 {batch.id} ({len(custom_ids)} 个请求)")
+        return batch.id
+
+    def _wait(self, clients):
+        """
+        轮询全部批次 ({batch_id: 所在 Endpoint 的客户端}) 直到进入终止状态, 返回 {batch_id: batch}
+        """
+        done = {}
+        while len(done) < len(clients):
+            for batch_id, client in clients.items():
+                if batch_id in done:
+                    continue
+                batch = self._request(client.batches.retrieve, batch_id)
+                counts = batch.request_counts
+                if batch.status in TERMINAL_STATES:
+                    done[batch_id] = batch
+                    logger.info(f"Batch API: 批次 {batch_id} {batch.status}"
+                                + (f", 成功 {counts.completed}/{counts.total}, 失败 {counts.failed}" if counts else ""))
+                elif counts:
+                    logger.info(f"Batch API: 批次 {batch_id} {batch.status} {counts.completed + counts.failed}/{counts.total}")
+            if len(done) < len(clients):
+                time.sleep(self.poll_interval)
+        return done
+
+    def _consume(self, client, batch, pending, on_result):
+        """
+        逐行读取输出文件, 成功的请求交回并从 pending 移除; 失败的留在 pending 中等待重新提交
+        """
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            with client.files.with_streaming_response.content(file_id) as response:
+                for line in response.iter_lines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    custom_id = record.get('custom_id')
+                    if custom_id not in pending:
+                        continue
+                    result = record.get('response') or {}
+                    if result.get('status_code') != 200:
+                        error = record.get('error') or (result.get('body') or {}).get('error')
+                        logger.warning(f"Batch API: 请求 {custom_id} 失败: {error}")
+                        metrics.count('llm_batch_failures')
+                        continue
+                    body = result['body']
+                    content = body['choices'][0]['message']['content']
+                    usage = SimpleNamespace(**body['usage']) if body.get('usage') else None
+                    prompt, context, key, route = pending.pop(custom_id)
+                    self.llm._cache_store(key, content, usage, route.model)
+                    on_result(context, content, usage)
+
+    def _request(self, method, *args, **kwargs):
+        """
+        文件与批次接口的请求, 沿用 LLMHandler 的重试判断与退避
+        """
+        for attempt in range(self.llm.max_retries + 1):
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                delay = self.llm._retry_delay(e, attempt)
+                if delay is None:
+                    raise LLMError(str(e)) from e
+                logger.warning(f"Batch API request failed ({str(e)}), retry {attempt+1}/{self.llm.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
@@ -1,34 +1,537 @@
-from openai import OpenAI
-from loguru import logger
 import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+import email.utils
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import httpx
+import openai
+from openai import OpenAI, AsyncOpenAI
+from loguru import logger
+from .token_budget import TokenBudget
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
+from .dedup import NearDuplicateIndex
+from .llm_routing import Endpoint, Route, HedgePolicy
+from .metrics import metrics, current_mode
+
+SYSTEM_PROMPT = "You are a helpful research assistant."
+
+
+class LLMError(Exception):
+    """
+    LLM 请求在重试后仍失败
+    """
+
+
+class StreamInterrupted(Exception):
+    """
+    流式输出中途超时或连接中断 (可重试)
+    """
+
+
+# 流式输出过程中可能出现的网络错误
+STREAM_ERRORS = (httpx.TimeoutException, httpx.RemoteProtocolError, httpx.ReadError, openai.APIConnectionError)
+
 
 class LLMHandler:
     def __init__(self, config):
         self.config = config
         llm_conf = config['api']['llm']
-        
-        self.client = OpenAI(
-            api_key=llm_conf['api_key'],
-            base_url=llm_conf['base_url']
-        )
+
         self.model = llm_conf['model_name']
         self.timeout = llm_conf.get('timeout', 120)
+        self.max_retries = llm_conf.get('max_retries', 5)
+        self.backoff_base = llm_conf.get('backoff_base', 2)
+        self.backoff_max = llm_conf.get('backoff_max', 60)
+        # 流式模式: 边生成边写入文件
+        self.stream = llm_conf.get('stream', False)
+        self.stream_read_timeout = llm_conf.get('stream_read_timeout', 120)
 
-    def summarize(self, prompt_content):
+        # 每个 (base_url, api_key) 一个 Endpoint: 共享连接池与限流器, 重试由本类统一处理
+        self.endpoints = {}
+        self.primary = self._endpoint(llm_conf['base_url'], llm_conf['api_key'], llm_conf)
+        self.client = self.primary.client
+
+        # 配置了 context_window 时按 token 预算截断正文
+        self.budget = TokenBudget.from_config(llm_conf)
+        # 未配置预算时仍需估算 token 数 (TPM 限流、分块)
+        self.token_counter = self.budget or TokenBudget(llm_conf.get('tokenizer') or None, 0)
+        # 回复缓存: 相同 prompt 不重复请求
+        self.cache = ResponseCache.from_config(config)
+        # 近似重复检测: 与已总结论文高度相似时复用其总结
+        self.dedup = NearDuplicateIndex.from_config(config)
+
+        # 按模式路由: 每个模式对应有序的候选模型列表, 前一个失败时依次回退; 未配置的模式使用 model_name
+        self.default_routes = [Route(self.model, self.primary, self.timeout, self.max_retries)]
+        self.routes = {mode: [self._route(entry) for entry in entries]
+                       for mode, entries in (llm_conf.get('routing') or {}).items() if entries}
+        self.hedging = HedgePolicy(llm_conf.get('hedging'))
+        # 对冲请求在此线程池中并发发出 (线程按需创建), 未启用对冲时不创建
+        self._hedge_pool = None
+        if self.hedging.enabled:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=2 * llm_conf.get('max_connections', 20),
+                                                  thread_name_prefix="llm-hedge")
+        # 相同 Prompt 同时只请求一次, 其余调用等待并复用其结果 (与 PDFProcessor._inflight 相同的思路)
+        self._inflight = {}  # 请求键 -> Future
+        self._inflight_lock = threading.Lock()
+        self._ainflight = {}  # 异步流水线: 请求键 -> Task
+
+    def close(self):
+        """
+        关闭对冲线程池; 落后的请求结果本就会被丢弃, 不等待其完成
+        """
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _pool_limits(self):
+        llm_conf = self.config['api']['llm']
+        max_connections = llm_conf.get('max_connections', 20)
+        return httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_connections,
+                            keepalive_expiry=llm_conf.get('keepalive_expiry', 60))
+
+    def _http_timeout(self):
+        return httpx.Timeout(self.timeout, connect=10)
+
+    def _make_client(self, base_url, api_key):
+        return OpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                      http_client=httpx.Client(limits=self._pool_limits(), timeout=self._http_timeout()))
+
+    def _make_async_client(self, base_url, api_key):
+        return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                           http_client=httpx.AsyncClient(limits=self._pool_limits(), timeout=self._http_timeout()))
+
+    def _endpoint(self, base_url, api_key, conf):
+        """
+        取得或创建 Endpoint; 限流按首次出现时的配置 (requests_per_minute / tokens_per_minute)
+        """
+        key = (base_url, api_key)
+        if key not in self.endpoints:
+            limiter = RateLimiter(conf.get('requests_per_minute', 0), conf.get('tokens_per_minute', 0))
+            self.endpoints[key] = Endpoint(base_url, api_key, limiter, self._make_client, self._make_async_client)
+        return self.endpoints[key]
+
+    def _route(self, entry):
+        """
+        路由条目: 模型名, 或 {model, base_url, api_key, timeout, max_retries, requests_per_minute, tokens_per_minute},
+        未填写的字段沿用 api.llm 的配置
         """
-        调用 LLM 进行总结
+        llm_conf = self.config['api']['llm']
+        if isinstance(entry, str):
+            entry = {'model': entry}
+        endpoint = self._endpoint(entry.get('base_url') or llm_conf['base_url'],
+                                  entry.get('api_key') or llm_conf['api_key'], entry)
+        return Route(entry['model'], endpoint, entry.get('timeout', self.timeout),
+                     entry.get('max_retries', self.max_retries))
+
+    def routes_for(self, mode=None):
+        """
+        模式对应的候选列表, mode 为空时取 current_mode
+        """
+        return self.routes.get(mode if mode is not None else current_mode.get()) or self.default_routes
+
+    def _messages(self, prompt_content):
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt_content}
+        ]
+
+    def _estimate_tokens(self, prompt_content, limiter):
+        # 仅在配置了 TPM 限流时才需要计数
+        if not limiter.tpm:
+            return 0
+        llm_conf = self.config['api']['llm']
+        return self.token_counter.count(prompt_content) + llm_conf.get('max_output_tokens', 4096)
+
+    def _cache_lookup(self, prompt_content, model=None):
         """
+        返回 (缓存键, 命中的缓存条目); 未启用缓存时返回 (None, None), 离线模式未命中时抛出 LLMError
+        model 为空时取当前模式路由的首选模型
+        """
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(model or self.routes_for()[0].model, SYSTEM_PROMPT, prompt_content)
+        hit = self.cache.get(key)
+        if hit is not None:
+            metrics.count('llm_cache_hits')
+            logger.info(f"LLM cache hit ({hit['completion_tokens'] or 0} completion tokens saved)")
+        elif self.cache.offline:
+            raise LLMError("LLM cache miss in cache_only mode")
+        return key, hit
+
+    def _inflight_key(self, key, prompt_content):
+        # 与缓存键相同; 未启用缓存时按同样的方式计算
+        return key or ResponseCache.make_key(self.routes_for()[0].model, SYSTEM_PROMPT, prompt_content)
+
+    def _coalesce(self, key, fn):
+        """
+        合并同时进行的相同请求: 首个调用执行 fn, 其余调用等待并得到相同的结果或异常
+        返回 (结果, 是否复用了其他调用的结果)
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            metrics.count('llm_coalesced')
+            logger.info("Identical LLM request already in flight, waiting for its result")
+            return future.result(), True
         try:
-            logger.info(f"第2/2步:Sending request to LLM {self.model}...")
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful research assistant."},
-                    {"role": "user", "content": prompt_content}
-                ],
-                timeout=self.timeout
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _cache_store(self, key, content, usage, model=None):
+        if key is not None:
+            self.cache.put(key, model or self.model, content, getattr(usage, 'prompt_tokens', None),
+                           getattr(usage, 'completion_tokens', None))
+
+    def summarize(self, prompt_content):
+        """
+        调用 LLM 进行总结, 遇到 429/5xx/超时按指数退避重试, 最终失败抛出 LLMError
+        """
+        key, hit = self._cache_lookup(prompt_content)
+        if hit is not None:
+            return hit['content']
+
+        def request(route):
+            logger.info(f"第2/2步:Sending request to LLM {route.model}...")
+            start = time.monotonic()
+            response = route.endpoint.client.chat.completions.create(
+                model=route.model,
+                messages=self._messages(prompt_content),
+                timeout=route.timeout
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"LLM request failed: {str(e)}")
-            return f"Error generating summary: {str(e)}"
+            self.hedging.observe(route.model, time.monotonic() - start)
+            content = response.choices[0].message.content
+            metrics.usage(response.usage)
+            self._cache_store(key, content, response.usage, route.model)
+            return content
+
+        def run():
+            with metrics.span('llm_total'):
+                return self._dispatch(request, prompt_content, hedge=True)
+
+        return self._coalesce(self._inflight_key(key, prompt_content), run)[0]
+
+    def stream_to_file(self, prompt_content, output_path, header=""):
+        """
+        流式调用 LLM: token 到达即写入 <output_path>.partial, 完成后原子重命名为 output_path
+        超时按相邻两次数据到达的间隔计算, 只要持续有输出就不会触发整体超时
+        返回 {'ttft': 首 token 延迟(秒), 'tokens': 输出 token 数, 'tokens_per_sec': 生成速度}
+        """
+        partial_path = f"{output_path}.partial"
+
+        def write(content):
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                f.write(header)
+                f.write(content)
+            os.replace(partial_path, output_path)
+
+        key, hit = self._cache_lookup(prompt_content)
+        if hit is not None:
+            write(hit['content'])
+            return {'ttft': 0.0, 'tokens': hit['completion_tokens'] or 0, 'tokens_per_sec': 0.0}
+
+        def request(route):
+            logger.info(f"第2/2步:Streaming from LLM {route.model}...")
+            start = time.monotonic()
+            ttft = None
+            chunks = 0
+            usage = None
+            parts = []
+            stream = self._open_stream(route, prompt_content)
+            try:
+                with open(partial_path, 'w', encoding='utf-8') as f:
+                    f.write(header)
+                    for chunk in stream:
+                        if getattr(chunk, 'usage', None):
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if ttft is None:
+                                ttft = time.monotonic() - start
+                            f.write(delta)
+                            f.flush()
+                            parts.append(delta)
+                            chunks += 1
+            except BaseException as e:
+                # 不留下写了一半的 .partial; 网络错误转为可重试的 StreamInterrupted
+                stream.close()
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                if isinstance(e, STREAM_ERRORS):
+                    raise StreamInterrupted(f"stream interrupted after {chunks} chunks: {e!r}") from e
+                raise
+            elapsed = time.monotonic() - start
+            if usage is not None:
+                metrics.usage(usage)
+            else:
+                metrics.count('completion_tokens', chunks)
+            self._cache_store(key, "".join(parts), usage, route.model)
+            # 服务端未返回 usage 时, 以内容分片数近似输出 token 数
+            tokens = (usage.completion_tokens if usage else None) or chunks
+            generation_time = elapsed - (ttft or 0)
+            return {
+                'ttft': ttft or elapsed,
+                'tokens': tokens,
+                'tokens_per_sec': tokens / generation_time if generation_time > 0 else 0.0,
+            }, "".join(parts)
+
+        def run():
+            # 流式输出已写入文件, 不做对冲, 只在失败时回退
+            with metrics.span('llm_total'):
+                stats, content = self._dispatch(request, prompt_content)
+            metrics.observe('llm_ttft', stats['ttft'])
+            os.replace(partial_path, output_path)
+            logger.info(f"Streamed {stats['tokens']} tokens, TTFT {stats['ttft']:.2f}s, {stats['tokens_per_sec']:.1f} tokens/s")
+            return stats, content
+
+        (stats, content), shared = self._coalesce(self._inflight_key(key, prompt_content), run)
+        if shared:
+            # 相同的 Prompt 由另一个调用流式生成, 这里直接写出完整内容
+            write(content)
+        return stats
+
+    def _open_stream(self, route, prompt_content):
+        """
+        发起流式请求, 要求服务端在最后一个分片中返回 usage (stream_options.include_usage)
+        不支持该参数的服务端 (返回 400) 记录在 Endpoint 上, 之后不再附带
+        """
+        endpoint = route.endpoint
+        kwargs = dict(model=route.model, messages=self._messages(prompt_content), stream=True,
+                      timeout=httpx.Timeout(route.timeout, connect=10, read=self.stream_read_timeout))
+        if endpoint.stream_usage:
+            try:
+                return endpoint.client.chat.completions.create(stream_options={"include_usage": True}, **kwargs)
+            except openai.BadRequestError as e:
+                if 'stream_options' not in str(e):
+                    raise
+                endpoint.stream_usage = False
+                logger.warning(f"{endpoint.base_url} does not support stream_options, "
+                               f"estimating streamed tokens from chunk count")
+        return endpoint.client.chat.completions.create(**kwargs)
+
+    def _dispatch(self, request, prompt_content, hedge=False):
+        """
+        按当前模式的候选列表依次尝试: 一个候选重试耗尽或遇到不可重试的错误时回退到下一个
+        hedge: 有下一个候选且已积累足够耗时样本时对冲
+        """
+        routes = self.routes_for()
+        index = 0
+        while True:
+            route = routes[index]
+            deadline = self.hedging.deadline(route.model) if hedge and index + 1 < len(routes) else None
+            try:
+                if deadline is not None:
+                    return self._hedged(request, prompt_content, route, routes[index + 1], deadline)
+                return self._call_with_retry(request, prompt_content, route)
+            except LLMError:
+                # 对冲时两个候选都已尝试
+                index += 2 if deadline is not None else 1
+                if index >= len(routes):
+                    raise
+                metrics.count('llm_fallbacks')
+                logger.warning(f"{route} failed, falling back to {routes[index]}")
+
+    def _hedged(self, request, prompt_content, primary, backup, deadline):
+        """
+        primary 超过 deadline 秒未返回时向 backup 发出相同请求, 取先成功的结果; 落后的请求在后台完成后丢弃
+        """
+        submit = lambda route: self._hedge_pool.submit(
+            contextvars.copy_context().run, self._call_with_retry, request, prompt_content, route)
+        first = submit(primary)
+        if wait([first], timeout=deadline).done:
+            if first.exception() is None:
+                return first.result()
+            metrics.count('llm_fallbacks')
+            logger.warning(f"{primary} failed, falling back to {backup}")
+            return self._call_with_retry(request, prompt_content, backup)
+
+        metrics.count('llm_hedged')
+        logger.info(f"No response from {primary} within {deadline:.1f}s, hedging to {backup}")
+        pending = {first, submit(backup)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        metrics.count('llm_hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _call_with_retry(self, request, prompt_content, route):
+        limiter = route.endpoint.limiter
+        tokens = self._estimate_tokens(prompt_content, limiter)
+        for attempt in range(route.max_retries + 1):
+            limiter.acquire(tokens)
+            try:
+                result = request(route)
+                limiter.record_success()
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, route)
+                if delay is None:
+                    logger.error(f"LLM request to {route} failed: {str(e)}")
+                    raise LLMError(str(e)) from e
+                logger.warning(f"LLM request failed ({str(e)}), retry {attempt+1}/{route.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    async def asummarize(self, prompt_content):
+        """
+        summarize 的异步版本, 供异步流水线使用
+        """
+        key, hit = await asyncio.to_thread(self._cache_lookup, prompt_content)
+        if hit is not None:
+            return hit['content']
+
+        async def run():
+            with metrics.span('llm_total'):
+                return await self._adispatch(key, prompt_content)
+
+        # 相同 Prompt 同时只请求一次; shield 使单个调用被取消时不影响其他等待者
+        inflight_key = self._inflight_key(key, prompt_content)
+        task = self._ainflight.get(inflight_key)
+        if task is None:
+            task = self._ainflight[inflight_key] = asyncio.ensure_future(run())
+            task.add_done_callback(lambda _: self._ainflight.pop(inflight_key, None))
+        else:
+            metrics.count('llm_coalesced')
+            logger.info("Identical LLM request already in flight, waiting for its result")
+        return await asyncio.shield(task)
+
+    async def _adispatch(self, key, prompt_content):
+        routes = self.routes_for()
+        index = 0
+        while True:
+            route = routes[index]
+            deadline = self.hedging.deadline(route.model) if index + 1 < len(routes) else None
+            try:
+                if deadline is not None:
+                    return await self._ahedged(key, prompt_content, route, routes[index + 1], deadline)
+                return await self._asummarize(key, prompt_content, route)
+            except LLMError:
+                index += 2 if deadline is not None else 1
+                if index >= len(routes):
+                    raise
+                metrics.count('llm_fallbacks')
+                logger.warning(f"{route} failed, falling back to {routes[index]}")
+
+    async def _ahedged(self, key, prompt_content, primary, backup, deadline):
+        """
+        _hedged 的异步版本, 落后的请求被取消
+        """
+        first = asyncio.ensure_future(self._asummarize(key, prompt_content, primary))
+        done, _ = await asyncio.wait({first}, timeout=deadline)
+        if done:
+            if first.exception() is None:
+                return first.result()
+            metrics.count('llm_fallbacks')
+            logger.warning(f"{primary} failed, falling back to {backup}")
+            return await self._asummarize(key, prompt_content, backup)
+
+        metrics.count('llm_hedged')
+        logger.info(f"No response from {primary} within {deadline:.1f}s, hedging to {backup}")
+        second = asyncio.ensure_future(self._asummarize(key, prompt_content, backup))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            metrics.count('llm_hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _asummarize(self, key, prompt_content, route):
+        limiter = route.endpoint.limiter
+        tokens = self._estimate_tokens(prompt_content, limiter)
+        for attempt in range(route.max_retries + 1):
+            await limiter.acquire_async(tokens)
+            try:
+                logger.info(f"第2/2步:Sending request to LLM {route.model}...")
+                start = time.monotonic()
+                response = await route.endpoint.async_client.chat.completions.create(
+                    model=route.model,
+                    messages=self._messages(prompt_content),
+                    timeout=route.timeout
+                )
+                self.hedging.observe(route.model, time.monotonic() - start)
+                limiter.record_success()
+                content = response.choices[0].message.content
+                metrics.usage(response.usage)
+                await asyncio.to_thread(self._cache_store, key, content, response.usage, route.model)
+                return content
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, route)
+                if delay is None:
+                    logger.error(f"LLM request to {route} failed: {str(e)}")
+                    raise LLMError(str(e)) from e
+                logger.warning(f"LLM request failed ({str(e)}), retry {attempt+1}/{route.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _retry_delay(self, error, attempt, route=None):
+        """
+        返回重试前的等待秒数; 不可重试或已达重试上限时返回 None
+        route: 发出请求的候选, 为空时按主 Endpoint 计
+        """
+        if attempt >= (route.max_retries if route else self.max_retries):
+            return None
+        retryable = isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                                       openai.InternalServerError, StreamInterrupted))
+        if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+            retryable = True
+        if not retryable:
+            return None
+
+        retry_after = self._retry_after(error)
+        if isinstance(error, openai.RateLimitError):
+            (route.endpoint if route else self.primary).limiter.penalize(retry_after if retry_after is not None else self.backoff_base)
+        if retry_after is not None:
+            return retry_after
+        # 指数退避 + 随机抖动, 避免多个线程同时重试
+        return random.uniform(0.5, 1.0) * min(self.backoff_max, self.backoff_base * 2 ** attempt)
+
+    @staticmethod
+    def _retry_after(error):
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None
+        headers = response.headers
+        if headers.get('retry-after-ms'):
+            try:
+                return float(headers['retry-after-ms']) / 1000
+            except ValueError:
+                pass
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            # HTTP 日期格式
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
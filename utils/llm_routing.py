@@ -0,0 +1,76 @@
+import math
+import threading
+from collections import deque
+
+
+class Endpoint:
+    """
+    一个 OpenAI 兼容的接口地址与 API Key: 持有共享连接池的同步/异步客户端与该 Key 的限流器
+    同一 (base_url, api_key) 的多个模型共用一个 Endpoint
+    """
+    def __init__(self, base_url, api_key, limiter, make_client, make_async_client):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.limiter = limiter
+        self.client = make_client(base_url, api_key)
+        self._make_async_client = make_async_client
+        self._async_client = None
+        # 流式请求是否附带 stream_options.include_usage; 服务端不支持时置为 False
+        self.stream_usage = True
+
+    @property
+    def async_client(self):
+        # 仅异步流水线需要, 按需创建
+        if self._async_client is None:
+            self._async_client = self._make_async_client(self.base_url, self.api_key)
+        return self._async_client
+
+
+class Route:
+    """
+    某个模式下的一个候选: 模型、所在 Endpoint、单次请求超时与重试次数
+    """
+    def __init__(self, model, endpoint, timeout, max_retries):
+        self.model = model
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def __repr__(self):
+        return f"{self.model}@{self.endpoint.base_url}"
+
+
+class HedgePolicy:
+    """
+    对冲请求: 按各模型最近 window 次请求耗时的分位数 (默认 p95) 得到截止时间,
+    首个请求超过截止时间仍未返回时, 向下一个候选发出相同请求, 取先完成的结果
+    样本不足 min_samples 时不对冲; 截止时间限制在 [min_deadline, max_deadline] 内
+    """
+    def __init__(self, conf):
+        conf = conf or {}
+        self.enabled = conf.get('enabled', False)
+        self.quantile = conf.get('quantile', 95)
+        self.min_samples = conf.get('min_samples', 20)
+        self.min_deadline = conf.get('min_deadline', 5)
+        self.max_deadline = conf.get('max_deadline', 300)
+        self.window = conf.get('window', 200)
+        self._lock = threading.Lock()
+        self._samples = {}  # model -> deque[秒]
+
+    def observe(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def deadline(self, model):
+        """
+        返回对冲截止时间 (秒); 未启用或样本不足时返回 None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            values = sorted(self._samples.get(model, ()))
+        if len(values) < self.min_samples:
+            return None
+        # 最近秩法
+        value = values[max(0, math.ceil(self.quantile / 100 * len(values)) - 1)]
+        return min(self.max_deadline, max(self.min_deadline, value))
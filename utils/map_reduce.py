@@ -0,0 +1,153 @@
+import os
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from .prompt_builder import PromptBuilder
+from .token_budget import PARAGRAPH_RE
+
+# 分块指令变更时提升版本号, 使旧的分块摘要缓存失效
+CHUNK_PROMPT_VERSION = 2
+# 未配置 context_window 时单次请求正文的字符上限 (与 PromptBuilder 的字符截断一致)
+CHAR_LIMIT = 30000
+# reduce Prompt 超出预算时最多合并压缩的轮数, 之后按比例截断
+MAX_COMBINE_ROUNDS = 3
+
+
+class MapReduceSummarizer:
+    """
+    超长论文的分块总结: 按章节切块并发总结 (map), 再合并为完整总结 (reduce)
+    分块摘要按 (模型, 指令版本, 分块内容) 的哈希缓存在磁盘上, 重跑或调整总结 Prompt 时只需重新执行 reduce
+    分块要点合计超出 reduce 请求的容量时, 先把相邻的要点合并压缩 (可多轮), 再执行 reduce
+    """
+    def __init__(self, config, llm_handler):
+        self.config = config
+        self.llm_handler = llm_handler
+        mr_conf = config.get('processing_rules', {}).get('map_reduce', {})
+        self.chunk_tokens = mr_conf.get('chunk_tokens', 8000)
+        self.max_in_flight = mr_conf.get('max_in_flight', 4)
+        self.budget = llm_handler.token_counter
+        self.cache_dir = os.path.join(config['paths']['temp_dir'], 'chunk_summaries')
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def enabled_for(config, mode):
+        mr_conf = config.get('processing_rules', {}).get('map_reduce', {})
+        return mr_conf.get('enabled', False) and mode in mr_conf.get('modes', ['deep_read'])
+
+    def needs_split(self, content, mode='deep_read'):
+        """
+        正文超出单次请求的容量时才走分块总结; 容量与 PromptBuilder.build_summary_prompt 的截断预算相同
+        """
+        budget = self.llm_handler.budget
+        if budget is None:
+            return len(content) > CHAR_LIMIT
+        return budget.count(content) > PromptBuilder.content_budget(budget)
+
+    def _measure(self, text):
+        # 与单次请求的截断方式一致: 配置了 context_window 时按 token, 否则按字符
+        return self.budget.count(text) if self.llm_handler.budget is not None else len(text)
+
+    def _reduce_available(self, mode):
+        budget = self.llm_handler.budget
+        if budget is None:
+            return CHAR_LIMIT
+        return budget.available(PromptBuilder.build_prompt("", PromptBuilder.get_reduce_instruction(mode), tag='section_notes'))
+
+    def split_chunks(self, content):
+        """
+        按章节边界把正文打包为不超过 chunk_tokens 的分块, 单个超长章节再按段落拆分
+        """
+        pieces = []
+        for section in self.budget.split_sections(content):
+            if self.budget.count(section) <= self.chunk_tokens:
+                pieces.append(section)
+            else:
+                pieces.extend(p + "\n\n" for p in PARAGRAPH_RE.split(section) if p.strip())
+
+        chunks, current, current_tokens = [], [], 0
+        for piece in pieces:
+            tokens = self.budget.count(piece)
+            if current and current_tokens + tokens > self.chunk_tokens:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+        if current:
+            chunks.append("".join(current))
+        return chunks
+
+    def build_reduce_prompt(self, content, mode='deep_read'):
+        """
+        执行 map 阶段 (分块并发总结), 返回 reduce 阶段的 Prompt
+        """
+        chunks = self.split_chunks(content)
+        logger.info(f"Map-reduce summarization: {len(chunks)} chunks, {self.max_in_flight} in flight")
+        # 分块请求与最终总结使用同一模式的路由, 缓存键取该路由的首选模型
+        model = self.llm_handler.routes_for(mode)[0].model
+        chunk_summaries = self._parallel(lambda index, chunk: self._summarize_chunk(chunk, index, len(chunks), model),
+                                         chunks)
+        chunk_summaries = self._fit_summaries(chunk_summaries, mode)
+        return PromptBuilder.build_reduce_prompt(chunk_summaries, mode)
+
+    def _parallel(self, fn, items):
+        """
+        并发执行 fn(序号, item), 按顺序返回结果
+        每个任务带上当前上下文 (处理模式), 路由与指标按模式归类
+        """
+        contexts = [contextvars.copy_context() for _ in items]
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            return list(pool.map(lambda item: contexts[item[0] - 1].run(fn, *item), enumerate(items, 1)))
+
+    def _fit_summaries(self, summaries, mode):
+        """
+        分块要点合计超出 reduce 请求的容量时, 把相邻要点按容量分组后合并压缩, 直到放得下
+        """
+        limit = self._reduce_available(mode)
+        for round_index in range(1, MAX_COMBINE_ROUNDS + 1):
+            if self._measure(PromptBuilder.format_sections(summaries)) <= limit:
+                return summaries
+            groups = self._group(summaries, limit)
+            logger.info(f"Reduce input exceeds {limit}: combining {len(summaries)} chunk summaries "
+                        f"into {len(groups)} (round {round_index})")
+            summaries = self._parallel(
+                lambda index, group: self.llm_handler.summarize(PromptBuilder.build_combine_prompt(group)), groups)
+        if self._measure(PromptBuilder.format_sections(summaries)) <= limit:
+            return summaries
+        # 多轮合并后仍放不下, 按比例截断每份要点
+        logger.warning(f"Reduce input still exceeds {limit} after {MAX_COMBINE_ROUNDS} rounds, truncating chunk summaries")
+        share = limit // len(summaries)
+        if self.llm_handler.budget is None:
+            return [summary[:share] for summary in summaries]
+        return [self.budget.fit(summary, share) for summary in summaries]
+
+    def _group(self, summaries, limit):
+        """
+        按顺序把相邻要点打包为合计不超过 limit 的分组; 单份超出 limit 的要点单独成组
+        """
+        groups, current = [], []
+        for summary in summaries:
+            if current and self._measure(PromptBuilder.format_sections(current + [summary])) > limit:
+                groups.append(current)
+                current = []
+            current.append(summary)
+        if current:
+            groups.append(current)
+        return groups
+
+    def _summarize_chunk(self, chunk, index, total, model):
+        key = hashlib.sha256(f"{model}\0{CHUNK_PROMPT_VERSION}\0{chunk}".encode('utf-8')).hexdigest()
+        cache_path = os.path.join(self.cache_dir, f"{key}.md")
+        if os.path.exists(cache_path):
+            logger.info(f"Using cached chunk summary {index}/{total}")
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return f.read()
+
+        summary = self.llm_handler.summarize(PromptBuilder.build_chunk_prompt(chunk, index, total))
+
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(summary)
+        os.replace(tmp_path, cache_path)
+        return summary
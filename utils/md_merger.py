@@ -1,21 +1,99 @@
 from loguru import logger
 import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+SUMMARY_RE = re.compile(r'^Summary_(skim|deep_read)_(.+)\.md$')
+CHUNK_SIZE = 1024 * 1024
+
+
+def discover_summaries(root_dir):
+    """
+    在 root_dir/ID/ 下 (含任意深度的子目录, 与 PDF 的发现范围一致) 查找已生成的总结文件 (包括此前运行生成、本次跳过的)
+    返回列表: [{'id', 'mode', 'title', 'path'}]
+    """
+    summaries = []
+    with os.scandir(root_dir) as id_dirs:
+        id_dirs = [entry for entry in id_dirs if entry.is_dir()]
+    for id_dir in id_dirs:
+        stack = [id_dir.path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    match = SUMMARY_RE.match(entry.name)
+                    if match and entry.is_file():
+                        summaries.append({'id': id_dir.name, 'mode': match.group(1), 'title': match.group(2),
+                                          'path': entry.path.replace('\\', '/')})
+    return summaries
+
+
+def describe_summary(md_file, paper_id=None):
+    """
+    由总结文件路径推出排序信息; 未提供 paper_id 时 ID 取所在文件夹名
+    """
+    name = os.path.basename(md_file)
+    match = SUMMARY_RE.match(name)
+    mode, title = match.groups() if match else ('', name)
+    return {'id': paper_id or os.path.basename(os.path.dirname(os.path.abspath(md_file))), 'mode': mode,
+            'title': title, 'path': md_file}
+
 
 def merge_markdown_files(md_file_paths, output_path):
     """
     合并多个 Markdown 文件为一个文件
-    md_file_paths: 列表，包含要合并的 Markdown 文件路径
+    md_file_paths: 列表，包含要合并的 Markdown 文件路径 (或 discover_summaries 的返回项)
     output_path: 输出合并后文件的路径
+    按 (ID, 模式, 标题) 排序, 分块流式拷贝, 不把全部内容读入内存;
+    正文先写入临时文件, 同时收集目录, 最后写出 目录+正文 并原子替换 output_path
     """
+    items = [item if isinstance(item, dict) else describe_summary(item) for item in md_file_paths]
+    items.sort(key=lambda item: (item['id'], item['mode'], item['title']))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    body_path = f"{output_path}.body.tmp"
+    partial_path = f"{output_path}.partial"
+    toc = []
     try:
-        with open(output_path, 'w', encoding='utf-8') as outfile:
-            for md_file in md_file_paths:
-                logger.info(f"Merging file: {md_file}")
-                with open(md_file, 'r', encoding='utf-8') as infile:
-                    content = infile.read()
-                    outfile.write(content)
-                    outfile.write("\n\n")  # 在每个文件内容后添加两个换行符作为分隔
-        logger.info(f"Successfully merged files into {output_path}")
+        with open(body_path, 'w', encoding='utf-8') as body:
+            for index, item in enumerate(items, 1):
+                logger.info(f"Merging file: {item['path']}")
+                anchor = f"summary-{index}"
+                toc.append(f"{index}. [{item['id']} · {item['mode']} · {item['title']}](#{anchor})\n")
+                body.write(f'<a id="{anchor}"></a>\n\n')
+                with open(item['path'], 'r', encoding='utf-8') as infile:
+                    shutil.copyfileobj(infile, body, CHUNK_SIZE)
+                body.write("\n\n")  # 在每个文件内容后添加两个换行符作为分隔
+
+        with open(partial_path, 'w', encoding='utf-8') as outfile:
+            outfile.write("# 目录\n\n")
+            outfile.writelines(toc)
+            outfile.write("\n\n")
+            with open(body_path, 'r', encoding='utf-8') as body:
+                shutil.copyfileobj(body, outfile, CHUNK_SIZE)
+        os.replace(partial_path, output_path)
+        logger.info(f"Successfully merged {len(items)} files into {output_path}")
     except Exception as e:
         logger.error(f"Error merging markdown files: {str(e)}")
         raise e
+    finally:
+        for path in (body_path, partial_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def merge_per_id(md_file_paths, output_dir, suffix, max_workers=4):
+    """
+    按 ID 分组, 并行为每个 ID 写出单独的合并文件 Merged_<ID>_<suffix>.md
+    """
+    groups = {}
+    for item in md_file_paths:
+        item = item if isinstance(item, dict) else describe_summary(item)
+        groups.setdefault(item['id'], []).append(item)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(lambda kv: merge_markdown_files(kv[1], os.path.join(output_dir, f"Merged_{kv[0]}_{suffix}.md")),
+                      groups.items()))
@@ -0,0 +1,173 @@
+import re
+import html
+from collections import Counter
+from loguru import logger
+from .metrics import metrics
+
+# 章节编号: "7 ", "7. ", "7.1 ", "VII. "
+NUMBERING = r'(?:(?:\d+(?:\.\d+)*|[IVXLC]+)\.?\s+)?'
+# 节名须占满整行, 避免 "## 2 Reference frames and units" 之类的正文标题被误判
+REFERENCE_NAMES = r'references?|bibliography|works\s+cited|literature\s+cited|参考文献'
+SUPPLEMENT_NAMES = r'supplementary\s+(?:materials?|information)'
+# 附录标题可带编号与标题: "Appendix A. Proof of ...", "Appendix: Derivations"
+APPENDIX_NAMES = rf'(?:appendix(?:\s+(?:[a-z]|\d+))?|appendices|附录)(?:\s*[.:：—-]\s*\S.*)?|{SUPPLEMENT_NAMES}'
+# 标题形式: "## References", "# 7 References", "## Appendix A. Proof of ..."
+HEADING_TAIL_RE = re.compile(
+    rf'^#{{1,6}}\s*{NUMBERING}(?P<name>{REFERENCE_NAMES}|{APPENDIX_NAMES})\s*:?\s*$', re.IGNORECASE)
+# 独占一行的形式: "**References**", "REFERENCES", "Bibliography:"
+# 单数的 "Reference" 单独成行多为图表中的标签, 不视为节名
+PLAIN_TAIL_RE = re.compile(
+    rf'^(?:\*\*)?\s*{NUMBERING}(?P<name>references|bibliography|works\s+cited|literature\s+cited|参考文献'
+    rf'|appendix|appendices|附录|{SUPPLEMENT_NAMES})\s*:?\s*(?:\*\*)?\s*$', re.IGNORECASE)
+HEADING_LEVEL_RE = re.compile(r'^(#{1,6})\s')
+APPENDIX_NAME_RE = re.compile(r'append|supplement|附录', re.IGNORECASE)
+
+IMAGE_RE = re.compile(r'!\[[^\]]*\]\([^)]*\)|<img\b[^>]*>', re.IGNORECASE)
+TABLE_END_RE = re.compile(r'</table\s*>', re.IGNORECASE)
+ROW_RE = re.compile(r'<tr\b[^>]*>(.*?)</tr\s*>', re.IGNORECASE | re.DOTALL)
+CELL_RE = re.compile(r'<t[dh]\b[^>]*>(.*?)</t[dh]\s*>', re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r'<[^>]+>')
+SPACE_RE = re.compile(r'\s+')
+
+# 页眉页脚候选行的长度范围; 过短的行 (如 "$$"、编号) 重复出现是正常的
+REPEATED_MIN_LEN = 8
+REPEATED_MAX_LEN = 120
+TABLE_PLACEHOLDER = "[table omitted]"
+
+
+class MarkdownPreprocessor:
+    """
+    MinerU 输出的 markdown 预处理: 在一次逐行扫描中完成各项清理, 并统计每条规则节省的字符数 (或 token 数)
+    references / appendix: 从参考文献 / 附录标题处删除该节, 直到下一个同级或更高级的标题
+    images: 删除图片链接
+    repeated_lines: 同一短行出现次数达到该值时视为页眉页脚, 只保留第一次出现; 0 表示关闭
+    tables: keep (保留) / compact (HTML 表格转为竖线分隔的紧凑行) / drop (替换为占位符)
+    """
+    def __init__(self, references=True, appendix=False, images=False, repeated_lines=0, tables='keep',
+                 token_counter=None):
+        if tables not in ('keep', 'compact', 'drop'):
+            raise ValueError(f"Unknown table mode: {tables}")
+        self.references = references
+        self.appendix = appendix
+        self.images = images
+        self.repeated_lines = repeated_lines
+        self.tables = tables
+        # 提供时按 token 数统计节省量, 否则按字符数
+        self.token_counter = token_counter
+
+    @classmethod
+    def from_config(cls, rules, token_counter=None):
+        """
+        按 processing_rules 配置创建; 参考文献仍由 remove_references 控制
+        """
+        conf = rules.get('preprocess', {})
+        return cls(
+            references=rules.get('remove_references', True),
+            appendix=conf.get('appendix', False),
+            images=conf.get('images', False),
+            repeated_lines=conf.get('repeated_lines', 0),
+            tables=conf.get('tables', 'keep'),
+            token_counter=token_counter if conf.get('report', 'chars') == 'tokens' else None,
+        )
+
+    def run(self, text, label=""):
+        """
+        返回清理后的文本, 并记录各规则的节省量
+        """
+        with metrics.span('preprocess'):
+            cleaned, removed = self.process(text)
+            saved = self._measure(removed)
+        if saved:
+            unit = 'tokens' if self.token_counter is not None else 'chars'
+            metrics.count(f"preprocess_saved_{unit}", sum(saved.values()))
+            details = ", ".join(f"{rule}={amount}" for rule, amount in saved.items())
+            logger.info(f"{label}Preprocess saved {sum(saved.values())} {unit} ({details})")
+        return cleaned
+
+    def process(self, text):
+        """
+        返回 (清理后的文本, {规则名: [被删除的文本片段]})
+        """
+        lines = text.split('\n')
+        removed = {}
+
+        def drop(rule, piece):
+            removed.setdefault(rule, []).append(piece)
+
+        repeated = set()
+        if self.repeated_lines:
+            counts = Counter(line.strip() for line in lines
+                             if REPEATED_MIN_LEN <= len(line.strip()) <= REPEATED_MAX_LEN)
+            repeated = {line for line, count in counts.items() if count >= self.repeated_lines}
+        seen = set()
+
+        kept = []
+        dropping = None  # 当前正在删除的节 ('references' / 'appendix')
+        dropping_level = 0  # 该节标题的级别; 独占一行的形式记为 7, 遇到任何标题即结束
+        table = None  # 跨行 HTML 表格的累积行
+        for line in lines:
+            if table is not None:
+                table.append(line)
+                if TABLE_END_RE.search(line):
+                    kept.append(self._table('\n'.join(table), drop))
+                    table = None
+                continue
+
+            stripped = line.strip()
+            if stripped.startswith('#') or len(stripped) <= 40:
+                match = HEADING_TAIL_RE.match(stripped) or PLAIN_TAIL_RE.match(stripped)
+                level = HEADING_LEVEL_RE.match(stripped)
+                if match:
+                    rule = 'appendix' if APPENDIX_NAME_RE.match(match.group('name')) else 'references'
+                    dropping = rule if getattr(self, rule) else None
+                    dropping_level = len(level.group(1)) if level else 7
+                elif dropping and level and len(level.group(1)) <= dropping_level:
+                    dropping = None
+            if dropping:
+                drop(dropping, line)
+                continue
+
+            if stripped in repeated:
+                if stripped in seen:
+                    drop('repeated_lines', line)
+                    continue
+                seen.add(stripped)
+
+            if self.images and ('![' in line or '<img' in line.lower()):
+                new_line = IMAGE_RE.sub('', line)
+                drop('images', line if not new_line.strip() else ''.join(IMAGE_RE.findall(line)))
+                if not new_line.strip():
+                    continue
+                line = new_line
+
+            if self.tables != 'keep' and '<table' in line.lower():
+                if not TABLE_END_RE.search(line):
+                    table = [line]
+                    continue
+                line = self._table(line, drop)
+            kept.append(line)
+
+        if table is not None:
+            # 表格未闭合, 原样保留
+            kept.extend(table)
+        return '\n'.join(kept), removed
+
+    def _table(self, table_html, drop):
+        if self.tables == 'drop':
+            drop('tables', table_html)
+            return TABLE_PLACEHOLDER
+        rows = []
+        for row in ROW_RE.findall(table_html):
+            cells = [SPACE_RE.sub(' ', html.unescape(TAG_RE.sub('', cell))).strip() for cell in CELL_RE.findall(row)]
+            rows.append('| ' + ' | '.join(cells) + ' |')
+        compact = '\n'.join(rows) if rows else SPACE_RE.sub(' ', html.unescape(TAG_RE.sub(' ', table_html))).strip()
+        if len(compact) < len(table_html):
+            # 记录被压缩掉的长度, 统计时只计差值
+            drop('tables', table_html[:len(table_html) - len(compact)])
+            return compact
+        return table_html
+
+    def _measure(self, removed):
+        if self.token_counter is not None:
+            return {rule: self.token_counter.count('\n'.join(pieces)) for rule, pieces in removed.items()}
+        return {rule: sum(len(piece) for piece in pieces) for rule, pieces in removed.items()}
@@ -0,0 +1,154 @@
+import os
+import csv
+import math
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from loguru import logger
+
+# 当前论文的处理模式, 各阶段的计时与用量按模式分组; 线程池任务需用 contextvars.copy_context 传递
+current_mode = contextvars.ContextVar('current_mode', default=None)
+
+
+class Metrics:
+    """
+    运行指标: 记录各阶段耗时 (span)、token 用量与缓存命中等计数, 运行结束时输出报告
+    耗时与计数均按 (名称, 模式) 分组, 模式取自 current_mode
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._samples = {}  # (name, mode) -> [秒]
+            self._counters = {}  # (name, mode) -> 数值
+
+    @contextmanager
+    def span(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start)
+
+    def observe(self, name, seconds):
+        key = (name, current_mode.get())
+        with self._lock:
+            self._samples.setdefault(key, []).append(seconds)
+
+    def count(self, name, value=1):
+        if not value:
+            return
+        key = (name, current_mode.get())
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def usage(self, usage):
+        """
+        记录 response.usage 中的 token 用量, 含服务端前缀缓存命中的输入 token (prompt_tokens_details.cached_tokens)
+        """
+        if usage is None:
+            return
+        self.count('prompt_tokens', getattr(usage, 'prompt_tokens', 0) or 0)
+        self.count('completion_tokens', getattr(usage, 'completion_tokens', 0) or 0)
+        # Batch API 的 usage 由 JSON 构造, details 为 dict
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = details.get('cached_tokens') if isinstance(details, dict) else getattr(details, 'cached_tokens', None)
+        self.count('cached_tokens', cached or 0)
+
+    def summary(self, pricing=None):
+        """
+        汇总: 各阶段 p50/p95 延迟、计数、按模式的吞吐量与估算成本
+        pricing: {'prompt': 每百万输入 token 价格, 'completion': 每百万输出 token 价格,
+                  'cached_prompt': 每百万缓存命中输入 token 价格 (缺省同 prompt)}
+        """
+        pricing = pricing or {}
+        with self._lock:
+            samples = {key: sorted(values) for key, values in self._samples.items()}
+            counters = dict(self._counters)
+        wall = time.time() - self.started
+
+        spans = []
+        for (name, mode), values in sorted(samples.items(), key=lambda kv: (kv[0][0], kv[0][1] or '')):
+            spans.append({
+                'span': name, 'mode': mode or '', 'count': len(values),
+                'total': round(sum(values), 3), 'p50': round(self._percentile(values, 50), 3),
+                'p95': round(self._percentile(values, 95), 3), 'max': round(values[-1], 3),
+            })
+
+        modes = {}
+        for (name, mode), value in counters.items():
+            modes.setdefault(mode or '', {})[name] = value
+        for mode, values in modes.items():
+            papers = values.get('papers', 0)
+            values['papers_per_hour'] = round(papers / wall * 3600, 2) if wall > 0 else 0.0
+            prompt_tokens, cached_tokens = values.get('prompt_tokens', 0), values.get('cached_tokens', 0)
+            values['prefix_cache_hit_rate'] = round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0
+            cost = ((prompt_tokens - cached_tokens) * pricing.get('prompt', 0)
+                    + cached_tokens * pricing.get('cached_prompt', pricing.get('prompt', 0))
+                    + values.get('completion_tokens', 0) * pricing.get('completion', 0)) / 1_000_000
+            values['estimated_cost'] = round(cost, 4)
+            values['cost_per_paper'] = round(cost / papers, 4) if papers else 0.0
+
+        return {
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'wall_seconds': round(wall, 3),
+            'spans': spans,
+            'modes': modes,
+        }
+
+    def write_report(self, report_dir, pricing=None):
+        """
+        写出 run_<时间>.json 与 run_<时间>_spans.csv, 返回 JSON 路径
+        """
+        report = self.summary(pricing)
+        os.makedirs(report_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(self.started))
+        json_path = os.path.join(report_dir, f"run_{stamp}.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(report_dir, f"run_{stamp}_spans.csv"), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['span', 'mode', 'count', 'total', 'p50', 'p95', 'max'])
+            writer.writeheader()
+            writer.writerows(report['spans'])
+        logger.info(f"Run report written to {json_path}")
+        return json_path
+
+    def write_prometheus(self, path, pricing=None):
+        """
+        以 Prometheus 文本格式写出 (供 node_exporter textfile collector 采集)
+        """
+        report = self.summary(pricing)
+        lines = [
+            "# TYPE paperworkflow_span_seconds summary",
+        ]
+        for span in report['spans']:
+            labels = f'span="{span["span"]}",mode="{span["mode"]}"'
+            lines.append(f'paperworkflow_span_seconds{{{labels},quantile="0.5"}} {span["p50"]}')
+            lines.append(f'paperworkflow_span_seconds{{{labels},quantile="0.95"}} {span["p95"]}')
+            lines.append(f'paperworkflow_span_seconds_sum{{{labels}}} {span["total"]}')
+            lines.append(f'paperworkflow_span_seconds_count{{{labels}}} {span["count"]}')
+        lines.append("# TYPE paperworkflow_total gauge")
+        for mode, values in report['modes'].items():
+            for name, value in values.items():
+                lines.append(f'paperworkflow_total{{name="{name}",mode="{mode}"}} {value}')
+        lines.append(f"paperworkflow_run_wall_seconds {report['wall_seconds']}")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _percentile(values, q):
+        # 最近秩法, values 已排序
+        return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+# 进程内共享的指标实例
+metrics = Metrics()
@@ -1,37 +1,86 @@
 import os
 import time
-import json
+import asyncio
+import shutil
+import hashlib
+import zipfile
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait
 from loguru import logger
+from .poll_schedule import PollSchedule, StateTimer
+from .rate_limiter import RateLimiter
+from .metrics import metrics
+
+DOWNLOAD_CHUNK = 1024 * 1024
 
 class ApiPDFProcessor:
+    model_version = "vlm"
+
     def __init__(self, config):
         self.config = config
+        api_config = config['api']['mineru']
+        # 由上传接口推导 API 根地址, 例如 https://mineru.net/api/v4
+        self.api_base = api_config['api_url'].rsplit('/file-urls', 1)[0]
 
-    def process(self, pdf_path, output_dir):
+        # 共享会话: 上传、提交与轮询复用连接; 下载结果不走代理, 单独一个会话
+        pool_size = max(api_config.get('upload_workers', 4), config.get('concurrency', {}).get('max_workers', 10))
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
+        self.download_session = requests.Session()
+        self.download_session.trust_env = False
+        # 下载在独立的有界线程池中进行, 不阻塞轮询
+        self.download_pool = ThreadPoolExecutor(max_workers=api_config.get('download_workers', 4),
+                                                thread_name_prefix="mineru-download")
+        self.download_retries = api_config.get('download_retries', 3)
+        self.extract_all = api_config.get('extract_assets', False)
+        # 各任务在 MinerU 各状态的停留时长
+        self.timer = StateTimer()
+        # 提交与轮询请求的限流 (分布式模式下替换为各 worker 共享的限流器)
+        self.limiter = RateLimiter(api_config.get('requests_per_minute', 0))
+
+    def _headers(self):
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.config['api']['mineru']['api_key']}"
+        }
+
+    def process(self, pdf_path, output_dir, batch_id=None, on_submitted=None):
         """
         使用 MinerU API 转换
         pdf_path: PDF文件绝对路径
         output_dir: 输出的根目录
+        batch_id: 已提交过的批次 (断点续跑时重新接管, 不再重复提交)
+        on_submitted(batch_id): 提交成功后回调, 用于记录到运行清单
         """
-        file_name = os.path.basename(pdf_path).replace('.pdf', '')
+        file_name = os.path.splitext(os.path.basename(pdf_path))[0]
         abs_output_dir = os.path.abspath(output_dir).replace('\\', '/')
         
         # 为了与 Local 模式行为一致，API 模式也将结果放入 file_name 子目录
         target_dir = os.path.join(abs_output_dir, file_name)
         os.makedirs(target_dir, exist_ok=True)
         
+        header = self._headers()
+        if batch_id:
+            logger.info(f"Re-attaching to in-flight batch {batch_id} for {file_name}")
+        else:
+            with metrics.span('upload'):
+                batch_id = self._submit_single(pdf_path, file_name, header)
+            if on_submitted:
+                on_submitted(batch_id)
+
+        # 4. 轮询并下载结果
+        self._poll_result(batch_id, file_name, target_dir, header, pdf_path)
+
+    def _submit_single(self, pdf_path, file_name, header):
+        """
+        申请上传链接、上传单个 PDF 并提交解析任务, 返回 batch_id
+        """
         api_config = self.config['api']['mineru']
-        api_key = api_config['api_key']
         extract_url = api_config['api_url']
         
-        # 假设 base url
-        upload_url_endpoint = "https://mineru.net/api/v4/file-urls/batch"
-
-        header = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
+        upload_url_endpoint = f"{self.api_base}/file-urls/batch"
 
         # 1. 获取上传 URL
         data_id = file_name 
@@ -39,11 +88,12 @@ class ApiPDFProcessor:
             "files": [
                 {"name": f"{file_name}.pdf", "data_id": data_id}
             ],
-            "model_version": "vlm"
+            "model_version": self.model_version
         }
         
         logger.info(f"第1/2步:Requesting upload URL for {file_name}...")
-        response = requests.post(upload_url_endpoint, headers=header, json=data)
+        self.limiter.acquire()
+        response = self.session.post(upload_url_endpoint, headers=header, json=data)
         
         if response.status_code != 200:
             logger.error(f"Failed to get upload URL: {response.text}")
@@ -64,7 +114,7 @@ class ApiPDFProcessor:
 
         # 2. 上传文件
         with open(pdf_path, 'rb') as f:
-            res_upload = requests.put(upload_url, data=f)
+            res_upload = self.session.put(upload_url, data=f)
             if res_upload.status_code != 200:
                 raise Exception(f"Upload failed: {res_upload.text}")
         
@@ -73,14 +123,15 @@ class ApiPDFProcessor:
         # 3. 提交提取任务
         extract_data = {
             "batch_id": batch_id,
-            "model_version": "vlm",
+            "model_version": self.model_version,
             "files": [
                 {"name": f"{file_name}.pdf", "data_id": data_id}
             ]
         }
         
         logger.info(f"Submitting extraction task for batch {batch_id}...")
-        extract_res = requests.post(extract_url, headers=header, json=extract_data)
+        self.limiter.acquire()
+        extract_res = self.session.post(extract_url, headers=header, json=extract_data)
         if extract_res.status_code != 200:
             raise Exception(f"Extraction task submission failed: {extract_res.text}")
         
@@ -89,91 +140,411 @@ class ApiPDFProcessor:
              raise Exception(f"Extraction task error: {extract_result.get('msg')}")
         
         logger.debug(f"Extraction Submission Result: {extract_result}")
+        return batch_id
 
-        # 4. 轮询并下载结果
-        self._poll_result(batch_id, file_name, target_dir, header)
+    def process_batch(self, jobs, on_done=None, on_error=None, attached=None, on_submitted=None):
+        """
+        批量转换: 多个 PDF 共用一个 batch_id, 由单个轮询器统一获取结果
+        jobs: [(pdf_path, output_dir), ...], output_dir 为该 PDF 的输出根目录
+        on_done(pdf_path): 单篇转换完成后立即回调
+        on_error(pdf_path, message): 单篇转换失败时回调
+        attached: {pdf_path: batch_id}, 已提交过的 PDF 直接接管原批次, 不再重复提交
+        on_submitted(pdf_path, batch_id): 每篇提交成功后回调
+        """
+        api_config = self.config['api']['mineru']
+        batch_size = api_config.get('batch_size', 50)
+        header = self._headers()
+        attached = attached or {}
 
-    def _poll_result(self, batch_id, file_name, output_path, header):
-        max_retries = 60 
-        polling_url = f"https://mineru.net/api/v4/extract-results/batch/{batch_id}"
-        
-        # 获取轮询间隔，默认 6 秒
-        interval = self.config['api']['mineru'].get('polling_interval', 6)
-        
-        succeeded = False
-        
-        for attempt in range(max_retries):
-            time.sleep(interval)
-            logger.info(f"{interval}s 尝试提取batch {batch_id}中md，第 {attempt+1}/{max_retries} 次...")
-            
+        # batch_id -> {data_id: (pdf_path, file_name, target_dir)}
+        pending = {}
+        for pdf_path, output_dir in jobs:
+            if pdf_path in attached:
+                data_id, entry = self._batch_entry(pdf_path, output_dir)
+                pending.setdefault(attached[pdf_path], {})[data_id] = entry
+        if pending:
+            logger.info(f"Re-attaching {sum(len(e) for e in pending.values())} PDFs to {len(pending)} in-flight batches")
+        jobs = [job for job in jobs if job[0] not in attached]
+
+        for start in range(0, len(jobs), batch_size):
+            chunk = jobs[start:start + batch_size]
             try:
-                poll_res = requests.get(polling_url, headers=header)
-                if poll_res.status_code != 200:
-                     logger.warning(f"Polling failed with status {poll_res.status_code}")
-                     continue
-                
-                poll_data = poll_res.json()
-                if poll_data.get("code") != 0:
-                    logger.warning(f"Polling returned error code: {poll_data.get('msg')}")
+                with metrics.span('upload'):
+                    batch_id, entries = self._submit_batch(chunk, header)
+            except Exception as e:
+                logger.error(f"Batch submission failed: {e}")
+                for pdf_path, _ in chunk:
+                    if on_error:
+                        on_error(pdf_path, str(e))
+                continue
+            pending[batch_id] = entries
+            if on_submitted:
+                for pdf_path, _, _ in entries.values():
+                    on_submitted(pdf_path, batch_id)
+
+        self._poll_batches(pending, header, on_done, on_error)
+
+    def _submit_batch(self, jobs, header):
+        """
+        为一组 PDF 申请上传链接并并行上传, 返回 (batch_id, entries)
+        """
+        api_config = self.config['api']['mineru']
+        entries = {}
+        files = []
+        for pdf_path, output_dir in jobs:
+            data_id, entry = self._batch_entry(pdf_path, output_dir)
+            entries[data_id] = entry
+            files.append({"name": f"{entry[1]}.pdf", "data_id": data_id})
+
+        logger.info(f"第1/2步:Requesting {len(files)} upload URLs in one batch...")
+        self.limiter.acquire()
+        response = self.session.post(f"{self.api_base}/file-urls/batch", headers=header,
+                                 json={"files": files, "model_version": self.model_version})
+        if response.status_code != 200:
+            raise Exception(f"API Request Failed: {response.status_code} {response.text}")
+        result = response.json()
+        if result.get("code") != 0:
+            raise Exception(f"Get Upload URL Failed: {result.get('msg')}")
+
+        batch_id = result["data"]["batch_id"]
+        file_urls = result["data"]["file_urls"]
+        if len(file_urls) != len(files):
+            raise Exception(f"Expected {len(files)} upload URLs, got {len(file_urls)}")
+        logger.info(f"Got batch_id: {batch_id}. Uploading {len(files)} files...")
+
+        def upload(item):
+            url, (pdf_path, _, _) = item
+            with open(pdf_path, 'rb') as f:
+                res_upload = self.session.put(url, data=f)
+            if res_upload.status_code != 200:
+                raise Exception(f"Upload failed for {pdf_path}: {res_upload.text}")
+
+        # 上传完成后 MinerU 会自动为该批次提交解析任务
+        upload_workers = api_config.get('upload_workers', 4)
+        with ThreadPoolExecutor(max_workers=upload_workers) as pool:
+            list(pool.map(upload, zip(file_urls, entries.values())))
+
+        logger.info(f"批次 {batch_id} 上传成功, 共 {len(files)} 个文件.")
+        return batch_id, entries
+
+    @staticmethod
+    def _batch_entry(pdf_path, output_dir):
+        """
+        返回 (data_id, (pdf_path, file_name, target_dir))
+        """
+        file_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        abs_output_dir = os.path.abspath(output_dir).replace('\\', '/')
+        # data_id 只允许字母数字等字符, 且在批次内需唯一, 这里用路径哈希
+        data_id = hashlib.sha1(pdf_path.encode('utf-8')).hexdigest()[:16]
+        target_dir = os.path.join(abs_output_dir, file_name)
+        os.makedirs(target_dir, exist_ok=True)
+        return data_id, (pdf_path, file_name, target_dir)
+
+    def _poll_batches(self, pending, header, on_done, on_error):
+        """
+        单个轮询器: 每个批次按各自的自适应节奏查询 (见 PollSchedule), state 为 done 的条目立即下载并回调
+        """
+        mineru_conf = self.config['api']['mineru']
+        schedules = {batch_id: PollSchedule(mineru_conf, [entry[0] for entry in entries.values()])
+                     for batch_id, entries in pending.items()}
+        for entries in pending.values():
+            for data_id in entries:
+                self.timer.start(data_id)
+
+        downloads = []
+        while pending:
+            # 先查询最早到期的批次
+            batch_id = min(pending, key=lambda b: schedules[b].next_poll)
+            schedule = schedules[batch_id]
+            entries = pending[batch_id]
+            time.sleep(schedule.wait_time())
+            logger.info(f"轮询批次 {batch_id}, 剩余 {len(entries)} 篇...")
+
+            poll_data = self._fetch_batch(batch_id, header)
+            progress = None
+            for res in (poll_data or {}).get("extract_result", []):
+                data_id = res.get("data_id")
+                if data_id not in entries:
                     continue
+                pdf_path, file_name, target_dir = entries[data_id]
+                state = res.get("state")
+                self.timer.observe(data_id, state)
+                if state == "done":
+                    del entries[data_id]
+                    self.timer.finish(data_id, file_name)
+                    downloads.append(self.download_pool.submit(
+                        self._download_and_notify, res, pdf_path, file_name, target_dir, on_done, on_error))
+                elif state == "failed":
+                    del entries[data_id]
+                    self.timer.finish(data_id, file_name)
+                    logger.error(f"MinerU failed on {file_name}: {res.get('err_msg')}")
+                    if on_error:
+                        on_error(pdf_path, res.get('err_msg') or "MinerU task failed")
+                elif res.get("extract_progress"):
+                    progress = res["extract_progress"]
 
-                if attempt == 0:
-                     with open(os.path.join(output_path, f"{file_name}_poll_debug.json"), 'w', encoding='utf-8') as f:
-                         json.dump(poll_data, f, ensure_ascii=False, indent=4)
-
-                data = poll_data.get("data", {})
-                extract_results = data.get("extract_result", [])
-                
-                if extract_results:
-                    target_result = None
-                    for res in extract_results:
-                        if file_name in res.get("file_name", "") or len(extract_results) == 1:
-                            target_result = res
-                            break
-                    
-                    if target_result:
-                        state = target_result.get("state")
-                        if state == "done":
-                            full_zip_url = target_result.get("full_zip_url")
-                            markdown_url = target_result.get("markdown_url")
-                            
-                            dl_url = markdown_url if markdown_url else full_zip_url
-                            
-                            if dl_url:
-                                logger.info(f"提取成功!正在下载 {dl_url[:30]}...")
-                                dl_res = requests.get(dl_url,proxies={'http': None, 'https': None})
-                                
-                                if dl_url.endswith(".zip") or "zip" in dl_url:
-                                     zip_path = os.path.join(output_path, f"{file_name}_result.zip")
-                                     with open(zip_path, 'wb') as f:
-                                         f.write(dl_res.content)
-                                     
-                                     logger.info(f"已保存zip结果到 {zip_path}。正在解压...")
-                                     import zipfile
-                                     try:
-                                         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                                             zip_ref.extractall(output_path)
-                                         succeeded = True
-                                     except Exception as e:
-                                         logger.error(f"Failed to unzip: {e}")
-                                else:
-                                     md_file_path = os.path.join(output_path, f"{file_name}.md")
-                                     with open(md_file_path, 'wb') as f:
-                                         f.write(dl_res.content)
-                                     succeeded = True
-                                break
-                        else:
-                            logger.info(f"Task state: {state}")
-                else:
-                     logger.info("Waiting for extract_result...")
+            if not entries:
+                del pending[batch_id]
+            elif schedule.expired():
+                for data_id, (pdf_path, file_name, _) in entries.items():
+                    self.timer.finish(data_id, file_name)
+                    logger.warning(f"Polling timed out for {file_name}.")
+                    if on_error:
+                        on_error(pdf_path, "Polling timed out")
+                del pending[batch_id]
+            else:
+                schedule.advance(progress)
+
+        wait(downloads)
+
+    def _download_and_notify(self, res, pdf_path, file_name, target_dir, on_done, on_error):
+        try:
+            if not self._download_result(res, file_name, target_dir):
+                raise Exception("No result url returned")
+        except Exception as e:
+            logger.error(f"Failed to download result for {file_name}: {e}")
+            if on_error:
+                on_error(pdf_path, str(e))
+            return
+        if on_done:
+            on_done(pdf_path)
+
+    def _fetch_batch(self, batch_id, header):
+        """
+        查询批次结果, 返回 data 字段; 请求失败时返回 None (下次轮询重试)
+        """
+        try:
+            self.limiter.acquire()
+            poll_res = self.session.get(f"{self.api_base}/extract-results/batch/{batch_id}", headers=header)
+            if poll_res.status_code != 200:
+                logger.warning(f"Polling failed with status {poll_res.status_code}")
+                return None
+            poll_data = poll_res.json()
+            if poll_data.get("code") != 0:
+                logger.warning(f"Polling returned error code: {poll_data.get('msg')}")
+                return None
+        except Exception as e:
+            logger.warning(f"Polling exception: {e}")
+            return None
+        return poll_data.get("data", {})
+
+    def _download_result(self, target_result, file_name, output_path):
+        """
+        下载单个 extract_result 条目的结果到 output_path, 成功返回 True
+        zip 结果只解出 markdown, 图片与版面 JSON 留在 zip 中, 需要时调用 extract_assets
+        """
+        full_zip_url = target_result.get("full_zip_url")
+        markdown_url = target_result.get("markdown_url")
+
+        dl_url = markdown_url if markdown_url else full_zip_url
+        if not dl_url:
+            return False
+
+        logger.info(f"提取成功!正在下载 {dl_url[:30]}...")
+        with metrics.span('download'):
+            if dl_url.endswith(".zip") or "zip" in dl_url:
+                zip_path = os.path.join(output_path, f"{file_name}_result.zip")
+                self._fetch(dl_url, zip_path)
+                if not self._extract_markdown(zip_path, file_name, output_path):
+                    return False
+                if self.extract_all:
+                    self.extract_assets(output_path, file_name)
+            else:
+                self._fetch(dl_url, os.path.join(output_path, f"{file_name}.md"))
+        return True
+
+    def _fetch(self, url, path):
+        """
+        分块流式下载到 <path>.part, 完成后重命名为 path
+        连接中断时按 HTTP Range 从已下载的位置继续, 最多重试 download_retries 次
+        """
+        part_path = f"{path}.part"
+        for attempt in range(self.download_retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self.download_session.get(url, headers=headers, stream=True, timeout=(10, 60)) as res:
+                    if res.status_code == 416:
+                        # 已下载完整
+                        break
+                    res.raise_for_status()
+                    # 服务端不支持 Range 时返回 200, 从头写入
+                    with open(part_path, 'ab' if res.status_code == 206 else 'wb') as f:
+                        for chunk in res.iter_content(DOWNLOAD_CHUNK):
+                            f.write(chunk)
+                break
+            except requests.RequestException as e:
+                if attempt >= self.download_retries:
+                    raise
+                delay = min(30, 2 ** attempt)
+                logger.warning(f"Download interrupted ({e}), resuming in {delay}s...")
+                time.sleep(delay)
+        os.replace(part_path, path)
+
+    @staticmethod
+    def _extract_markdown(zip_path, file_name, output_path):
+        """
+        只从 zip 中解出 markdown, 保存为 output_path/<file_name>.md
+        """
+        try:
+            with zipfile.ZipFile(zip_path) as zip_ref:
+                names = [name for name in zip_ref.namelist() if name.lower().endswith('.md')]
+                if not names:
+                    logger.error(f"No markdown found in {zip_path}")
+                    return False
+                # 优先同名 md, 其次 MinerU 的 full.md, 否则取层级最浅的 md
+                name = (next((n for n in names if os.path.basename(n) == f"{file_name}.md"), None)
+                        or next((n for n in names if os.path.basename(n) == "full.md"), None)
+                        or min(names, key=lambda n: (n.count('/'), len(n))))
+                md_path = os.path.join(output_path, f"{file_name}.md")
+                with zip_ref.open(name) as src, open(f"{md_path}.part", 'wb') as dst:
+                    shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK)
+                os.replace(f"{md_path}.part", md_path)
+        except zipfile.BadZipFile as e:
+            # 损坏的 zip 删除后下次重新下载
+            logger.error(f"Failed to unzip: {e}")
+            os.remove(zip_path)
+            return False
+        return True
+
+    @staticmethod
+    def extract_assets(output_path, file_name, members=None):
+        """
+        按需从 zip 结果中解出图片与版面 JSON 到 output_path (默认只解出 markdown)
+        members: 要解出的条目名列表, 默认全部; 返回解出的条目名
+        """
+        zip_path = os.path.join(output_path, f"{file_name}_result.zip")
+        if not os.path.exists(zip_path):
+            return []
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            names = [name for name in zip_ref.namelist()
+                     if not name.endswith('/') and (members is None or name in members)]
+            for name in names:
+                zip_ref.extract(name, output_path)
+        return names
 
+    async def upload_async(self, http, pdf_path, output_dir):
+        """
+        异步申请上传链接并上传单个 PDF (供异步流水线使用)
+        http: httpx.AsyncClient
+        返回 (batch_id, data_id, file_name, target_dir), 上传完成后 MinerU 自动提交解析任务
+        """
+        data_id, (_, file_name, target_dir) = self._batch_entry(pdf_path, output_dir)
+
+        with metrics.span('upload'):
+            await self.limiter.acquire_async()
+            response = await http.post(f"{self.api_base}/file-urls/batch", headers=self._headers(), json={
+                "files": [{"name": f"{file_name}.pdf", "data_id": data_id}],
+                "model_version": self.model_version
+            })
+            if response.status_code != 200:
+                raise Exception(f"API Request Failed: {response.status_code} {response.text}")
+            result = response.json()
+            if result.get("code") != 0:
+                raise Exception(f"Get Upload URL Failed: {result.get('msg')}")
+            batch_id = result["data"]["batch_id"]
+            file_urls = result["data"]["file_urls"]
+            if not file_urls:
+                raise Exception("No upload URLs returned")
+
+            content = await asyncio.to_thread(self._read_bytes, pdf_path)
+            res_upload = await http.put(file_urls[0], content=content)
+            if res_upload.status_code != 200:
+                raise Exception(f"Upload failed: {res_upload.text}")
+            logger.info(f"[{file_name}] 上传成功, batch_id: {batch_id}")
+        return batch_id, data_id, file_name, target_dir
+
+    async def poll_async(self, http, batch_id, data_id, file_name, target_dir, pdf_path=None):
+        """
+        异步轮询单个批次直到结果就绪, 等待期间不占用线程; 轮询节奏见 PollSchedule
+        结果在下载线程池中下载, 与轮询相互独立
+        pdf_path: 用于估计解析耗时, 决定首次轮询时间
+        """
+        schedule = PollSchedule(self.config['api']['mineru'], [pdf_path] if pdf_path else [])
+        polling_url = f"{self.api_base}/extract-results/batch/{batch_id}"
+        self.timer.start(data_id)
+
+        while True:
+            await asyncio.sleep(schedule.wait_time())
+            progress = None
+            results = []
+            try:
+                await self.limiter.acquire_async()
+                poll_res = await http.get(polling_url, headers=self._headers())
+                if poll_res.status_code != 200:
+                    logger.warning(f"Polling failed with status {poll_res.status_code}")
+                elif poll_res.json().get("code") != 0:
+                    logger.warning(f"Polling returned error code: {poll_res.json().get('msg')}")
+                else:
+                    results = poll_res.json().get("data", {}).get("extract_result", [])
             except Exception as e:
                 logger.warning(f"Polling exception: {e}")
-                continue
-            
-            if succeeded:
-                break
 
-        if not succeeded:
-             logger.warning("Polling timed out or failed. Check debug logs.")
-             # 这里我们抛出异常，或者在 PDFProcessor.read_result 中处理文件不存在的情况
+            for res in results:
+                if res.get("data_id") != data_id:
+                    continue
+                state = res.get("state")
+                self.timer.observe(data_id, state)
+                if state == "failed":
+                    self.timer.finish(data_id, file_name)
+                    raise Exception(f"MinerU task failed: {res.get('err_msg')}")
+                if state != "done":
+                    progress = res.get("extract_progress")
+                    logger.info(f"[{file_name}] Task state: {state}")
+                    break
+                self.timer.finish(data_id, file_name)
+                if not await asyncio.get_running_loop().run_in_executor(
+                        self.download_pool, self._download_result, res, file_name, target_dir):
+                    raise Exception(f"Failed to download result for {file_name}")
+                return
+
+            if schedule.expired():
+                self.timer.finish(data_id, file_name)
+                raise Exception(f"Polling timed out for batch {batch_id}")
+            schedule.advance(progress)
+
+    @staticmethod
+    def _read_bytes(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _poll_result(self, batch_id, file_name, output_path, header, pdf_path=None):
+        """
+        按自适应节奏 (见 PollSchedule) 轮询单个批次直到结果就绪并下载
+        MinerU 解析失败或超过 polling.deadline 仍未完成时抛出异常
+        """
+        schedule = PollSchedule(self.config['api']['mineru'], [pdf_path] if pdf_path else [])
+        self.timer.start(batch_id)
+
+        while True:
+            time.sleep(schedule.wait_time())
+            logger.info(f"尝试提取batch {batch_id}中md (已等待 {schedule.interval:.0f}s)...")
+            data = self._fetch_batch(batch_id, header)
+            extract_results = (data or {}).get("extract_result", [])
+
+            target_result = None
+            for res in extract_results:
+                if file_name in res.get("file_name", "") or len(extract_results) == 1:
+                    target_result = res
+                    break
+
+            if target_result:
+                state = target_result.get("state")
+                self.timer.observe(batch_id, state)
+                if state == "done":
+                    self.timer.finish(batch_id, file_name)
+                    download = self.download_pool.submit(self._download_result, target_result, file_name, output_path)
+                    if not download.result():
+                        raise Exception(f"Failed to download result for {file_name}")
+                    return
+                if state == "failed":
+                    self.timer.finish(batch_id, file_name)
+                    raise Exception(f"MinerU task failed: {target_result.get('err_msg')}")
+                logger.info(f"Task state: {state}")
+            elif data is not None:
+                logger.info("Waiting for extract_result...")
+
+            if schedule.expired():
+                self.timer.finish(batch_id, file_name)
+                raise Exception(f"Polling timed out for batch {batch_id}")
+            schedule.advance(target_result.get("extract_progress") if target_result else None)
@@ -1,17 +1,22 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 from .pdf_local_handler import LocalPDFProcessor
 from .pdf_api_handler import ApiPDFProcessor
+from .conversion_cache import ConversionCache
+from .pdf_text_layer import TextLayerExtractor
+from .metrics import metrics
 
 class PDFProcessor:
     def __init__(self, config):
         self.config = config
         self.temp_dir = config['paths']['temp_dir']
         self.mode = config['api']['mineru']['mode']
-        
+
         if not os.path.exists(self.temp_dir):
             os.makedirs(self.temp_dir)
-            
+
         if self.mode == 'local_cli':
             self.processor = LocalPDFProcessor(config)
         elif self.mode == 'api':
@@ -19,65 +24,243 @@ class PDFProcessor:
         else:
             raise ValueError(f"Unknown PDF processing mode: {self.mode}")
 
-    def convert_to_markdown(self, pdf_path):
+        # 按 PDF 内容哈希缓存转换结果, 同一篇论文出现在多个任务文件夹中也只转换一次
+        self.cache = ConversionCache(self.temp_dir, config.get('cache', {}).get('max_size_mb', 0))
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._hashes = {}
+        # 文本层快速通道: 原生数字 PDF 在本地直接提取, 不经过 MinerU
+        self.text_layer = TextLayerExtractor.from_config(config)
+        self._text_layer_results = {}  # sha -> 批量模式预先提取的 markdown
+
+    def hash_of(self, pdf_path):
+        """
+        PDF 内容哈希, 按 (路径, 大小, 修改时间) 记忆, 同一进程内每个文件只计算一次
+        """
+        stat = os.stat(pdf_path)
+        key = (pdf_path, stat.st_size, stat.st_mtime_ns)
+        sha = self._hashes.get(key)
+        if sha is None:
+            sha = ConversionCache.hash_file(pdf_path)
+            self._hashes[key] = sha
+        return sha
+
+    def fast_path(self, pdf_path, mode, sha=None):
+        """
+        文本层快速通道: 质量足够时返回本地提取的 markdown, 否则返回 None
+        结果不写入转换缓存, 以免之后其他模式复用较粗糙的提取结果
+        """
+        if self.text_layer is None:
+            return None
+        sha = sha or self.hash_of(pdf_path)
+        if sha in self._text_layer_results:
+            return self._text_layer_results.pop(sha)
+        return self.text_layer.convert(pdf_path, mode)
+
+    def convert_to_markdown(self, pdf_path, batch_id=None, on_submitted=None, mode=None):
         """
         将 PDF 转换为 Markdown
         返回转换后的 Markdown 内容字符串
+        batch_id / on_submitted: 仅 api 模式使用, 见 ApiPDFProcessor.process
+        mode: 阅读模式, 决定文本层快速通道的质量要求
+        """
+        file_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        sha = self.hash_of(pdf_path)
+
+        # 同一内容的 PDF 同时只转换一次, 其余线程等待后直接读取缓存
+        with self._inflight_lock:
+            lock = self._inflight.setdefault(sha, threading.Lock())
+
+        with lock:
+            # 1. 检查缓存
+            cached_content = self._check_cache(sha, file_name)
+            if cached_content:
+                return cached_content
+
+            # 已提交给 MinerU 的批次直接接管, 不再尝试快速通道
+            fast_content = self.fast_path(pdf_path, mode, sha) if batch_id is None else None
+            if fast_content:
+                return fast_content
+
+            logger.info(f"Converting PDF: {file_name} using {self.mode}")
+
+            # MinerU (无论是 local 还是 api 模式，我们都约定输出到 <sha>/file_name 子目录)
+            entry_dir = self.cache.entry_dir(sha)
+            try:
+                # 2. 执行转换
+                # 传入 entry_dir 作为根目录，处理器内部会处理到 file_name 子目录
+                with metrics.span('convert'):
+                    if self.mode == 'api':
+                        self.processor.process(pdf_path, entry_dir, batch_id=batch_id, on_submitted=on_submitted)
+                    else:
+                        self.processor.process(pdf_path, entry_dir)
+
+                # 3. 读取结果并登记缓存
+                return self.register_result(sha, file_name)
+
+            except Exception as e:
+                logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
+                raise e
+
+    def convert_batch(self, pdf_paths, on_done=None, on_error=None, attached=None, on_submitted=None, modes=None):
+        """
+        批量转换模式: 跳过已缓存或可走文本层快速通道的 PDF, 其余按批次提交给 MinerU
+        on_done(pdf_path): 单篇可读取时回调 (之后调用 convert_to_markdown 会命中缓存)
+        on_error(pdf_path, message): 单篇转换失败时回调
+        attached / on_submitted: 仅 api 模式使用, 见 ApiPDFProcessor.process_batch
+        modes: {pdf_path: 阅读模式}, 供文本层快速通道判断
         """
-        file_name = os.path.basename(pdf_path).replace('.pdf', '')
+        attached = attached or {}
+        modes = modes or {}
+        # sha -> 内容相同的 PDF 路径列表, 每个哈希只提交一次
+        by_hash = {}
+        for pdf_path in pdf_paths:
+            sha = self.hash_of(pdf_path)
+            if self._lookup(sha, os.path.splitext(os.path.basename(pdf_path))[0]) is not None:
+                metrics.count('conversion_cache_hits')
+                logger.info(f"Using cached markdown for {os.path.basename(pdf_path)}")
+                if on_done:
+                    on_done(pdf_path)
+            else:
+                by_hash.setdefault(sha, []).append(pdf_path)
+
+        if self.text_layer is not None and by_hash:
+            # 已提交过的批次直接接管; 其余先并行尝试快速通道, 结果留给之后的 convert_to_markdown 读取
+            candidates = [(sha, paths) for sha, paths in by_hash.items() if not any(p in attached for p in paths)]
+            with ThreadPoolExecutor(max_workers=self.text_layer.workers) as pool:
+                results = pool.map(lambda item: self.text_layer.convert(item[1][0], modes.get(item[1][0])), candidates)
+                for (sha, paths), content in zip(candidates, list(results)):
+                    if not content:
+                        continue
+                    self._text_layer_results[sha] = content
+                    del by_hash[sha]
+                    for path in paths:
+                        if on_done:
+                            on_done(path)
+
+        if not by_hash:
+            return
+        logger.info(f"Batch converting {len(by_hash)} PDFs using {self.mode}")
+
+        sha_of = {paths[0]: sha for sha, paths in by_hash.items()}
+
+        def done(pdf_path):
+            sha = sha_of[pdf_path]
+            file_name = os.path.splitext(os.path.basename(pdf_path))[0]
+            try:
+                self.register_result(sha, file_name)
+            except Exception as e:
+                fail(pdf_path, str(e))
+                return
+            for path in by_hash[sha]:
+                if on_done:
+                    on_done(path)
+
+        def fail(pdf_path, message):
+            for path in by_hash[sha_of[pdf_path]]:
+                if on_error:
+                    on_error(path, message)
+
+        jobs = [(paths[0], self.cache.entry_dir(sha)) for sha, paths in by_hash.items()]
+        if self.mode == 'api':
+            # 内容相同的 PDF 任一已提交过即可接管
+            attached_jobs = {}
+            for sha, paths in by_hash.items():
+                for path in paths:
+                    if path in attached:
+                        attached_jobs[paths[0]] = attached[path]
+                        break
+
+            def submitted(pdf_path, batch_id):
+                for path in by_hash[sha_of[pdf_path]]:
+                    if on_submitted:
+                        on_submitted(path, batch_id)
 
-        # 确保 temp_dir 是绝对路径
-        abs_temp_dir = os.path.abspath(self.temp_dir).replace('\\', '/')
-        
-        # MinerU (无论是 local 还是 api 模式，我们都约定输出到 file_name 子目录)
-        output_path = os.path.join(abs_temp_dir, file_name)
-        
-        # 1. 检查缓存
-        cached_content = self._check_cache(output_path, file_name)
-        if cached_content:
-            return cached_content
+            self.processor.process_batch(jobs, on_done=done, on_error=fail,
+                                         attached=attached_jobs, on_submitted=submitted)
+            return
+        if hasattr(self.processor, 'process_batch'):
+            self.processor.process_batch(jobs, on_done=done, on_error=fail)
+            return
 
-        logger.info(f"Converting PDF: {file_name} using {self.mode}")
+        # 处理器不支持批量时逐篇转换
+        for pdf_path, entry_dir in jobs:
+            try:
+                self.processor.process(pdf_path, entry_dir)
+            except Exception as e:
+                logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
+                fail(pdf_path, str(e))
+                continue
+            done(pdf_path)
 
+    def close(self):
+        """
+        运行结束时调用, 写入转换缓存尚未保存的访问时间并关闭文本层提取进程池
+        """
+        self.cache.close()
+        if self.text_layer is not None:
+            self.text_layer.close()
+
+    def _check_cache(self, sha, file_name):
+        path = self._lookup(sha, file_name)
+        if path:
+            metrics.count('conversion_cache_hits')
+            logger.info(f"Using cached markdown for {file_name} from {path}")
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        return None
+
+    def _lookup(self, sha, file_name):
+        """
+        缓存中的 markdown 路径; 未命中时尝试导入旧版本按文件名存放的转换结果
+        """
+        return self.cache.get(sha) or self._import_legacy(sha, file_name)
+
+    def _import_legacy(self, sha, file_name):
+        """
+        旧版本的转换结果位于 temp_dir/<file_name>/: 存在时移入 temp_dir/<sha>/ 并登记, 不再重新转换
+        """
+        legacy_dir = os.path.join(self.cache.cache_dir, file_name)
+        if not any(os.path.exists(path) for path in self._candidates(legacy_dir, file_name)):
+            return None
+        output_path = os.path.join(self.cache.entry_dir(sha), file_name)
         try:
-            # 2. 执行转换
-            # 传入 abs_temp_dir 作为根目录，处理器内部会处理到 file_name 子目录
-            self.processor.process(pdf_path, abs_temp_dir)
-            
-            # 3. 读取结果
-            return self._read_result(output_path, file_name)
-
-        except Exception as e:
-            logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
-            raise e
-            
-    def _check_cache(self, output_path, file_name):
-        possible_paths = [
+            os.makedirs(self.cache.entry_dir(sha), exist_ok=True)
+            os.replace(legacy_dir, output_path)
+        except OSError as e:
+            # 另一个进程已导入, 或目标已存在
+            logger.warning(f"Failed to import legacy conversion {legacy_dir}: {e}")
+            return self.cache.get(sha)
+        md_path = self._find_result(output_path, file_name)
+        self.cache.put(sha, md_path, self.processor.model_version)
+        metrics.count('conversion_cache_legacy_imports')
+        logger.info(f"Imported legacy conversion of {file_name} into the content-addressed cache")
+        return md_path
+
+    @staticmethod
+    def _candidates(output_path, file_name):
+        return [
             os.path.join(output_path, f"{file_name}.md"),
             os.path.join(output_path, "auto", f"{file_name}.md"),
             os.path.join(output_path, "hybrid_auto", f"{file_name}.md"),
         ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                logger.info(f"Using cached markdown for {file_name} from {path}")
-                with open(path, 'r', encoding='utf-8') as f:
-                    return f.read()
-        return None
-        
-    def _read_result(self, output_path, file_name):
+
+    def register_result(self, sha, file_name):
+        """
+        定位转换生成的 Markdown, 登记到缓存索引并返回其内容
+        """
+        output_path = os.path.join(self.cache.entry_dir(sha), file_name)
+        md_path = self._find_result(output_path, file_name)
+        self.cache.put(sha, md_path, self.processor.model_version)
+        with open(md_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _find_result(self, output_path, file_name):
         # 尝试在可能的子目录中查找生成的 Markdown 文件
-        possible_paths = [
-            os.path.join(output_path, f"{file_name}.md"),
-            os.path.join(output_path, "auto", f"{file_name}.md"),
-            os.path.join(output_path, "hybrid_auto", f"{file_name}.md"),
-        ]
-        
-        for path in possible_paths:
+        for path in self._candidates(output_path, file_name):
             if os.path.exists(path):
                 logger.info(f"Found markdown file at: {path}")
-                with open(path, 'r', encoding='utf-8') as f:
-                    return f.read()
+                return path
 
         # 如果预定义路径都没找到，尝试遍历查找
         logger.warning(f"Markdown file not found in common paths, checking subfolders of {output_path}...")
@@ -87,18 +270,14 @@ class PDFProcessor:
                 if file == f"{file_name}.md":
                     found_path = os.path.join(root, file)
                     logger.info(f"Found markdown file at: {found_path}")
-                    with open(found_path, 'r', encoding='utf-8') as f:
-                        return f.read()
-        
+                    return found_path
+
         # 如果还找不到，尝试找任意 md 文件
         for root, dirs, files in os.walk(output_path):
             for file in files:
                 if file.endswith(".md"):
                     found_path = os.path.join(root, file)
                     logger.info(f"Found markdown file (fallback) at: {found_path}")
-                    with open(found_path, 'r', encoding='utf-8') as f:
-                        return f.read()
-            
-        raise FileNotFoundError(f"Converted Markdown file not found in {output_path}")
-
+                    return found_path
 
+        raise FileNotFoundError(f"Converted Markdown file not found in {output_path}")
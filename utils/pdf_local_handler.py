@@ -1,39 +1,181 @@
 import os
+import queue
+import shutil
+import tempfile
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, Future
 from loguru import logger
 
 class LocalPDFProcessor:
     def __init__(self, config):
         self.config = config
+        local_conf = config['api']['mineru'].get('local', {})
+        self.command = local_conf.get('command', 'mineru')
+        self.backend = local_conf.get('backend', 'hybrid-http-client')
+        self.model_version = self.backend
+        self.files_per_invocation = local_conf.get('files_per_invocation', 8)
+        # 逐篇调用 (线程模式) 时等待凑批的最长时间
+        self.batch_wait = local_conf.get('batch_wait', 2)
+        # 同时调用 process 的线程数上限: 等待的论文达到该数目时不会再有论文加入, 立即提交 (单线程时不等待)
+        concurrency = config.get('concurrency', {})
+        if concurrency.get('engine', 'thread') == 'async':
+            self.max_callers = concurrency.get('async', {}).get('upload_workers', 4)
+        else:
+            self.max_callers = concurrency.get('max_workers', self.files_per_invocation)
+        self._waiting = []  # [(pdf_path, output_dir, Future)]
+        self._waiting_lock = threading.Lock()
+        self._waiting_timer = None
+        self.log_dir = local_conf.get('log_dir', './logs/mineru')
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        # 进程槽位: 数量即本地 MinerU 的并发数 (与 LLM 并发独立), 槽位轮流绑定到各个后端地址
+        server_urls = local_conf.get('server_urls') or ["http://127.0.0.1:30000"]
+        self.workers = local_conf.get('workers', len(server_urls))
+        self._slots = queue.Queue()
+        for i in range(self.workers):
+            self._slots.put(server_urls[i % len(server_urls)])
 
     def process(self, pdf_path, output_dir):
         """
-        使用本地 MinerU CLI转换
+        使用本地 MinerU CLI转换, 阻塞至本篇完成
         pdf_path: PDF文件绝对路径
         output_dir: 输出的根目录 (MinerU会在这个目录下创建以文件名命名的子目录)
+        各线程的逐篇请求先进入等待队列, 凑够 files_per_invocation 篇或等待 batch_wait 秒后以目录模式一起交给 MinerU
+        """
+        future = Future()
+        with self._waiting_lock:
+            self._waiting.append((pdf_path, output_dir, future))
+            if len(self._waiting) >= min(self.files_per_invocation, self.max_callers) or self.batch_wait <= 0:
+                waiting = self._take_waiting()
+            else:
+                waiting = None
+                if self._waiting_timer is None:
+                    self._waiting_timer = threading.Timer(self.batch_wait, self._flush_waiting)
+                    self._waiting_timer.daemon = True
+                    self._waiting_timer.start()
+        if waiting:
+            self._run_waiting(waiting)
+        future.result()
+
+    def _take_waiting(self):
+        # 调用方持有 _waiting_lock
+        waiting, self._waiting = self._waiting, []
+        if self._waiting_timer is not None:
+            self._waiting_timer.cancel()
+            self._waiting_timer = None
+        return waiting
+
+    def _flush_waiting(self):
+        with self._waiting_lock:
+            waiting = self._take_waiting()
+        if waiting:
+            self._run_waiting(waiting)
+
+    def _run_waiting(self, waiting):
+        futures = {pdf_path: future for pdf_path, _, future in waiting}
+        try:
+            self.process_batch([(pdf_path, output_dir) for pdf_path, output_dir, _ in waiting],
+                               on_done=lambda pdf_path: futures[pdf_path].set_result(None),
+                               on_error=lambda pdf_path, message: futures[pdf_path].set_exception(Exception(message)))
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+
+    def process_batch(self, jobs, on_done=None, on_error=None):
+        """
+        目录模式: 每次调用 MinerU 处理一个目录中的多个 PDF, 摊薄进程与模型客户端的启动开销
+        jobs: [(pdf_path, output_dir), ...]
+        on_done(pdf_path) / on_error(pdf_path, message): 单篇完成或失败时回调
+        """
+        # 同一次调用中文件名不能重复 (MinerU 按文件名建立输出子目录)
+        chunks = []
+        for job in jobs:
+            name = os.path.basename(job[0])
+            for chunk in chunks:
+                if len(chunk) < self.files_per_invocation and name not in chunk:
+                    chunk[name] = job
+                    break
+            else:
+                chunks.append({name: job})
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(lambda chunk: self._process_chunk(chunk, on_done, on_error), chunks))
+
+    def _process_chunk(self, chunk, on_done, on_error):
+        with tempfile.TemporaryDirectory(prefix="mineru_", dir=self.config['paths']['temp_dir']) as staging:
+            input_dir = os.path.join(staging, "input")
+            output_root = os.path.join(staging, "output")
+            os.makedirs(input_dir)
+            for name, (pdf_path, _) in chunk.items():
+                self._link(pdf_path, os.path.join(input_dir, name))
+
+            # 每篇一个日志: 目录模式下各篇的输出交错在同一进程中, 无法可靠拆分,
+            # 因此整次调用的输出写入第一篇的日志, 其余各篇的日志为其硬链接 (或副本)
+            # 不同目录下可能有同名 PDF, 日志名附带本次调用的临时目录名以保证唯一
+            job_id = os.path.basename(staging).removeprefix("mineru_")
+            log_paths = {name: os.path.join(self.log_dir, f"{os.path.splitext(name)[0]}_{job_id}.log")
+                         for name in chunk}
+            log_path = next(iter(log_paths.values()))
+            try:
+                self._run(input_dir, output_root, log_path)
+            except Exception as e:
+                for pdf_path, _ in chunk.values():
+                    if on_error:
+                        on_error(pdf_path, str(e))
+                return
+            finally:
+                if os.path.exists(log_path):
+                    for paper_log in list(log_paths.values())[1:]:
+                        self._link(log_path, paper_log)
+
+            for name, (pdf_path, output_dir) in chunk.items():
+                file_name = os.path.splitext(name)[0]
+                produced = os.path.join(output_root, file_name)
+                if not os.path.isdir(produced):
+                    if on_error:
+                        on_error(pdf_path, f"MinerU produced no output, see {log_paths[name]}")
+                    continue
+                target = os.path.join(os.path.abspath(output_dir), file_name)
+                shutil.rmtree(target, ignore_errors=True)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(produced, target)
+                if on_done:
+                    on_done(pdf_path)
+
+    def _run(self, input_path, output_dir, log_path):
+        """
+        占用一个进程槽位运行 MinerU, stdout/stderr 实时写入 log_path
         """
         # 确保 output_dir 是绝对路径
         abs_output_dir = os.path.abspath(output_dir).replace('\\', '/')
-        
-        # 这里的命令参数可能需要根据实际 config 调整，目前按照原代码硬编码
-        # 如果 config 中有更多配置，可以在这里读取
-        cmd = [
-            "mineru", 
-            "-p", pdf_path, 
-            "-o", abs_output_dir,
-            "-b", "hybrid-http-client",
-            "-u", "http://127.0.0.1:30000"
-        ]
-        logger.info(f"Running command: {' '.join(cmd)}")
-        
-        # Windows 下命令行输出可能为 GBK，使用 errors='replace' 防止报错
-        result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
-        
-        if result.returncode != 0:
-            logger.error(f"MinerU conversion failed: {result.stderr}")
-            logger.error(f"MinerU stdout: {result.stdout}") # 记录 stdout 辅助排查
-            raise Exception(f"Conversion failed for {pdf_path}")
-        else:
-            logger.debug(f"MinerU Output: {result.stdout}")
-            if result.stderr:
-                 logger.warning(f"MinerU Stderr: {result.stderr}")
+        server_url = self._slots.get()
+        try:
+            cmd = [
+                self.command,
+                "-p", input_path,
+                "-o", abs_output_dir,
+                "-b", self.backend,
+                "-u", server_url
+            ]
+            logger.info(f"Running command: {' '.join(cmd)}")
+
+            # 子进程输出直接写入日志文件, 不在内存中缓冲
+            with open(log_path, 'wb') as log_file:
+                returncode = subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT).wait()
+        finally:
+            self._slots.put(server_url)
+
+        if returncode != 0:
+            logger.error(f"MinerU conversion failed (exit {returncode}), see log: {log_path}")
+            raise Exception(f"Conversion failed for {input_path}")
+        logger.debug(f"MinerU finished, log: {log_path}")
+
+    @staticmethod
+    def _link(src, dst):
+        # 优先硬链接, 跨磁盘或不支持时复制
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
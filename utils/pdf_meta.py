@@ -0,0 +1,25 @@
+import re
+import mmap
+
+# 页面对象 "/Type /Page" (不含 "/Type /Pages")
+PAGE_RE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+# 页面树根节点的 "/Count N"
+COUNT_RE = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b')
+
+
+def count_pages(pdf_path):
+    """
+    不解析 PDF, 直接在原始字节中统计页数 (内存映射, 不整体读入内存)
+    页面对象被压缩在对象流中时无法统计, 返回 None
+    """
+    try:
+        with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            counts = [int(a or b) for a, b in COUNT_RE.findall(data)]
+            if counts:
+                # 根节点的 Count 最大
+                return max(counts)
+            pages = sum(1 for _ in PAGE_RE.finditer(data))
+    except (OSError, ValueError):
+        # 空文件无法映射
+        return None
+    return pages or None
@@ -0,0 +1,228 @@
+import re
+import threading
+import multiprocessing
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+from .metrics import metrics
+
+EXTRACTORS = ('pymupdf', 'pypdf')
+# 数学符号: 希腊字母、数学运算符、杂项技术符号、箭头、数学字母数字
+MATH_RE = re.compile('[\u0370-\u03ff\u2190-\u21ff\u2200-\u22ff\u2300-\u23ff\u27c0-\u27ef\u2980-\u2aff\U0001d400-\U0001d7ff]')
+HYPHEN_BREAK_RE = re.compile(r'(\w)-\n(\w)')
+
+
+def _import_extractor(name):
+    """
+    按名称懒加载 PDF 文本提取库, 未安装时返回 None
+    """
+    try:
+        if name == 'pymupdf':
+            try:
+                import pymupdf
+            except ImportError:
+                import fitz as pymupdf
+            return pymupdf
+        import pypdf
+        return pypdf
+    except ImportError:
+        return None
+
+
+def available_extractor(preferred='auto'):
+    for name in (EXTRACTORS if preferred == 'auto' else (preferred,)):
+        if _import_extractor(name) is not None:
+            return name
+    return None
+
+
+def _join_lines(text):
+    # 合并被换行截断的单词, 其余换行视为空格
+    text = HYPHEN_BREAK_RE.sub(r'\1\2', text)
+    return re.sub(r'\s*\n\s*', ' ', text).strip()
+
+
+def _font_mapped(subtype, encoding, to_unicode):
+    """
+    字体的字形能否映射到 Unicode: 带 ToUnicode 表, 或复合字体使用非 Identity 的预定义 CMap,
+    或简单字体使用标准/内置编码; Type3 字体的字形名称任意, 没有 ToUnicode 时视为不可映射
+    """
+    if to_unicode:
+        return True
+    if subtype == 'Type0':
+        return bool(encoding) and not encoding.startswith('Identity')
+    return subtype != 'Type3'
+
+
+def _pages_pymupdf(module, pdf_path):
+    """
+    按字号区分标题与正文: 明显大于正文字号的短文本块输出为 markdown 标题
+    返回 (各页文本, {字体 xref: 是否可映射})
+    """
+    blocks = []  # (页码, 字号, 文本)
+    sizes = Counter()
+    fonts = {}
+    with module.open(pdf_path) as doc:
+        for number, page in enumerate(doc):
+            for xref, *_ in page.get_fonts():
+                if xref not in fonts:
+                    encoding_type, encoding = doc.xref_get_key(xref, 'Encoding')
+                    fonts[xref] = _font_mapped(doc.xref_get_key(xref, 'Subtype')[1].lstrip('/'),
+                                               encoding.lstrip('/') if encoding_type == 'name' else '',
+                                               doc.xref_get_key(xref, 'ToUnicode')[0] != 'null')
+            for block in page.get_text('dict')['blocks']:
+                if block.get('type') != 0:
+                    continue
+                spans = [span for line in block['lines'] for span in line['spans'] if span['text'].strip()]
+                if not spans:
+                    continue
+                text = "\n".join("".join(span['text'] for span in line['spans']) for line in block['lines'])
+                size = round(max(span['size'] for span in spans), 1)
+                for span in spans:
+                    sizes[round(span['size'], 1)] += len(span['text'])
+                blocks.append((number, size, text))
+        page_count = len(doc)
+
+    body_size = sizes.most_common(1)[0][0] if sizes else 0
+    pages = [[] for _ in range(page_count)]
+    for number, size, text in blocks:
+        text = _join_lines(text)
+        if body_size and size >= body_size * 1.2 and len(text) < 200:
+            pages[number].append(f"## {text}")
+        else:
+            pages[number].append(text)
+    return ["\n\n".join(parts) for parts in pages], fonts
+
+
+def _pages_pypdf(module, pdf_path):
+    reader = module.PdfReader(pdf_path)
+    pages = []
+    fonts = {}
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        # 空行分段, 段内换行合并
+        pages.append("\n\n".join(_join_lines(p) for p in re.split(r'\n\s*\n', text) if p.strip()))
+        resources = page.get('/Resources')
+        font_dict = resources.get_object().get('/Font') if resources is not None else None
+        for name, ref in (font_dict.get_object().items() if font_dict is not None else ()):
+            key = getattr(ref, 'idnum', None) or (page.page_number, name)
+            if key not in fonts:
+                font = ref.get_object()
+                encoding = font.get('/Encoding')
+                fonts[key] = _font_mapped(str(font.get('/Subtype', '')).lstrip('/'),
+                                          encoding.lstrip('/') if isinstance(encoding, str) else '',
+                                          '/ToUnicode' in font)
+    return pages, fonts
+
+
+def extract(pdf_path, extractor):
+    """
+    在子进程中执行: 提取文本层并统计质量指标
+    返回 {'markdown', 'pages', 'text_pages', 'chars', 'bad_chars', 'math_chars', 'fonts', 'mapped_fonts'}
+    """
+    module = _import_extractor(extractor)
+    pages, fonts = _pages_pymupdf(module, pdf_path) if extractor == 'pymupdf' else _pages_pypdf(module, pdf_path)
+    text = "".join(pages)
+    chars = sum(1 for c in text if not c.isspace())
+    # 无法映射到 Unicode 的字形通常提取为替换字符、私有区或控制字符
+    bad_chars = sum(1 for c in text if c == '\ufffd' or unicodedata.category(c) in ('Co', 'Cc', 'Cs') and not c.isspace())
+    return {
+        'markdown': "\n\n".join(p for p in pages if p),
+        'pages': len(pages),
+        'text_pages': sum(1 for p in pages if len(p.strip()) >= 100),
+        'chars': chars,
+        'bad_chars': bad_chars,
+        'math_chars': len(MATH_RE.findall(text)),
+        'fonts': len(fonts),
+        'mapped_fonts': sum(fonts.values()),
+    }
+
+
+class TextLayerExtractor:
+    """
+    文本层快速通道: 原生数字 PDF (如 arXiv) 的文本层质量足够时在本地进程池中直接提取 markdown, 不经过 MinerU
+    质量指标: 每页字符数、字形可映射比例 (非乱码字符占比)、字体覆盖率 (可映射到 Unicode 的字体占比)、有文本的页面占比;
+    数学符号占比过高视为公式密集, 仍交给 MinerU
+    modes 中的模式只需通过基本检查; 其他模式还需质量分 (可映射比例 x 页面占比) 达到 threshold
+    """
+    def __init__(self, conf):
+        self.modes = conf.get('modes', ['skim'])
+        self.threshold = conf.get('threshold', 0.98)
+        self.min_chars_per_page = conf.get('min_chars_per_page', 500)
+        self.min_clean_ratio = conf.get('min_clean_ratio', 0.95)
+        self.min_page_coverage = conf.get('min_page_coverage', 0.8)
+        self.min_font_coverage = conf.get('min_font_coverage', 0.9)
+        self.max_math_ratio = conf.get('max_math_ratio', 0.01)
+        self.workers = conf.get('workers', 4)
+        self.extractor = available_extractor(conf.get('extractor', 'auto'))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        if self.extractor is None:
+            logger.error("Text-layer fast path is enabled but neither PyMuPDF nor pypdf is installed; all PDFs go to MinerU. "
+                         "Install the optional dependency with `uv sync --extra textlayer`")
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        读取 api.mineru.text_layer, 未启用时返回 None
+        """
+        conf = config['api']['mineru'].get('text_layer', {})
+        if not conf.get('enabled', False):
+            return None
+        return cls(conf)
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # 由工作线程按需创建: fork 已有线程的进程可能在日志、连接池等持有的锁上死锁, 使用 spawn
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def accepts(self, stats, mode):
+        """
+        根据质量指标判断是否走快速通道, 返回 (是否接受, 原因)
+        """
+        pages = max(stats['pages'], 1)
+        chars = max(stats['chars'], 1)
+        clean_ratio = 1 - stats['bad_chars'] / chars
+        coverage = stats['text_pages'] / pages
+        if stats['chars'] / pages < self.min_chars_per_page:
+            return False, f"{stats['chars'] / pages:.0f} chars/page (likely scanned)"
+        if clean_ratio < self.min_clean_ratio or coverage < self.min_page_coverage:
+            return False, f"clean ratio {clean_ratio:.3f}, text pages {coverage:.2f}"
+        font_coverage = stats['mapped_fonts'] / stats['fonts'] if stats['fonts'] else 0.0
+        if font_coverage < self.min_font_coverage:
+            return False, f"font coverage {font_coverage:.2f} (fonts without a Unicode mapping)"
+        if stats['math_chars'] / chars > self.max_math_ratio:
+            return False, f"math ratio {stats['math_chars'] / chars:.3f} (formula-heavy)"
+        if mode not in self.modes and clean_ratio * coverage < self.threshold:
+            return False, f"quality {clean_ratio * coverage:.3f} below threshold for {mode}"
+        return True, f"quality {clean_ratio * coverage:.3f}"
+
+    def convert(self, pdf_path, mode):
+        """
+        尝试快速提取, 返回 markdown; 不满足条件或提取失败时返回 None (交给 MinerU)
+        """
+        if self.extractor is None:
+            return None
+        with metrics.span('text_layer'):
+            try:
+                stats = self._executor().submit(extract, pdf_path, self.extractor).result()
+            except Exception as e:
+                logger.warning(f"Text-layer extraction failed for {pdf_path}, falling back to MinerU: {e}")
+                return None
+        accepted, reason = self.accepts(stats, mode)
+        if not accepted:
+            metrics.count('text_layer_rejected')
+            logger.info(f"Text layer not used for {pdf_path}: {reason}")
+            return None
+        metrics.count('text_layer_hits')
+        logger.info(f"Using text layer for {pdf_path} ({self.extractor}, {reason})")
+        return stats['markdown']
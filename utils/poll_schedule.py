@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+from loguru import logger
+from .pdf_meta import count_pages
+from .metrics import metrics
+
+
+class PollSchedule:
+    """
+    MinerU 自适应轮询节奏:
+    按页数 (无法统计时按文件大小) 估计完成时间, 在预计时间的 early_factor 处开始第一次轮询,
+    之后按 backoff 倍数指数退避, 间隔不超过 max_interval; 超过 deadline 秒仍未完成即放弃
+    """
+    def __init__(self, mineru_conf, pdf_paths=()):
+        conf = mineru_conf.get('polling', {})
+        self.min_interval = conf.get('min_interval', 2)
+        self.max_interval = conf.get('max_interval', mineru_conf.get('polling_interval', 30))
+        self.backoff = conf.get('backoff', 1.5)
+        self.seconds_per_page = conf.get('seconds_per_page', 1.0)
+        self.seconds_per_mb = conf.get('seconds_per_mb', 3.0)
+        self.early_factor = conf.get('early_factor', 0.5)
+        self.deadline = time.monotonic() + conf.get('deadline', 1800)
+
+        # 批次内文件并行解析, 按最慢的一篇估计
+        self.expected = max((self.estimate(path) for path in pdf_paths), default=0)
+        self.interval = self._clamp(self.expected * self.early_factor)
+        self.next_poll = time.monotonic() + self.interval
+
+    def estimate(self, pdf_path):
+        """
+        估计单篇 PDF 的解析耗时 (秒)
+        """
+        pages = count_pages(pdf_path)
+        if pages:
+            return pages * self.seconds_per_page
+        return os.path.getsize(pdf_path) / 1024 / 1024 * self.seconds_per_mb
+
+    def wait_time(self):
+        return max(0.0, self.next_poll - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def advance(self, progress=None):
+        """
+        本次轮询未完成, 安排下一次轮询
+        progress: MinerU 返回的 extract_progress, 有剩余页数时按剩余页数估计等待时间
+        """
+        self.interval = self._clamp(self.interval * self.backoff)
+        if progress:
+            remaining = progress.get('total_pages', 0) - progress.get('extracted_pages', 0)
+            if remaining > 0:
+                self.interval = self._clamp(min(self.interval, remaining * self.seconds_per_page))
+        self.next_poll = min(time.monotonic() + self.interval, self.deadline)
+
+    def _clamp(self, seconds):
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+
+class StateTimer:
+    """
+    记录每个任务在 MinerU 各状态 (waiting-file / pending / running / converting) 停留的时长
+    两次轮询之间的时间计入上一次观察到的状态; 汇总值可用 totals() 查看
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = {}  # key -> (上次观察到的状态, 观察时间, {state: 秒})
+        self._totals = {}  # state -> [任务数, 总秒数]
+
+    def start(self, key):
+        with self._lock:
+            self._tasks[key] = ('submitted', time.monotonic(), {})
+
+    def observe(self, key, state):
+        now = time.monotonic()
+        with self._lock:
+            last_state, since, durations = self._tasks.get(key, (state, now, {}))
+            durations[last_state] = durations.get(last_state, 0.0) + now - since
+            self._tasks[key] = (state, now, durations)
+
+    def finish(self, key, label):
+        """
+        任务结束, 返回并记录其各状态耗时
+        """
+        with self._lock:
+            _, _, durations = self._tasks.pop(key, (None, None, {}))
+            for state, seconds in durations.items():
+                total = self._totals.setdefault(state, [0, 0.0])
+                total[0] += 1
+                total[1] += seconds
+        for state, seconds in durations.items():
+            metrics.observe(f"mineru_{state}", seconds)
+        if durations:
+            details = ", ".join(f"{state} {seconds:.1f}s" for state, seconds in durations.items())
+            logger.info(f"[{label}] MinerU timings: {details}")
+        return durations
+
+    def totals(self):
+        with self._lock:
+            return {state: {'tasks': count, 'seconds': round(seconds, 3), 'avg': round(seconds / count, 3)}
+                    for state, (count, seconds) in self._totals.items()}
@@ -1,26 +1,17 @@
-import re
+from .md_preprocess import MarkdownPreprocessor
 
 class PromptBuilder:
-    @staticmethod
-    def build_summary_prompt(markdown_content, mode='skim', remove_refs=True):
-        """
-        构建 XML 格式的 Prompt
-        mode: 'skim' (浏览) 或 'deep_read' (精读)
-        remove_refs: 是否去除参考文献
-        """
-        
-        # 预处理：去除参考文献
-        if remove_refs:
-            content_clean = PromptBuilder.remove_references(markdown_content)
-            print("References 已清除")
-        else:
-            content_clean = markdown_content
-            print("References 保留")
-        
-        instruction = ""
-        if mode == 'deep_read':
-            instruction = """
-作为该领域的研究专家，请仔细阅读以下论文内容。
+    """
+    Prompt 布局按服务端前缀缓存优化: 固定的任务说明 -> 论文正文 -> 本次请求的具体要求
+    同一篇论文的不同请求 (浏览与精读、分块与合并) 共享到正文结束为止逐字节相同的前缀
+    """
+    # 与模式无关的固定说明, 位于所有请求的开头
+    STATIC_INSTRUCTION = """
+请阅读下面的论文内容 (由 PDF 转换得到的 Markdown)，并按照最后 <instruction> 中的要求作答。
+"""
+
+    DEEP_READ_INSTRUCTION = """
+作为该领域的研究专家，请仔细阅读以上论文内容。
 请生成一份详细的总结报告，包含以下部分：
 1. **核心发现**：论文解决了什么问题？发现了什么新现象？
 2. **技术细节**：具体使用了什么方法（如 DFT 参数、泛函、计算设置）？关键公式或推导是什么？
@@ -28,43 +19,131 @@ class PromptBuilder:
 4. **结论与意义**：这项工作对领域有什么贡献？
 请注意：保留关键的数据指标和专业术语。
 """
-        else: # skim
-            instruction = """
-作为研究助理，请快速浏览以下论文。
+
+    SKIM_INSTRUCTION = """
+作为研究助理，请快速浏览以上论文。
 请生成一份简短的摘要，包含：
 1. **研究目的**：这篇论文想干什么？
 2. **主要结论**：他们得出了什么结论？
 3. **核心方法**：用了一两句话概括方法。
 """
 
-        prompt = f"""
+    # 分块摘要 (map 阶段) 的指令; 修改后需同步提升 map_reduce.CHUNK_PROMPT_VERSION 使缓存失效
+    CHUNK_INSTRUCTION = """
+以上是一篇论文的第 {index}/{total} 部分。
+请提取该部分的要点，包括：研究问题或动机、方法与计算/实验设置、关键公式、主要数据结果、结论。
+请保留具体数值、参数和专业术语；该部分未涉及的条目直接省略，不要猜测其他部分的内容。
+"""
+
+    REDUCE_INSTRUCTION = """
+以上是同一篇论文按章节顺序分段提取的要点，请将它们整合为一份完整的总结。
+"""
+
+    # 分块要点过多、reduce Prompt 放不下时, 先把相邻的要点合并压缩
+    COMBINE_INSTRUCTION = """
+以上是同一篇论文连续若干部分的要点，请按原顺序将它们合并为一份更紧凑的要点笔记。
+请保留具体数值、参数和专业术语，不要添加原文没有的内容。
+"""
+
+    PREFIX_TEMPLATE = """
+<task>
+{static}
+</task>
+
+<{tag}>
+{content}
+</{tag}>
+"""
+
+    QUESTION_TEMPLATE = """
 <instruction>
 {instruction}
 </instruction>
-
-<paper_content>
-{content_clean[:30000]} 
-</paper_content> 
 """
-        # 注意：这里做了简单的长度截断 [:30000] 防止 token 溢出，根据模型能力调整
-        return prompt
+
+    @staticmethod
+    def get_instruction(mode):
+        if mode == 'deep_read':
+            return PromptBuilder.DEEP_READ_INSTRUCTION
+        return PromptBuilder.SKIM_INSTRUCTION
+
+    @staticmethod
+    def build_summary_prompt(markdown_content, mode='skim', remove_refs=True, budget=None):
+        """
+        构建 XML 格式的 Prompt
+        mode: 'skim' (浏览) 或 'deep_read' (精读)
+        remove_refs: 是否去除参考文献 (已经过 MarkdownPreprocessor 处理的正文传 False)
+        budget: TokenBudget, 提供时按 token 预算在章节边界截断正文, 否则按字符截断
+        """
+
+        # 预处理：去除参考文献
+        if remove_refs:
+            content_clean = PromptBuilder.remove_references(markdown_content)
+            print("References 已清除")
+        else:
+            content_clean = markdown_content
+
+        if budget is not None:
+            content = budget.fit(content_clean, PromptBuilder.content_budget(budget))
+        else:
+            # 注意：未配置 context_window 时做简单的长度截断 [:30000] 防止 token 溢出
+            content = content_clean[:30000]
+        return PromptBuilder.build_prompt(content, PromptBuilder.get_instruction(mode))
+
+    @staticmethod
+    def content_budget(budget):
+        """
+        单次总结请求中正文可用的 token 数
+        按最长的模式指令计算, 使同一篇论文在各模式下截断结果相同, 前缀可复用
+        """
+        return min(budget.available(PromptBuilder.build_prompt("", PromptBuilder.get_instruction(m)))
+                   for m in ('skim', 'deep_read'))
+
+    @staticmethod
+    def build_prompt(content, instruction, tag='paper_content'):
+        """
+        按固定顺序拼接: 固定说明与正文 (可缓存的前缀) 在前, 本次请求的指令在后
+        """
+        prefix = PromptBuilder.PREFIX_TEMPLATE.format(static=PromptBuilder.STATIC_INSTRUCTION, tag=tag, content=content)
+        return prefix + PromptBuilder.QUESTION_TEMPLATE.format(instruction=instruction)
+
+    @staticmethod
+    def build_chunk_prompt(chunk_content, index, total):
+        """
+        构建分块摘要 (map 阶段) 的 Prompt
+        """
+        return PromptBuilder.build_prompt(chunk_content, PromptBuilder.CHUNK_INSTRUCTION.format(index=index, total=total),
+                                          tag='paper_section')
+
+    @staticmethod
+    def build_reduce_prompt(chunk_summaries, mode='deep_read'):
+        """
+        构建合并分块摘要 (reduce 阶段) 的 Prompt, 输出格式与单次总结一致
+        """
+        return PromptBuilder.build_prompt(PromptBuilder.format_sections(chunk_summaries),
+                                          PromptBuilder.get_reduce_instruction(mode), tag='section_notes')
+
+    @staticmethod
+    def build_combine_prompt(chunk_summaries):
+        """
+        构建合并相邻分块要点的 Prompt (reduce Prompt 超出预算时使用)
+        """
+        return PromptBuilder.build_prompt(PromptBuilder.format_sections(chunk_summaries),
+                                          PromptBuilder.COMBINE_INSTRUCTION, tag='section_notes')
+
+    @staticmethod
+    def get_reduce_instruction(mode):
+        return PromptBuilder.REDUCE_INSTRUCTION + PromptBuilder.get_instruction(mode)
+
+    @staticmethod
+    def format_sections(chunk_summaries):
+        return "\n\n".join(
+            f'<section index="{i}">\n{summary}\n</section>' for i, summary in enumerate(chunk_summaries, 1)
+        )
 
     @staticmethod
     def remove_references(text):
         """
-        简单去除参考文献部分
+        去除参考文献部分 (其余预处理规则见 MarkdownPreprocessor)
         """
-        # 匹配常见的参考文献标题，不区分大小写
-        patterns = [
-            r"##\s*References",
-            r"##\s*参考文献",
-            r"#\s*References",
-            r"###\s*References"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return text[:match.start()]
-        
-        return text
+        return MarkdownPreprocessor(references=True).process(text)[0]
@@ -0,0 +1,138 @@
+import time
+import asyncio
+import sqlite3
+import threading
+from loguru import logger
+
+class RateLimiter:
+    """
+    线程安全的令牌桶限流器, 同时限制每分钟请求数 (RPM) 与每分钟 token 数 (TPM)
+    收到 429 时按 Retry-After 暂停所有调用方, 并临时下调速率, 之后随成功请求逐步恢复
+    rpm / tpm 为 0 表示不限制
+    """
+    MIN_SCALE = 0.1
+    # 单进程内用单调时钟; 跨主机共享状态时需用墙上时间
+    _clock = staticmethod(time.monotonic)
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._lock = threading.Lock()
+        self._scale = 1.0
+        self._paused_until = 0.0
+        # 桶的当前余量, 初始为满
+        self._levels = {'requests': float(self.rpm), 'tokens': float(self.tpm)}
+        self._updated = self._clock()
+
+    def reserve(self, tokens=0):
+        """
+        预占一次请求的额度, 返回调用方需要等待的秒数 (非阻塞, 同步/异步调用方共用)
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            delay = max(0.0, self._paused_until - now)
+            for name, capacity, cost in (('requests', self.rpm, 1), ('tokens', self.tpm, tokens)):
+                if not capacity:
+                    continue
+                rate = capacity * self._scale / 60.0
+                # 单次请求超过桶容量时按容量计, 避免永远等待
+                self._levels[name] -= min(cost, capacity)
+                if self._levels[name] < 0:
+                    delay = max(delay, -self._levels[name] / rate)
+            return delay
+
+    def acquire(self, tokens=0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def penalize(self, retry_after):
+        """
+        服务端限流 (429): 在 retry_after 秒内暂停发放额度, 并将速率下调 20%
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + retry_after)
+            self._scale = max(self.MIN_SCALE, self._scale * 0.8)
+            logger.warning(f"Rate limited, pausing {retry_after:.1f}s, rate scale {self._scale:.2f}")
+
+    def record_success(self):
+        with self._lock:
+            self._scale = min(1.0, self._scale * 1.05)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        for name, capacity in (('requests', self.rpm), ('tokens', self.tpm)):
+            if capacity:
+                rate = capacity * self._scale / 60.0
+                self._levels[name] = min(float(capacity), self._levels[name] + elapsed * rate)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    多个进程 (可在不同主机上) 共享的限流器: 桶余量、暂停时间与速率系数存放在共享存储上的 SQLite 中,
+    每次预占额度都在一个写事务内完成, 所有 worker 合计不超过同一个 API Key 的 rpm / tpm
+    """
+    _clock = staticmethod(time.time)
+
+    def __init__(self, db_path, name, requests_per_minute=0, tokens_per_minute=0):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self.name = name
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                name TEXT PRIMARY KEY,
+                requests REAL,
+                tokens REAL,
+                updated REAL,
+                scale REAL,
+                paused_until REAL
+            )
+        """)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO rate_limits VALUES (?, ?, ?, ?, 1.0, 0.0)",
+            (name, float(self.rpm), float(self.tpm), self._clock()))
+
+    def reserve(self, tokens=0):
+        return self._shared(super().reserve, tokens)
+
+    def penalize(self, retry_after):
+        self._shared(super().penalize, retry_after)
+
+    def record_success(self):
+        self._shared(super().record_success)
+
+    def _shared(self, operation, *args):
+        """
+        在写事务内读取共享状态, 执行本地的限流计算后写回
+        """
+        if not self.rpm and not self.tpm:
+            return operation(*args)
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT requests, tokens, updated, scale, paused_until FROM rate_limits WHERE name = ?",
+                    (self.name,)).fetchone()
+                with self._lock:
+                    self._levels = {'requests': row[0], 'tokens': row[1]}
+                    self._updated, self._scale, self._paused_until = row[2], row[3], row[4]
+                result = operation(*args)
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE rate_limits SET requests = ?, tokens = ?, updated = ?, scale = ?, paused_until = ? "
+                        "WHERE name = ?",
+                        (self._levels['requests'], self._levels['tokens'], self._updated, self._scale,
+                         self._paused_until, self.name))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
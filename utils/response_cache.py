@@ -0,0 +1,144 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from loguru import logger
+
+WHITESPACE_RE = re.compile(r'[ \t]+')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+class ResponseCache:
+    """
+    LLM 回复缓存: 以 (模型, system prompt, 规范化后的 prompt) 的 SHA-256 为键
+    prompt 由指令与正文拼接而成, 指令或正文任一变化都会得到新的键
+    回复经 zlib 压缩后存放在 SQLite 中, 同时记录 token 用量、创建时间、最近访问时间与命中次数
+    mode: read_write (先查缓存, 未命中时请求并写入) / cache_only (离线, 未命中直接报错) / off
+    """
+    MODES = ('off', 'read_write', 'cache_only')
+
+    def __init__(self, db_path, mode='read_write', ttl_days=0, max_size_mb=0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode}")
+        self.mode = mode
+        self.ttl = ttl_days * 86400  # 0 表示永不过期
+        self.max_size = int(max_size_mb * 1024 * 1024)  # 0 表示不限制
+        self._puts = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        # 可能被多台主机上的 worker 共享, 不使用 WAL
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                data BLOB,
+                size INTEGER,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                created_at REAL,
+                last_access REAL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+        self._evict()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        按 cache.llm 配置创建; mode 为 off 时返回 None
+        """
+        llm_cache = config.get('cache', {}).get('llm', {})
+        mode = llm_cache.get('mode', 'off')
+        if mode == 'off':
+            return None
+        db_path = llm_cache.get('path') or os.path.join(config['paths']['temp_dir'], 'llm_cache.db')
+        return cls(db_path, mode, llm_cache.get('ttl_days', 0), llm_cache.get('max_size_mb', 0))
+
+    @property
+    def offline(self):
+        return self.mode == 'cache_only'
+
+    @staticmethod
+    def make_key(model, system_prompt, prompt_content):
+        # 规范化空白: 行尾空格、连续空格与多余空行不影响缓存命中
+        normalized = "\n".join(WHITESPACE_RE.sub(' ', line).strip() for line in prompt_content.strip().splitlines())
+        normalized = BLANK_LINES_RE.sub('\n\n', normalized)
+        return hashlib.sha256(f"{model}\0{system_prompt}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        返回 {'content', 'prompt_tokens', 'completion_tokens'}, 未命中或已过期返回 None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, prompt_tokens, completion_tokens, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl and now - row[3] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return {'content': zlib.decompress(row[0]).decode('utf-8'), 'prompt_tokens': row[1], 'completion_tokens': row[2]}
+
+    def put(self, key, model, content, prompt_tokens=None, completion_tokens=None):
+        if self.offline or not content:
+            return
+        data = zlib.compress(content.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO responses
+                    (key, model, data, size, prompt_tokens, completion_tokens, created_at, last_access, hits)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+            """, (key, model, data, len(data), prompt_tokens, completion_tokens, now, now))
+            self._puts += 1
+            should_evict = self._puts % 50 == 0
+        if should_evict:
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            count, size, hits, prompt_tokens, completion_tokens = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0), "
+                "COALESCE(SUM(prompt_tokens * hits), 0), COALESCE(SUM(completion_tokens * hits), 0) FROM responses"
+            ).fetchone()
+        return {
+            'mode': self.mode,
+            'entries': count,
+            'total_size_mb': round(size / 1024 / 1024, 2),
+            'max_size_mb': round(self.max_size / 1024 / 1024, 2) if self.max_size else None,
+            'ttl_days': self.ttl / 86400 if self.ttl else None,
+            'hits': hits,
+            # 命中所节省的 token (按写入时记录的用量估计)
+            'saved_prompt_tokens': prompt_tokens,
+            'saved_completion_tokens': completion_tokens,
+        }
+
+    def _evict(self):
+        """
+        删除过期条目; 超出容量时按最近最少使用淘汰
+        """
+        with self._lock:
+            if self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+            if not self.max_size:
+                return
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_size:
+                return
+            evicted = 0
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+                if total <= self.max_size:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        logger.info(f"LLM cache evicted {evicted} entries to stay under {self.max_size // 1024 // 1024} MB")
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from .md_merger import describe_summary
+
+# 论文处理阶段, 按先后顺序排列
+STAGES = ('discovered', 'uploaded', 'converted', 'prompted', 'summarized', 'merged')
+
+
+class RunManifest:
+    """
+    基于 SQLite 的运行清单: 记录每篇论文所处阶段、内容哈希、模式、MinerU batch_id、耗时与错误
+    进程中断后可从最后完成的阶段继续, 已提交但未完成的 MinerU 批次会被重新接管而非重复提交
+    status: running (处理中) / done (已完成) / failed (失败, 可用 --retry-failed 重试)
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        # 与 WorkQueue 相同使用回滚日志: 分布式模式下 temp_dir 可能位于共享存储上, WAL 不可用
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS papers (
+                file_path TEXT PRIMARY KEY,
+                paper_id TEXT,
+                folder_path TEXT,
+                file_name TEXT,
+                mode TEXT,
+                content_hash TEXT,
+                stage TEXT,
+                status TEXT,
+                batch_id TEXT,
+                output_path TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                timings TEXT DEFAULT '{}',
+                updated_at REAL
+            )
+        """)
+
+    def discover(self, paper_info, mode, output_path):
+        """
+        登记论文; 已存在的记录保留其阶段, 只更新模式与输出路径
+        """
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO papers (file_path, paper_id, folder_path, file_name, mode, stage, status, output_path, updated_at)
+                VALUES (?, ?, ?, ?, ?, 'discovered', 'running', ?, ?)
+                ON CONFLICT(file_path) DO UPDATE SET mode = excluded.mode, output_path = excluded.output_path
+            """, (paper_info['file_path'], paper_info['id'], paper_info['folder_path'], paper_info['file_name'],
+                  mode, output_path, time.time()))
+
+    def get(self, file_path):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM papers WHERE file_path = ?", (file_path,)).fetchone()
+        return dict(row) if row else None
+
+    def advance(self, file_path, stage, elapsed=None, **fields):
+        """
+        推进到 stage, 可同时记录该阶段耗时 (秒) 与其他字段 (content_hash, batch_id 等)
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT timings FROM papers WHERE file_path = ?", (file_path,)).fetchone()
+            timings = json.loads(row['timings']) if row and row['timings'] else {}
+            if elapsed is not None:
+                timings[stage] = round(elapsed, 3)
+            fields.update(stage=stage, timings=json.dumps(timings), updated_at=time.time())
+            if stage in ('summarized', 'merged'):
+                fields.update(status='done', error=None)
+            else:
+                fields.setdefault('status', 'running')
+            columns = ", ".join(f"{name} = ?" for name in fields)
+            self._conn.execute(f"UPDATE papers SET {columns} WHERE file_path = ?", (*fields.values(), file_path))
+
+    def fail(self, file_path, error):
+        """
+        记录失败; 清除 batch_id, 重试时重新提交转换
+        """
+        with self._lock:
+            self._conn.execute("""
+                UPDATE papers SET status = 'failed', error = ?, batch_id = NULL,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE file_path = ?
+            """, (str(error), time.time(), file_path))
+
+    def failed_papers(self):
+        """
+        返回失败论文的 paper_info 列表, 供 --retry-failed 使用
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path, paper_id, folder_path, file_name FROM papers WHERE status = 'failed' ORDER BY file_path"
+            ).fetchall()
+        return [{'id': r['paper_id'], 'folder_path': r['folder_path'], 'file_path': r['file_path'],
+                 'file_name': r['file_name']} for r in rows]
+
+    def summaries(self, file_paths=None):
+        """
+        已完成总结 (含此前运行中完成、本次跳过的), 可按 file_paths 限定范围
+        返回 [{'id', 'mode', 'title', 'path'}]; ID 取登记的 paper_id (PDF 可能位于 ID 文件夹的子目录中)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path, paper_id, output_path FROM papers WHERE status = 'done' ORDER BY paper_id, mode, file_name"
+            ).fetchall()
+        wanted = set(file_paths) if file_paths is not None else None
+        return [describe_summary(r['output_path'], r['paper_id']) for r in rows
+                if (wanted is None or r['file_path'] in wanted) and os.path.exists(r['output_path'])]
+
+    def mark_merged(self, output_paths):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE papers SET stage = 'merged', updated_at = ? WHERE output_path = ?",
+                [(time.time(), path) for path in output_paths])
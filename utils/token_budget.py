@@ -0,0 +1,118 @@
+import os
+import re
+from functools import lru_cache
+from loguru import logger
+
+# markdown 标题行, 作为切分章节的边界
+HEADING_RE = re.compile(r'^#{1,6}\s', re.MULTILINE)
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+# 零宽切分, 句间空白保留在下一句开头, 拼接时原样还原
+SENTENCE_RE = re.compile(r'(?<=[。！？.!?])(?=\s)|(?<=[。！？])')
+CJK_RE = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+
+@lru_cache(maxsize=None)
+def load_tokenizer(name):
+    """
+    懒加载并缓存 tokenizer: name 可以是本地 tokenizer.json 路径或 HuggingFace 仓库名
+    未配置或加载失败返回 None, 此时使用字符估算
+    """
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+        if os.path.exists(name):
+            return Tokenizer.from_file(name)
+        return Tokenizer.from_pretrained(name)
+    except Exception as e:
+        logger.warning(f"Tokenizer '{name}' unavailable, falling back to character estimate: {e}")
+        return None
+
+
+class TokenBudget:
+    """
+    按 token 而非字符数为 Prompt 分配正文长度
+    context_window: 模型上下文窗口大小
+    output_reserve: 为模型输出预留的 token 数
+    """
+    def __init__(self, tokenizer_name, context_window, output_reserve=4096):
+        self.tokenizer_name = tokenizer_name
+        self.context_window = context_window
+        self.output_reserve = output_reserve
+
+    @classmethod
+    def from_config(cls, llm_conf):
+        """
+        context_window 未配置时返回 None (沿用字符截断)
+        """
+        context_window = llm_conf.get('context_window')
+        if not context_window:
+            return None
+        # 只有显式配置 tokenizer 时才加载 (可能需要联网下载), 模型名不一定是 HuggingFace 仓库名
+        return cls(llm_conf.get('tokenizer') or None,
+                   context_window,
+                   llm_conf.get('max_output_tokens', 4096))
+
+    def count(self, text):
+        tokenizer = load_tokenizer(self.tokenizer_name)
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False).ids)
+        # 粗略估算: CJK 字符约 1 token/字, 其余约 4 字符/token
+        cjk = len(CJK_RE.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def available(self, overhead_text=""):
+        """
+        扣除输出预留和 Prompt 模板开销后, 正文可用的 token 数
+        """
+        return max(0, self.context_window - self.output_reserve - self.count(overhead_text))
+
+    @staticmethod
+    def split_sections(text):
+        """
+        按 markdown 标题切分为章节列表, 每个章节以其标题行开头
+        """
+        starts = [m.start() for m in HEADING_RE.finditer(text)]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)]) if text[start:end]]
+
+    def fit(self, text, max_tokens):
+        """
+        在 max_tokens 内尽量保留完整章节; 放不下的章节再按段落、句子截断, 不在句中切断
+        """
+        if self.count(text) <= max_tokens:
+            return text
+
+        kept = []
+        remaining = max_tokens
+        for section in self.split_sections(text):
+            tokens = self.count(section)
+            if tokens <= remaining:
+                kept.append(section)
+                remaining -= tokens
+                continue
+            partial = self._fit_pieces(PARAGRAPH_RE.split(section), remaining, "\n\n")
+            if partial:
+                kept.append(partial)
+            break
+
+        result = "".join(kept)
+        logger.info(f"Content trimmed to token budget {max_tokens}: {len(text)} -> {len(result)} chars")
+        return result
+
+    def _fit_pieces(self, pieces, remaining, sep):
+        kept = []
+        for piece in pieces:
+            tokens = self.count(piece + sep)
+            if tokens <= remaining:
+                kept.append(piece)
+                remaining -= tokens
+                continue
+            if sep == "\n\n":
+                # 段落放不下时退到句子粒度
+                partial = self._fit_pieces(SENTENCE_RE.split(piece), remaining, "")
+                if partial:
+                    kept.append(partial)
+            break
+        return sep.join(kept)
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from loguru import logger
+
+from .md_merger import describe_summary
+
+
+class WorkQueue:
+    """
+    基于 SQLite 的持久化任务队列, 供分布式模式下的协调者 (coordinator) 与多个 worker 共享
+    数据库文件放在各主机均可访问的共享存储上; 共享存储上不使用 WAL (依赖同一主机的共享内存), 改用回滚日志
+    worker 以租约方式领取任务并定期心跳续约; 租约过期 (worker 崩溃或失联) 的任务重新可见, 由其他 worker 接管
+    state: queued (待领取) / leased (处理中) / done (已完成) / failed (失败)
+    """
+    def __init__(self, db_path, visibility_timeout=300, max_attempts=3):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                file_path TEXT PRIMARY KEY,
+                paper TEXT,
+                state TEXT,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER DEFAULT 0,
+                output_path TEXT,
+                error TEXT,
+                enqueued_at REAL,
+                updated_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_until)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def enqueue(self, paper_info):
+        """
+        加入队列; 已在队列中 (含已完成、失败) 的任务不重复加入, 返回是否新加入
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO tasks (file_path, paper, state, enqueued_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                (paper_info['file_path'], json.dumps(paper_info, ensure_ascii=False), now, now))
+            return cursor.rowcount > 0
+
+    def requeue_failed(self):
+        """
+        失败的任务重新排队并清零重试次数, 返回数量
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute("""
+                UPDATE tasks SET state = 'queued', attempts = 0, error = NULL, enqueued_at = ?, updated_at = ?
+                WHERE state = 'failed'
+            """, (now, now))
+            return cursor.rowcount
+
+    def lease(self, worker):
+        """
+        领取一个待处理或租约已过期的任务, 返回 (paper_info, enqueued_at), 没有可领取的任务时返回 None
+        重试次数用尽的过期任务记为失败
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("""
+                    UPDATE tasks SET state = 'failed', error = 'lease expired ' || attempts || ' times', updated_at = ?
+                    WHERE state = 'leased' AND lease_until < ? AND attempts >= ?
+                """, (now, now, self.max_attempts))
+                row = self._conn.execute("""
+                    SELECT file_path, paper, state, worker, enqueued_at FROM tasks
+                    WHERE state = 'queued' OR (state = 'leased' AND lease_until < ?)
+                    ORDER BY enqueued_at LIMIT 1
+                """, (now,)).fetchone()
+                if row is not None:
+                    self._conn.execute("""
+                        UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1,
+                            updated_at = ?
+                        WHERE file_path = ?
+                    """, (worker, now + self.visibility_timeout, now, row['file_path']))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        if row['state'] == 'leased':
+            logger.warning(f"Lease of {row['file_path']} held by {row['worker']} expired, taking over")
+        return json.loads(row['paper']), row['enqueued_at']
+
+    def heartbeat(self, worker, file_paths):
+        """
+        为 worker 仍持有的任务续约, 返回租约已被他人接管的任务
+        """
+        if not file_paths:
+            return []
+        now = time.time()
+        lost = []
+        with self._lock:
+            for file_path in file_paths:
+                cursor = self._conn.execute("""
+                    UPDATE tasks SET lease_until = ?, updated_at = ?
+                    WHERE file_path = ? AND worker = ? AND state = 'leased'
+                """, (now + self.visibility_timeout, now, file_path, worker))
+                if cursor.rowcount == 0:
+                    lost.append(file_path)
+        return lost
+
+    def complete(self, worker, file_path, output_path=None, error=None):
+        """
+        上报处理结果; 租约已被他人接管时忽略 (以接管者的结果为准)
+        失败且未用尽重试次数的任务重新排队
+        """
+        now = time.time()
+        with self._lock:
+            if error is None:
+                state = 'done'
+            else:
+                row = self._conn.execute("SELECT attempts FROM tasks WHERE file_path = ?", (file_path,)).fetchone()
+                state = 'queued' if row and row['attempts'] < self.max_attempts else 'failed'
+            cursor = self._conn.execute("""
+                UPDATE tasks SET state = ?, output_path = ?, error = ?, lease_until = NULL, updated_at = ?
+                WHERE file_path = ? AND worker = ? AND state = 'leased'
+            """, (state, output_path, error, now, file_path, worker))
+        if cursor.rowcount == 0:
+            logger.warning(f"Result for {file_path} discarded: lease no longer held by {worker}")
+
+    def close(self):
+        """
+        协调者已加入全部任务; worker 在队列清空后退出
+        """
+        self._set_meta('sealed', '1')
+
+    def reopen(self):
+        self._set_meta('sealed', '0')
+
+    def sealed(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'sealed'").fetchone()
+        return bool(row) and row['value'] == '1'
+
+    def state(self, file_path):
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM tasks WHERE file_path = ?", (file_path,)).fetchone()
+        return row['state'] if row else None
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM tasks GROUP BY state").fetchall()
+        return {r['state']: r['n'] for r in rows}
+
+    def drained(self):
+        counts = self.counts()
+        return not counts.get('queued') and not counts.get('leased')
+
+    def summaries(self, file_paths=None):
+        """
+        已完成任务的总结, 可按 file_paths 限定范围; 返回 [{'id', 'mode', 'title', 'path'}], 与 RunManifest.summaries 相同
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path, paper, output_path FROM tasks WHERE state = 'done' ORDER BY file_path").fetchall()
+        wanted = set(file_paths) if file_paths is not None else None
+        return [describe_summary(r['output_path'], json.loads(r['paper']).get('id')) for r in rows
+                if r['output_path'] and (wanted is None or r['file_path'] in wanted) and os.path.exists(r['output_path'])]
+
+    def _set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT INTO meta VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                               (key, value))
@@ -1,30 +1,7 @@
 from loguru import logger
 import os
-
-def find_pdf_files(root_dir):
-    """
-    遍历目录查找所有 PDF 文件
-    返回列表: [{'id': '4586', 'path': '...'}]
-    """
-    pdf_list = []
-    
-    # 假设结构是 root_dir/ID/*.pdf
-    for item in os.listdir(root_dir):
-        sub_path = os.path.join(root_dir, item).replace('\\', '/')
-        if os.path.isdir(sub_path): # 4586, 4587...
-            # 在子文件夹中找 pdf
-            for file in os.listdir(sub_path):
-                if file.endswith('.pdf'):
-                    pdf_list.append({
-                        'id': item, # 文件夹名作为 ID
-                        'folder_path': sub_path,
-                        'file_path': os.path.join(sub_path, file).replace('\\', '/'),
-                        'file_name': file
-                    })
-                    continue # 每个 ID 文件夹只处理一个 PDF？假设是这样
-    
-    return pdf_list
-
+import time
+from .metrics import metrics
 
 def determine_mode(paper_id, rules_config):
     """
@@ -40,3 +17,51 @@ def determine_mode(paper_id, rules_config):
         return 'skim'
         
     return rules_config.get('default_mode', 'skim')
+
+
+def get_output_path(paper_info, mode):
+    """
+    计算论文总结的输出路径 (默认保存在 PDF 同级目录)
+    """
+    file_name = paper_info['file_name']
+    output_filename = f"Summary_{mode}_{os.path.splitext(file_name)[0]}.md"
+    return os.path.join(paper_info['folder_path'], output_filename)
+
+
+def summary_header(paper_info, mode):
+    """
+    总结文件的标题与元信息头
+    """
+    return (f"# Summary: {paper_info['file_name']}\n"
+            f"- **ID**: {paper_info['id']}\n"
+            f"- **Mode**: {mode}\n"
+            f"- **Date**: {time.strftime('%Y-%m-%d')}\n\n")
+
+
+def save_summary(output_path, paper_info, mode, summary):
+    """
+    写入总结文件 (带标题与元信息头), 先写临时文件再原子替换, 避免留下不完整的输出
+    """
+    partial_path = f"{output_path}.partial"
+    with metrics.span('write'):
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            f.write(summary_header(paper_info, mode))
+            f.write(summary)
+        os.replace(partial_path, output_path)
+
+
+def save_duplicate_summary(output_path, paper_info, mode, match, action='copy'):
+    """
+    近似重复论文的总结: copy 复制原总结正文并注明来源; link 只写出指向原总结的链接
+    match: NearDuplicateIndex.find 的返回值
+    """
+    source = os.path.relpath(match['output_path'], os.path.dirname(output_path)).replace('\\', '/')
+    note = (f"> 与 {os.path.basename(match['file_path'])} 近似重复 (相似度 {match['similarity']:.2f}), "
+            f"总结复用自 [{os.path.basename(match['output_path'])}]({source})\n\n")
+    body = ""
+    if action == 'copy':
+        with open(match['output_path'], 'r', encoding='utf-8') as f:
+            content = f.read()
+        # 去掉原总结的标题与元信息头
+        body = content.split('\n\n', 1)[1] if content.startswith('# Summary:') and '\n\n' in content else content
+    save_summary(output_path, paper_info, mode, note + body)